@@ -81,6 +81,10 @@ setup(
   ],
   namespace_packages=[],
   install_requires=_make_required_install_packages(),
+  extras_require={
+    # for tfx_x.components.model.transform.quantization.strip_pruning_and_clustering
+    'tfmot': ['tensorflow-model-optimization>=0.5'],
+  },
   python_requires='>=3.6,<4',
   packages=find_packages(),
   include_package_data=True,
@@ -25,3 +25,19 @@ class PipelineConfiguration(Artifact):
 
 class ExportedModel(Artifact):
   TYPE_NAME = 'ExportedModel'
+
+
+class KeyHistogram(Artifact):
+  TYPE_NAME = 'KeyHistogram'
+
+
+class SamplerState(Artifact):
+  TYPE_NAME = 'SamplerState'
+
+
+class ExamplesIndex(Artifact):
+  TYPE_NAME = 'ExamplesIndex'
+
+
+class ModelBenchmark(Artifact):
+  TYPE_NAME = 'ModelBenchmark'
@@ -15,6 +15,11 @@
 
 from tfx_x.components.configuration.converter.component import FromCustomConfig
 from tfx_x.components.examples.filter.component import Filter
+from tfx_x.components.examples.index.component import Index
+from tfx_x.components.examples.ops.component import ExamplesOps
+from tfx_x.components.examples.partition.component import Partition
+from tfx_x.components.examples.reshard.component import Reshard
 from tfx_x.components.examples.stratified_sampler.component import StratifiedSampler
+from tfx_x.components.model.benchmark.component import Benchmark
 from tfx_x.components.model.export.component import Export
 from tfx_x.components.model.transform.component import Transform
@@ -17,7 +17,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from typing import Optional, Text, List
+from typing import Any, Dict, Optional, Text, List
 
 from tfx import types
 from tfx.dsl.components.base import base_component
@@ -30,7 +30,9 @@ from tfx.utils import json_utils
 from tfx_x.components.examples.filter import executor
 from tfx_x.components.examples.filter.executor import SPLITS_TO_TRANSFORM_KEY, \
   PREDICATE_FN_KEY, SPLITS_TO_COPY_KEY, FILTERED_EXAMPLES_KEY, EXAMPLES_KEY, \
-  PIPELINE_CONFIGURATION_KEY, PREDICATE_FN_KEY_KEY
+  PIPELINE_CONFIGURATION_KEY, PREDICATE_FN_KEY_KEY, BATCH_PREDICATE_FN_KEY, \
+  LAZY_DECODING_KEY, PREDICATE_SPEC_KEY, COPY_MODE_KEY, INCREMENTAL_KEY, PREVIOUS_FILTERED_EXAMPLES_KEY, \
+  OUTPUT_CONFIG_KEY, SCHEMA_KEY
 from tfx_x import PipelineConfiguration
 
 
@@ -42,10 +44,18 @@ class FilterSpec(ComponentSpec):
     SPLITS_TO_COPY_KEY: ExecutionParameter(type=(str, Text), optional=True),
     PREDICATE_FN_KEY: ExecutionParameter(type=Text, optional=True),
     PREDICATE_FN_KEY_KEY: ExecutionParameter(type=Text, optional=True),
+    BATCH_PREDICATE_FN_KEY: ExecutionParameter(type=Text, optional=True),
+    LAZY_DECODING_KEY: ExecutionParameter(type=int, optional=True),
+    COPY_MODE_KEY: ExecutionParameter(type=Text, optional=True),
+    PREDICATE_SPEC_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    INCREMENTAL_KEY: ExecutionParameter(type=int, optional=True),
+    OUTPUT_CONFIG_KEY: ExecutionParameter(type=(str, Text), optional=True),
   }
   INPUTS = {
     EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
     PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+    PREVIOUS_FILTERED_EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples, optional=True),
+    SCHEMA_KEY: ChannelParameter(type=standard_artifacts.Schema, optional=True),
   }
   OUTPUTS = {
     FILTERED_EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
@@ -74,7 +84,15 @@ class Filter(base_component.BaseComponent):
                pipeline_configuration: Optional[types.Channel] = None,
                filtered_examples: Optional[types.Channel] = None,
                splits_to_transform: Optional[List[Text]] = None,
-               splits_to_copy: Optional[List[Text]] = None):
+               splits_to_copy: Optional[List[Text]] = None,
+               batch_predicate_fn: Optional[Text] = None,
+               lazy_decoding: Optional[bool] = None,
+               predicate_spec: Optional[Dict[Text, Any]] = None,
+               copy_mode: Optional[Text] = None,
+               incremental: Optional[bool] = None,
+               previous_filtered_examples: Optional[types.Channel] = None,
+               output_config: Optional[Dict[Text, Any]] = None,
+               schema: Optional[types.Channel] = None):
     """Construct an Filter component.
     Args:
       examples: A Channel of 'Examples' type, usually produced by ExampleGen
@@ -90,6 +108,28 @@ class Filter(base_component.BaseComponent):
                  Must be 'predicate: Example -> bool. For example something like:
                  >>> def predicate(m):
                        return m.features.feature['trip_miles'].float_list.value[0] > 42.
+      batch_predicate_fn: Vectorized alternative to `predicate_fn`, the function that will tell which
+                 examples of a batch must be kept. Must be 'batch_predicate: pyarrow.RecordBatch -> boolean mask'.
+                 Takes precedence over `predicate_spec`.
+      lazy_decoding: If true (default is false), `predicate` gets a `LazyExample` which only decodes the features it
+                 accesses - `m.features.feature[name]` works as with a `tf.train.Example`.
+      predicate_spec: Declarative alternative to `predicate_fn` compiled into a vectorized filter. Takes precedence
+                 over `predicate_fn`. For example something like:
+                 >>> {'and': [{'feature': 'trip_miles', 'op': '>', 'value': 42.},
+                 >>>          {'not': {'feature': 'payment_type', 'op': 'in', 'value': ['Cash']}}]}
+      copy_mode: How `splits_to_copy` are passed through: 'copy' (default) or 'link' to hard link their files - they
+                 are copied when they cannot be linked.
+      incremental: If true, each input file is filtered to its own output file and a manifest of the input files
+                 is written with the output, so that a later Filter can reuse the outputs of unchanged files.
+      previous_filtered_examples: A Channel of 'Examples' type, the output of a previous incremental Filter of the
+                 same examples, usually from a Resolver - implies `incremental`. The outputs of the input files which
+                 did not change since, with the same predicates, are linked from it instead of being filtered again.
+      output_config: Compression and sharding of the output: 'compression' is 'gzip' (default) or 'none',
+                 'num_shards' a fixed number of files or 'target_shard_bytes' the size of the serialized records of
+                 each file - the runner picks the number of files otherwise. For example:
+                 >>> {'compression': 'none', 'target_shard_bytes': 256 * 1024 * 1024}
+      schema: A Channel of 'Schema' type, usually produced by SchemaGen component. With a `predicate_spec`, only
+                 the features of the spec are decoded when it is given, all the features otherwise.
     """
     filtered_examples = filtered_examples or types.Channel(
       type=standard_artifacts.Examples)
@@ -101,8 +141,16 @@ class Filter(base_component.BaseComponent):
       examples=examples,
       pipeline_configuration=pipeline_configuration,
       filtered_examples=filtered_examples,
+      previous_filtered_examples=previous_filtered_examples,
+      schema=schema,
       splits_to_transform=json_utils.dumps(splits_to_transform),
       splits_to_copy=json_utils.dumps(splits_to_copy),
       predicate_fn=predicate_fn,
-      predicate_fn_key=predicate_fn_key)
+      predicate_fn_key=predicate_fn_key,
+      batch_predicate_fn=batch_predicate_fn,
+      lazy_decoding=None if lazy_decoding is None else int(lazy_decoding),
+      predicate_spec=None if predicate_spec is None else json_utils.dumps(predicate_spec),
+      copy_mode=copy_mode,
+      incremental=None if incremental is None else int(incremental),
+      output_config=None if output_config is None else json_utils.dumps(output_config))
     super(Filter, self).__init__(spec=spec)
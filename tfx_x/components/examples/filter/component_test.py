@@ -23,7 +23,8 @@ from tfx.types import channel_utils
 from tfx.types import standard_artifacts
 
 from tfx_x.components.examples.filter.component import Filter
-from tfx_x.components.examples.filter.executor import FILTERED_EXAMPLES_KEY
+from tfx_x.components.examples.filter.executor import FILTERED_EXAMPLES_KEY, INCREMENTAL_KEY, \
+  PREVIOUS_FILTERED_EXAMPLES_KEY
 from tfx_x import PipelineConfiguration
 
 
@@ -78,6 +79,27 @@ class ComponentTest(tf.test.TestCase):
       predicate_fn_key='predicate_fn_key')
     self.assertEqual('Examples', filter.outputs[FILTERED_EXAMPLES_KEY].type_name)
 
+  def testConstructWithPredicateSpec(self):
+    examples = standard_artifacts.Examples()
+    filter = Filter(
+      examples=channel_utils.as_channel([examples]),
+      filtered_examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      splits_to_transform=['eval'],
+      splits_to_copy=['train'],
+      predicate_spec={'and': [{'feature': 'trip_miles', 'op': '>', 'value': 42.},
+                              {'not': {'feature': 'payment_type', 'op': 'in', 'value': ['Cash']}}]})
+    self.assertEqual('Examples', filter.outputs[FILTERED_EXAMPLES_KEY].type_name)
+
+  def testConstructIncremental(self):
+    filter = Filter(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      previous_filtered_examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      predicate_fn='def predicate(m):\n  return True',
+      incremental=True)
+    self.assertEqual('Examples', filter.outputs[FILTERED_EXAMPLES_KEY].type_name)
+    self.assertEqual(1, filter.exec_properties[INCREMENTAL_KEY])
+    self.assertIn(PREVIOUS_FILTERED_EXAMPLES_KEY, filter.inputs)
+
 
 if __name__ == '__main__':
   tf.test.main()
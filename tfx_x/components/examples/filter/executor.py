@@ -19,19 +19,28 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import hashlib
 import json
 import os
-from typing import Any, Dict, Mapping, List, Text
+from typing import Any, Dict, Mapping, List, NamedTuple, Optional, Text, Tuple
 
 import apache_beam as beam
+import numpy as np
+import pyarrow as pa
 import tensorflow as tf
 from absl import logging
+from tensorflow_metadata.proto.v0 import schema_pb2
 from tfx import types
 from tfx.dsl.components.base import base_beam_executor
 from tfx.types import artifact_utils, Artifact
 from tfx.utils import io_utils, json_utils
+from tfx_bsl.coders import example_coder
+from tfx_bsl.public import tfxio
 
 from tfx_x.components import utils
+from tfx_x.components.examples import predicate_spec as predicate_spec_lib
+from tfx_x.components.examples import writer
+from tfx_x.components.examples.lazy_example import LazyExample
 
 FILTERED_EXAMPLES_KEY = 'filtered_examples'
 EXAMPLES_KEY = 'examples'
@@ -40,9 +49,162 @@ SPLITS_TO_COPY_KEY = 'splits_to_copy'
 SPLITS_TO_TRANSFORM_KEY = 'splits_to_transform'
 PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
 PREDICATE_FN_KEY_KEY = 'predicate_fn_key'
+BATCH_PREDICATE_FN_KEY = 'batch_predicate_fn'
+LAZY_DECODING_KEY = 'lazy_decoding'
+COPY_MODE_KEY = 'copy_mode'
+INCREMENTAL_KEY = 'incremental'
+PREVIOUS_FILTERED_EXAMPLES_KEY = 'previous_filtered_examples'
+PREDICATE_SPEC_KEY = 'predicate_spec'
+OUTPUT_CONFIG_KEY = 'output_config'
+SCHEMA_KEY = 'schema'
 
 _FILTERED_EXAMPLES_FILE_PREFIX = 'filtered_examples'
 _FILTERED_EXAMPLES_DIR_NAME = 'filtered_examples'
+_RAW_RECORD_COLUMN_NAME = '__raw_record__'
+_TELEMETRY_DESCRIPTORS = ['Filter']
+# what an incremental Filter did, at the root of its output artifact
+_MANIFEST_FILE = 'filter_manifest.json'
+
+
+class _FilterJob(NamedTuple):
+  """Filtering of the files matching `file_pattern` to shards of prefix `dest_path`."""
+  name: Text
+  file_pattern: Text
+  dest_path: Text
+  # where to write the shard metadata, if the output config asks for shards
+  metadata_path: Optional[Text] = None
+
+
+def _write(job: _FilterJob, output_config: writer.OutputConfig) -> beam.PTransform:
+  return writer.WriteExamples(job.dest_path, output_config, metadata_path=job.metadata_path)
+
+
+def _predicate_fingerprint(predicate_fn: Optional[Text],
+                           batch_predicate_fn: Optional[Text],
+                           predicate_spec: Any) -> Text:
+  predicates = json.dumps([predicate_fn, batch_predicate_fn, predicate_spec], sort_keys=True)
+  return hashlib.sha256(predicates.encode('utf-8')).hexdigest()
+
+
+def _strip_suffix(filename: Text) -> Text:
+  for suffix in ['.gz', '.deflate']:
+    if filename.endswith(suffix):
+      return filename[:-len(suffix)]
+  return filename
+
+
+def _incremental_files(example_uris: Mapping[Text, Text],
+                       output_artifact: Artifact,
+                       predicate_fingerprint: Text,
+                       previous_artifact: Optional[Artifact],
+                       output_config: writer.OutputConfig) -> Tuple[Dict[Text, Text], Dict[Text, Any]]:
+  """Plans an incremental filtering, one output file per input file.
+
+  The output of an input file which has the same fingerprint as in the previous run - with the same predicates and
+  compression - is linked from the previous output, the other input files are to be filtered.
+  Returns:
+    the output file of each input file to filter and the manifest of the output.
+  """
+  previous_splits = {}
+  if previous_artifact is not None:
+    previous_manifest_file = os.path.join(previous_artifact.uri, _MANIFEST_FILE)
+    if not tf.io.gfile.exists(previous_manifest_file):
+      logging.info('No manifest in %s, filtering everything.', previous_artifact.uri)
+    else:
+      previous_manifest = json.loads(io_utils.read_string_file(previous_manifest_file))
+      if previous_manifest['predicate'] != predicate_fingerprint:
+        logging.info('The predicates changed since %s, filtering everything.', previous_artifact.uri)
+      elif previous_manifest.get('compression', writer.COMPRESSION_GZIP) != output_config.compression:
+        logging.info('The compression changed since %s, filtering everything.', previous_artifact.uri)
+      else:
+        previous_splits = previous_manifest['splits']
+
+  manifest = {'predicate': predicate_fingerprint, 'compression': output_config.compression, 'splits': {}}
+  outputs = {}
+  for split_name, example_uri in example_uris.items():
+    output_dir = artifact_utils.get_split_uri([output_artifact], split_name)
+    tf.io.gfile.makedirs(output_dir)
+
+    previous_files = previous_splits.get(split_name, {})
+    previous_dir = None
+    if previous_files:
+      previous_dir = utils.resolve_split_uri(artifact_utils.get_split_uri([previous_artifact], split_name))
+
+    files = manifest['splits'][split_name] = {}
+    reused = 0
+    for filename in sorted(tf.io.gfile.listdir(example_uri)):
+      input_file = os.path.join(example_uri, filename)
+      if tf.io.gfile.isdir(input_file):
+        continue
+      fingerprint = utils.file_fingerprint(input_file)
+      output_name = '{}-{}{}'.format(_FILTERED_EXAMPLES_FILE_PREFIX, _strip_suffix(filename), output_config.suffix)
+      files[filename] = {'fingerprint': fingerprint, 'output': output_name}
+
+      previous = previous_files.get(filename)
+      if previous is not None and previous['fingerprint'] == fingerprint:
+        previous_output = os.path.join(previous_dir, previous['output'])
+        if tf.io.gfile.exists(previous_output):
+          utils.link_file(previous_output, os.path.join(output_dir, output_name))
+          reused += 1
+          continue
+
+      outputs[input_file] = os.path.join(output_dir, output_name)
+
+    logging.info('Split %s: %d files reused, %d files to filter.', split_name, reused, len(files) - reused)
+
+  return outputs, manifest
+
+
+class _FilterFileRecords(beam.DoFn):
+  """Filters batches of (input file, record) into (output file, record) pairs."""
+
+  def __init__(self,
+               outputs: Mapping[Text, Text],
+               predicate_fn: Optional[Text],
+               batch_predicate_fn: Optional[Text],
+               predicate_spec: Any,
+               schema: Optional[schema_pb2.Schema],
+               lazy_decoding: bool):
+    super(_FilterFileRecords, self).__init__()
+    self._outputs = outputs
+    self._predicate_fn = predicate_fn
+    self._batch_predicate_fn = batch_predicate_fn
+    # compiled here so that an invalid spec fails before the pipeline runs
+    self._predicate = None
+    if batch_predicate_fn is None and predicate_spec is not None:
+      self._predicate = predicate_spec_lib.compile_predicate(predicate_spec, schema)
+    self._lazy_decoding = lazy_decoding
+    self._mask = None
+
+  def setup(self):
+    # same precedence as in `Executor.Do()`
+    if self._batch_predicate_fn is not None:
+      d = {}
+      exec(self._batch_predicate_fn, globals(), d)  # how ugly is that?
+      batch_predicate = d['batch_predicate']
+      decoder = example_coder.ExamplesToRecordBatchDecoder()
+
+      def mask(records: List[bytes]) -> np.ndarray:
+        batch_mask = batch_predicate(decoder.DecodeBatch(records))
+        if isinstance(batch_mask, pa.Array):
+          batch_mask = batch_mask.to_numpy(zero_copy_only=False)
+        return np.asarray(batch_mask, dtype=bool)
+
+      self._mask = mask
+    elif self._predicate is not None:
+      self._mask = self._predicate.evaluate_records
+    else:
+      d = {}
+      exec(self._predicate_fn, globals(), d)  # how ugly is that?
+      predicate = d['predicate']
+      decode = LazyExample if self._lazy_decoding else tf.train.Example.FromString
+      self._mask = lambda records: [bool(predicate(decode(record))) for record in records]
+
+  def process(self, batch: List[Tuple[Text, bytes]]):
+    files, records = zip(*batch)
+    for input_file, record, keep in zip(files, records, self._mask(list(records))):
+      if keep:
+        yield self._outputs[input_file], record
 
 
 class Executor(base_beam_executor.BaseBeamExecutor):
@@ -56,6 +218,8 @@ class Executor(base_beam_executor.BaseBeamExecutor):
       input_dict: Input dict from input key to a list of Artifacts.
         - examples: examples for inference.
         - pipeline_configuration: optional PipelineConfiguration artifact.
+        - previous_filtered_examples: optional output of a previous incremental Filter of the same examples.
+        - schema: optional schema of the examples, to only decode the features of `predicate_spec`.
       output_dict: Output dict from output key to a list of Artifacts.
         - filtered_examples: the stratified examples.
       exec_properties: A dict of execution properties.
@@ -63,6 +227,19 @@ class Executor(base_beam_executor.BaseBeamExecutor):
         - splits_to_copy: list of splits to copy as is.
         - predicate_fn: the function defines if a sample must be kept - must be 'predicate: Example -> bool
         - predicate_fn_key: alternate name for the key containing the def of `predicate()`
+        - batch_predicate_fn: the function defines which samples of a batch must be kept - must be
+          'batch_predicate: pyarrow.RecordBatch -> boolean mask'. Takes precedence over `predicate_spec`.
+        - predicate_spec: declarative predicate (see `predicate_spec` module) compiled into a
+          vectorized filter. Takes precedence over `predicate_fn`.
+        - lazy_decoding: if true (default is false), `predicate()` gets a `LazyExample` which only decodes
+          the features it accesses, otherwise a fully decoded `tf.train.Example`.
+        - copy_mode: how the splits to copy are passed through - 'copy' (default) or 'link' to hard link their
+          files, see `utils.copy_over()`.
+        - incremental: if true, each input file is filtered to its own output file and the output of the files
+          which did not change since `previous_filtered_examples` - with the same predicates - are linked from it
+          instead. Implied by `previous_filtered_examples`.
+        - output_config: compression and sharding of the output, see the `writer` module. The sharding is ignored
+          when incremental.
     Returns:
       None
     """
@@ -77,6 +254,12 @@ class Executor(base_beam_executor.BaseBeamExecutor):
 
     splits_to_transform = []
     predicate_fn = None
+    batch_predicate_fn = None
+    predicate_spec = None
+    lazy_decoding = False
+    copy_mode = utils.COPY_MODE
+    incremental = False
+    output_config = None
 
     predicate_fn_key = exec_properties[
       PREDICATE_FN_KEY_KEY] if PREDICATE_FN_KEY_KEY in exec_properties else PREDICATE_FN_KEY
@@ -101,6 +284,24 @@ class Executor(base_beam_executor.BaseBeamExecutor):
       if predicate_fn_key in pipeline_configuration:
         predicate_fn = pipeline_configuration[predicate_fn_key]
 
+      if BATCH_PREDICATE_FN_KEY in pipeline_configuration:
+        batch_predicate_fn = pipeline_configuration[BATCH_PREDICATE_FN_KEY]
+
+      if PREDICATE_SPEC_KEY in pipeline_configuration:
+        predicate_spec = pipeline_configuration[PREDICATE_SPEC_KEY]
+
+      if LAZY_DECODING_KEY in pipeline_configuration:
+        lazy_decoding = bool(pipeline_configuration[LAZY_DECODING_KEY])
+
+      if COPY_MODE_KEY in pipeline_configuration:
+        copy_mode = pipeline_configuration[COPY_MODE_KEY]
+
+      if INCREMENTAL_KEY in pipeline_configuration:
+        incremental = bool(pipeline_configuration[INCREMENTAL_KEY])
+
+      if OUTPUT_CONFIG_KEY in pipeline_configuration:
+        output_config = pipeline_configuration[OUTPUT_CONFIG_KEY]
+
     # Now looking at the exec_properties
     if SPLITS_TO_TRANSFORM_KEY in exec_properties and exec_properties[SPLITS_TO_TRANSFORM_KEY] is not None:
       splits_to_transform = json_utils.loads(exec_properties[SPLITS_TO_TRANSFORM_KEY])
@@ -114,9 +315,38 @@ class Executor(base_beam_executor.BaseBeamExecutor):
     if predicate_fn_key in exec_properties and exec_properties[predicate_fn_key] is not None:
       predicate_fn = exec_properties[predicate_fn_key]
 
+    if BATCH_PREDICATE_FN_KEY in exec_properties and exec_properties[BATCH_PREDICATE_FN_KEY] is not None:
+      batch_predicate_fn = exec_properties[BATCH_PREDICATE_FN_KEY]
+
+    if PREDICATE_SPEC_KEY in exec_properties and exec_properties[PREDICATE_SPEC_KEY] is not None:
+      predicate_spec = json_utils.loads(exec_properties[PREDICATE_SPEC_KEY])
+
+    if LAZY_DECODING_KEY in exec_properties and exec_properties[LAZY_DECODING_KEY] is not None:
+      lazy_decoding = bool(exec_properties[LAZY_DECODING_KEY])
+
+    if COPY_MODE_KEY in exec_properties and exec_properties[COPY_MODE_KEY] is not None:
+      copy_mode = exec_properties[COPY_MODE_KEY]
+
+    if INCREMENTAL_KEY in exec_properties and exec_properties[INCREMENTAL_KEY] is not None:
+      incremental = bool(exec_properties[INCREMENTAL_KEY])
+
+    if OUTPUT_CONFIG_KEY in exec_properties and exec_properties[OUTPUT_CONFIG_KEY] is not None:
+      output_config = json_utils.loads(exec_properties[OUTPUT_CONFIG_KEY])
+
+    previous_artifact = None
+    if input_dict.get(PREVIOUS_FILTERED_EXAMPLES_KEY):
+      previous_artifact = artifact_utils.get_single_instance(input_dict[PREVIOUS_FILTERED_EXAMPLES_KEY])
+      incremental = True
+
+    schema = None
+    if input_dict.get(SCHEMA_KEY):
+      schema_uri = artifact_utils.get_single_uri(input_dict[SCHEMA_KEY])
+      schema = io_utils.SchemaReader().read(io_utils.get_only_uri_in_dir(schema_uri))
+
     # Validate we have all we need
-    if predicate_fn is None:
-      raise ValueError('\'predicate_fn\' is missing in exec dict.')
+    if predicate_fn is None and batch_predicate_fn is None and predicate_spec is None:
+      raise ValueError('One of \'predicate_fn\', \'batch_predicate_fn\' and \'predicate_spec\' is missing in '
+                       'exec dict.')
 
     if EXAMPLES_KEY not in input_dict:
       raise ValueError('\'examples\' is missing in input dict.')
@@ -124,33 +354,77 @@ class Executor(base_beam_executor.BaseBeamExecutor):
     if FILTERED_EXAMPLES_KEY not in output_dict:
       raise ValueError('\'filtered_examples\' is missing in output dict.')
 
+    output_config = writer.output_config(output_config)
+
     output_artifact = artifact_utils.get_single_instance(output_dict[FILTERED_EXAMPLES_KEY])
     output_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform + splits_to_copy)
 
     example_uris = {}
 
     for split in splits_to_transform:
-      data_uri = artifact_utils.get_split_uri(examples, split)
+      data_uri = utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
       example_uris[split] = data_uri
 
-    # do something with the splits we dont want to transform ('splits_to_copy')
-    utils.copy_over(examples, output_artifact, splits_to_copy)
+    manifest = None
+    jobs = []
+    if incremental:
+      outputs, manifest = _incremental_files(example_uris,
+                                             output_artifact=output_artifact,
+                                             predicate_fingerprint=_predicate_fingerprint(predicate_fn,
+                                                                                          batch_predicate_fn,
+                                                                                          predicate_spec),
+                                             previous_artifact=previous_artifact,
+                                             output_config=output_config)
+      if output_config.is_sharded:
+        logging.info('One output file per input file when incremental, the sharding of the output is ignored.')
+    else:
+      jobs = [_FilterJob(name=split_name,
+                         file_pattern=io_utils.all_files_pattern(example_uri),
+                         dest_path=os.path.join(artifact_utils.get_split_uri([output_artifact], split_name),
+                                                _FILTERED_EXAMPLES_FILE_PREFIX),
+                         metadata_path=writer.shard_metadata_path(output_artifact, split_name))
+              for split_name, example_uri in example_uris.items()]
+
+    # do something with the splits we dont want to transform ('splits_to_copy'), while the pipeline runs
+    with utils.copying_over(examples, output_artifact, splits_to_copy, copy_mode=copy_mode):
+      if incremental:
+        if not outputs:
+          logging.info('Nothing to filter.')
+        else:
+          self._run_incremental_filtering(_FilterFileRecords(outputs,
+                                                             predicate_fn=predicate_fn,
+                                                             batch_predicate_fn=batch_predicate_fn,
+                                                             predicate_spec=predicate_spec,
+                                                             schema=schema,
+                                                             lazy_decoding=lazy_decoding),
+                                          outputs=outputs,
+                                          output_config=output_config)
+      elif batch_predicate_fn is not None:
+        self._run_batch_filtering(jobs, batch_predicate_fn=batch_predicate_fn, output_config=output_config)
+      elif predicate_spec is not None:
+        self._run_spec_filtering(jobs, predicate_spec=predicate_spec, schema=schema, output_config=output_config)
+      else:
+        self._run_filtering(jobs,
+                            predicate_fn=predicate_fn,
+                            lazy_decoding=lazy_decoding,
+                            output_config=output_config)
 
-    self._run_filtering(example_uris,
-                        output_artifact=output_artifact,
-                        predicate_fn=predicate_fn)
+    if manifest is not None:
+      io_utils.write_string_file(os.path.join(output_artifact.uri, _MANIFEST_FILE), json.dumps(manifest))
 
     logging.info('Filter generates filtered examples to %s', output_artifact.uri)
 
   def _run_filtering(self,
-                     example_uris: Mapping[Text, Text],
+                     jobs: List[_FilterJob],
                      predicate_fn: Text,
-                     output_artifact: Artifact) -> None:
+                     lazy_decoding: bool = False,
+                     output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
     """Runs stratified sampling on given example data.
     Args:
-      example_uris: Mapping of example split name to example uri.
+      jobs: the input files and output of each filtering.
       predicate_fn: function to decide if a example must be kept.
-      output_artifact: Output artifact.
+      lazy_decoding: whether to pass a `LazyExample` to the predicate instead of a `tf.train.Example`.
+      output_config: how to write the output.
     Returns:
       None
     """
@@ -159,22 +433,128 @@ class Executor(base_beam_executor.BaseBeamExecutor):
     exec(predicate_fn, globals(), d)  # how ugly is that?
     predicate = d['predicate']
 
+    decode = LazyExample if lazy_decoding else tf.train.Example.FromString
+
+    def keep_record(record: bytes) -> bool:
+      # the record is only parsed for the predicate, the original bytes are what gets written
+      return predicate(decode(record))
+
     with self._make_beam_pipeline() as pipeline:
-      for split_name, example_uri in example_uris.items():
+      for job in jobs:
         data_list = [(
-            pipeline | 'ReadData[{}]'.format(split_name) >> beam.io.ReadFromTFRecord(
-          file_pattern=io_utils.all_files_pattern(example_uri)))]
-
-        dest_path = os.path.join(artifact_utils.get_split_uri([output_artifact], split_name),
-                                 _FILTERED_EXAMPLES_FILE_PREFIX)
+            pipeline | 'ReadData[{}]'.format(job.name) >> beam.io.ReadFromTFRecord(
+          file_pattern=job.file_pattern))]
 
         _ = (
             [data for data in data_list]
-            | 'FlattenExamples ({})'.format(split_name) >> beam.Flatten(pipeline=pipeline)
-            | 'ParseExamples ({})'.format(split_name) >> beam.Map(tf.train.Example.FromString)
-            | 'Filter ({})'.format(split_name) >> beam.Filter(predicate)
-            | 'WriteStratifiedSamples ({})'.format(split_name) >> beam.io.WriteToTFRecord(
-          dest_path,
-          file_name_suffix='.gz',
-          coder=beam.coders.ProtoCoder(tf.train.Example)))
-        logging.info('Sampling result written to %s.', dest_path)
+            | 'FlattenExamples ({})'.format(job.name) >> beam.Flatten(pipeline=pipeline)
+            | 'Filter ({})'.format(job.name) >> beam.Filter(keep_record)
+            | 'WriteStratifiedSamples ({})'.format(job.name) >> _write(job, output_config))
+        logging.info('Sampling result written to %s.', job.dest_path)
+
+  def _run_batch_filtering(self,
+                           jobs: List[_FilterJob],
+                           batch_predicate_fn: Text,
+                           output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
+    """Runs filtering on given example data, one Arrow RecordBatch at a time.
+
+    The splits are decoded with TFXIO into RecordBatches which also carry the original serialized
+    records. The mask returned by `batch_predicate` selects the records that are written as is.
+    Args:
+      jobs: the input files and output of each filtering.
+      batch_predicate_fn: function to decide which examples of a RecordBatch must be kept.
+      output_config: how to write the output.
+    Returns:
+      None
+    """
+
+    d = {}
+    exec(batch_predicate_fn, globals(), d)  # how ugly is that?
+    batch_predicate = d['batch_predicate']
+
+    def filter_batch(record_batch: pa.RecordBatch):
+      mask = batch_predicate(record_batch)
+      if not isinstance(mask, pa.Array):
+        mask = pa.array(mask, type=pa.bool_())
+      raw_records = record_batch.column(record_batch.schema.get_field_index(_RAW_RECORD_COLUMN_NAME))
+      return raw_records.filter(mask).flatten().to_pylist()
+
+    with self._make_beam_pipeline() as pipeline:
+      for job in jobs:
+        examples_tfxio = tfxio.TFExampleRecord(
+          file_pattern=job.file_pattern,
+          raw_record_column_name=_RAW_RECORD_COLUMN_NAME,
+          telemetry_descriptors=_TELEMETRY_DESCRIPTORS)
+
+        _ = (
+            pipeline
+            | 'ReadBatches ({})'.format(job.name) >> examples_tfxio.BeamSource()
+            | 'FilterBatches ({})'.format(job.name) >> beam.FlatMap(filter_batch)
+            | 'WriteStratifiedSamples ({})'.format(job.name) >> _write(job, output_config))
+        logging.info('Sampling result written to %s.', job.dest_path)
+
+  def _run_spec_filtering(self,
+                          jobs: List[_FilterJob],
+                          predicate_spec: Any,
+                          schema: Optional[schema_pb2.Schema] = None,
+                          output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
+    """Runs filtering on given example data with a declarative predicate.
+
+    The spec is compiled once and evaluated on the RecordBatches decoded by TFXIO - projected on the
+    features of the spec if the schema is known - which also carry the original serialized records
+    that are written as is.
+    Args:
+      jobs: the input files and output of each filtering.
+      predicate_spec: the predicate spec (or its JSON serialization).
+      schema: optional schema of the examples, all the features are decoded without it.
+      output_config: how to write the output.
+    Returns:
+      None
+    """
+
+    predicate = predicate_spec_lib.compile_predicate(predicate_spec, schema)
+    logging.info('Filtering on features: %s', predicate.features)
+
+    with self._make_beam_pipeline() as pipeline:
+      for job in jobs:
+        examples_tfxio = tfxio.TFExampleRecord(
+          file_pattern=job.file_pattern,
+          raw_record_column_name=_RAW_RECORD_COLUMN_NAME,
+          schema=schema,
+          telemetry_descriptors=_TELEMETRY_DESCRIPTORS)
+        if schema is not None:
+          examples_tfxio = examples_tfxio.Project(predicate.features)
+
+        _ = (
+            pipeline
+            | 'ReadBatches ({})'.format(job.name) >> examples_tfxio.BeamSource()
+            | 'FilterBatches ({})'.format(job.name) >> beam.FlatMap(predicate.filter,
+                                                                    raw_record_column_name=_RAW_RECORD_COLUMN_NAME)
+            | 'WriteStratifiedSamples ({})'.format(job.name) >> _write(job, output_config))
+        logging.info('Sampling result written to %s.', job.dest_path)
+
+  def _run_incremental_filtering(self,
+                                 filter_file_records: _FilterFileRecords,
+                                 outputs: Mapping[Text, Text],
+                                 output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
+    """Runs the filtering of the changed input files, each to its own output file.
+
+    The changed files are all read at once and the kept records are grouped by output file, so the
+    pipeline does not grow with the number of files.
+    Args:
+      filter_file_records: the filtering of the (input file, record) pairs.
+      outputs: the output file of each input file.
+      output_config: how to write the output - only the compression.
+    Returns:
+      None
+    """
+
+    with self._make_beam_pipeline() as pipeline:
+      _ = (
+          pipeline
+          | 'ChangedFiles' >> beam.Create(sorted(outputs))
+          | 'ReadChangedFiles' >> beam.io.ReadAllFromTFRecord(with_filename=True)
+          | 'Batch' >> beam.BatchElements()
+          | 'FilterBatches' >> beam.ParDo(filter_file_records)
+          | 'WriteFiles' >> writer.WriteFiles(sorted(outputs.values()), output_config))
+      logging.info('Filtering %d changed files.', len(outputs))
@@ -0,0 +1,106 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Benchmarks the per-example - with and without lazy decoding - and the batch filtering of the Filter executor.
+
+Run with:
+  python -m tfx_x.components.examples.filter.executor_benchmark --benchmarks=.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import tensorflow as tf
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples.filter import executor
+from tfx_x.components.examples.filter.executor import FILTERED_EXAMPLES_KEY, EXAMPLES_KEY, \
+  PREDICATE_FN_KEY, SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY, BATCH_PREDICATE_FN_KEY, LAZY_DECODING_KEY
+
+_PREDICATE_FN = """
+def predicate(m):
+  return m.features.feature['trip_miles'].float_list.value[0] > 42.
+"""
+
+_BATCH_PREDICATE_FN = """
+def batch_predicate(record_batch):
+  import numpy as np
+  trip_miles = record_batch.column(record_batch.schema.get_field_index('trip_miles'))
+  offsets = trip_miles.offsets.to_numpy()
+  values = trip_miles.values.to_numpy(zero_copy_only=False)
+  present = offsets[1:] > offsets[:-1]
+  first = np.zeros(len(present), dtype=values.dtype)
+  first[present] = values[offsets[:-1][present]]
+  return present & (first > 42.)
+"""
+
+_ITERATIONS = 3
+
+
+class ExecutorBenchmark(tf.test.Benchmark):
+
+  def _run(self, name, exec_properties):
+    source_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'testdata')
+
+    examples = standard_artifacts.Examples()
+    examples.uri = os.path.join(source_data_dir, 'csv_example_gen')
+    examples.split_names = artifact_utils.encode_split_names(['train', 'eval', 'unlabelled'])
+
+    wall_times = []
+    for i in range(_ITERATIONS):
+      output_data_dir = tempfile.mkdtemp()
+      filtered_examples = standard_artifacts.Examples()
+      filtered_examples.uri = os.path.join(output_data_dir, 'filtered_examples')
+
+      context = executor.Executor.Context(tmp_dir=os.path.join(output_data_dir, '.temp'),
+                                          unique_id=str(i))
+
+      start = time.time()
+      executor.Executor(context).Do({EXAMPLES_KEY: [examples]},
+                                    {FILTERED_EXAMPLES_KEY: [filtered_examples]},
+                                    dict(exec_properties))
+      wall_times.append(time.time() - start)
+
+    self.report_benchmark(name=name, iters=_ITERATIONS, wall_time=min(wall_times),
+                          extras={'mean_wall_time': sum(wall_times) / len(wall_times)})
+
+  def benchmarkPerExample(self):
+    self._run('filter_per_example', {
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['train', 'eval']),
+      SPLITS_TO_COPY_KEY: json.dumps([]),
+      PREDICATE_FN_KEY: _PREDICATE_FN,
+    })
+
+  def benchmarkPerExampleWithLazyDecoding(self):
+    self._run('filter_per_example_lazy', {
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['train', 'eval']),
+      SPLITS_TO_COPY_KEY: json.dumps([]),
+      PREDICATE_FN_KEY: _PREDICATE_FN,
+      LAZY_DECODING_KEY: 1,
+    })
+
+  def benchmarkBatch(self):
+    self._run('filter_batch', {
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['train', 'eval']),
+      SPLITS_TO_COPY_KEY: json.dumps([]),
+      BATCH_PREDICATE_FN_KEY: _BATCH_PREDICATE_FN,
+    })
+
+
+if __name__ == '__main__':
+  tf.test.main()
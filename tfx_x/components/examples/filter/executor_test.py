@@ -17,13 +17,18 @@ import os
 
 import tensorflow as tf
 from absl import logging
+from tensorflow_metadata.proto.v0 import schema_pb2
 from tfx.dsl.io import fileio
 from tfx.types import artifact_utils
 from tfx.types import standard_artifacts
+from tfx.utils import io_utils
 
+from tfx_x.components.examples import writer
 from tfx_x.components.examples.filter import executor
 from tfx_x.components.examples.filter.executor import FILTERED_EXAMPLES_KEY, EXAMPLES_KEY, \
-  PREDICATE_FN_KEY, SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY
+  PREDICATE_FN_KEY, SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY, BATCH_PREDICATE_FN_KEY, LAZY_DECODING_KEY, \
+  PREDICATE_SPEC_KEY, COPY_MODE_KEY, INCREMENTAL_KEY, PREVIOUS_FILTERED_EXAMPLES_KEY, OUTPUT_CONFIG_KEY, \
+  SCHEMA_KEY
 
 
 class ExecutorTest(tf.test.TestCase):
@@ -87,6 +92,15 @@ def predicate(m):
         results.append(filtered_examples)
     return results
 
+  def _get_records(self, filepattern):
+    records = []
+    for f in fileio.glob(filepattern):
+      records.extend(tf.compat.v1.python_io.tf_record_iterator(
+        path=f,
+        options=tf.compat.v1.python_io.TFRecordOptions(
+          tf.compat.v1.python_io.TFRecordCompressionType.GZIP)))
+    return records
+
   def _verify_filtered_example_split(self, split_name):
     dir_path = os.path.join(self._filtered_examples_dir,  'Split-' + split_name)
     logging.info("Looking for examples split in %s", dir_path)
@@ -175,6 +189,221 @@ def predicate(m):
     self._verify_copied_example_split('unlabelled')
     self._verify_filtered_example_split('eval')
 
+  def testDoWithBatchPredicate(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+
+    # Run the per-example executor first to get the reference.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+    expected = self._get_results(os.path.join(self._filtered_examples_dir, 'Split-eval'),
+                                 executor._FILTERED_EXAMPLES_FILE_PREFIX, tf.train.Example)
+
+    self._exec_properties[BATCH_PREDICATE_FN_KEY] = """
+def batch_predicate(record_batch):
+  import numpy as np
+  trip_miles = record_batch.column(record_batch.schema.get_field_index('trip_miles'))
+  return np.array([v is not None and v[0] > 42. for v in trip_miles.to_pylist()])
+"""
+    self._filtering_result.uri = os.path.join(self._output_data_dir, 'batch')
+
+    # Run executor.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+
+    # Check outputs.
+    results = self._get_results(os.path.join(self._output_data_dir, 'batch', 'Split-eval'),
+                                executor._FILTERED_EXAMPLES_FILE_PREFIX, tf.train.Example)
+    self.assertTrue(results)
+    self.assertLen(results, len(expected))
+
+  def testDoWritesOriginalRecords(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+
+    # Run executor.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+
+    # Check outputs are byte-identical to some input records.
+    input_records = set(self._get_records(os.path.join(self._source_data_dir, 'csv_example_gen', 'Split-eval', '*')))
+    results = self._get_records(os.path.join(self._filtered_examples_dir, 'Split-eval',
+                                             executor._FILTERED_EXAMPLES_FILE_PREFIX + '-?????-of-?????.gz'))
+    self.assertTrue(results)
+    for result in results:
+      self.assertIn(result, input_records)
+
+  def testDoWithOutputConfig(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[OUTPUT_CONFIG_KEY] = json.dumps({'compression': 'none', 'num_shards': 3})
+
+    # Run executor.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+
+    # Check outputs.
+    files = sorted(fileio.glob(os.path.join(self._filtered_examples_dir, 'Split-eval', '*')))
+    self.assertEqual([executor._FILTERED_EXAMPLES_FILE_PREFIX + '-0000%d-of-00003' % i for i in range(3)],
+                     [os.path.basename(f) for f in files])
+    records = [record.numpy() for record in tf.data.TFRecordDataset(files)]
+    self.assertTrue(records)
+
+    metadata = writer.read_shard_metadata(self._filtering_result, 'eval')
+    self.assertEqual(len(records), metadata['records'])
+    self.assertEqual([os.path.basename(f) for f in files], [shard['file'] for shard in metadata['shards']])
+
+  def testDoWithLazyDecoding(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[LAZY_DECODING_KEY] = 1
+
+    # Run executor.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+
+    # Check outputs.
+    self._verify_filtered_example_split('eval')
+
+  def testDoWithPredicateSpec(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+
+    # Run the per-example executor first to get the reference.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+    expected = self._get_records(os.path.join(self._filtered_examples_dir, 'Split-eval', '*'))
+
+    self._exec_properties[PREDICATE_SPEC_KEY] = json.dumps({'feature': 'trip_miles', 'op': '>', 'value': 42.})
+    self._filtering_result.uri = os.path.join(self._output_data_dir, 'spec')
+
+    # Run executor.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+
+    # Check outputs.
+    results = self._get_records(os.path.join(self._output_data_dir, 'spec', 'Split-eval', '*'))
+    self.assertTrue(results)
+    self.assertCountEqual(expected, results)
+
+  def testDoWithPredicateSpecAndSchema(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+
+    # Run the per-example executor first to get the reference.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+    expected = self._get_records(os.path.join(self._filtered_examples_dir, 'Split-eval', '*'))
+
+    # only trip_miles is decoded
+    schema = schema_pb2.Schema()
+    schema.feature.add(name='trip_miles', type=schema_pb2.FLOAT)
+    schema.feature.add(name='payment_type', type=schema_pb2.BYTES)
+    schema_artifact = standard_artifacts.Schema()
+    schema_artifact.uri = os.path.join(self._output_data_dir, 'schema')
+    io_utils.write_pbtxt_file(os.path.join(schema_artifact.uri, 'schema.pbtxt'), schema)
+    self._input_dict[SCHEMA_KEY] = [schema_artifact]
+
+    self._exec_properties[PREDICATE_SPEC_KEY] = json.dumps({'feature': 'trip_miles', 'op': '>', 'value': 42.})
+    self._filtering_result.uri = os.path.join(self._output_data_dir, 'spec')
+
+    # Run executor.
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(self._input_dict, self._output_dict_sr,
+                       self._exec_properties)
+
+    # Check outputs.
+    results = self._get_records(os.path.join(self._output_data_dir, 'spec', 'Split-eval', '*'))
+    self.assertTrue(results)
+    self.assertCountEqual(expected, results)
+
+    # the features of the spec must be in the schema
+    self._exec_properties[PREDICATE_SPEC_KEY] = json.dumps({'feature': 'trip_seconds', 'op': '>', 'value': 42})
+    with self.assertRaises(ValueError):
+      executor.Executor(self._context).Do(self._input_dict, self._output_dict_sr, self._exec_properties)
+
+  def testDoRefusesReferencedSplits(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SPLITS_TO_COPY_KEY] = json.dumps(['train'])
+    self._exec_properties[COPY_MODE_KEY] = 'reference'
+
+    # the output is an Examples artifact, the standard components cannot follow a reference
+    with self.assertRaises(ValueError):
+      executor.Executor(self._context).Do(self._input_dict, self._output_dict_sr, self._exec_properties)
+
+  def _incremental_run(self, examples, name, previous=None):
+    result = standard_artifacts.Examples()
+    result.uri = os.path.join(self._output_data_dir, name)
+    input_dict = {EXAMPLES_KEY: [examples]}
+    if previous is not None:
+      input_dict[PREVIOUS_FILTERED_EXAMPLES_KEY] = [previous]
+
+    filter_executor = executor.Executor(self._context)
+    filter_executor.Do(input_dict, {FILTERED_EXAMPLES_KEY: [result]}, self._exec_properties)
+    return result
+
+  def testDoIncremental(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[INCREMENTAL_KEY] = 1
+
+    # a copy of the examples we can add files to
+    examples = standard_artifacts.Examples()
+    examples.uri = os.path.join(self._output_data_dir, 'examples')
+    examples.split_names = artifact_utils.encode_split_names(['eval'])
+    source_dir = os.path.join(self._examples.uri, 'Split-eval')
+    input_dir = os.path.join(examples.uri, 'Split-eval')
+    fileio.makedirs(input_dir)
+    filenames = fileio.listdir(source_dir)
+    for filename in filenames:
+      fileio.copy(os.path.join(source_dir, filename), os.path.join(input_dir, filename))
+
+    # first run: everything is filtered, one output per input file
+    first = self._incremental_run(examples, 'first')
+    self.assertTrue(fileio.exists(os.path.join(first.uri, executor._MANIFEST_FILE)))
+    first_outputs = fileio.listdir(os.path.join(first.uri, 'Split-eval'))
+    self.assertLen(first_outputs, len(filenames))
+    expected = self._get_records(os.path.join(first.uri, 'Split-eval', '*'))
+    self.assertTrue(expected)
+
+    # second run with a new file: the outputs of the old files are reused
+    fileio.copy(os.path.join(source_dir, filenames[0]), os.path.join(input_dir, 'new-' + filenames[0]))
+    second = self._incremental_run(examples, 'second', previous=first)
+    self.assertLen(fileio.listdir(os.path.join(second.uri, 'Split-eval')), len(filenames) + 1)
+    for output in first_outputs:
+      self.assertTrue(os.path.samefile(os.path.join(first.uri, 'Split-eval', output),
+                                       os.path.join(second.uri, 'Split-eval', output)))
+    self.assertLen(self._get_records(os.path.join(second.uri, 'Split-eval', '*')),
+                   len(expected) + len(self._get_records(os.path.join(first.uri, 'Split-eval', first_outputs[0]))))
+
+    # a new predicate: everything is filtered again
+    self._exec_properties[PREDICATE_FN_KEY] = """
+def predicate(m):
+  return m.features.feature['trip_miles'].float_list.value[0] > 10.
+"""
+    third = self._incremental_run(examples, 'third', previous=second)
+    for output in first_outputs:
+      self.assertFalse(os.path.samefile(os.path.join(second.uri, 'Split-eval', output),
+                                        os.path.join(third.uri, 'Split-eval', output)))
+    self.assertGreater(len(self._get_records(os.path.join(third.uri, 'Split-eval', '*'))),
+                       len(self._get_records(os.path.join(second.uri, 'Split-eval', '*'))))
+
+  def testDoIncrementalWithPredicateSpec(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[PREDICATE_SPEC_KEY] = json.dumps({'feature': 'trip_miles', 'op': '>', 'value': 42.})
+
+    expected = self._incremental_run(self._examples, 'batch')
+    self._exec_properties[INCREMENTAL_KEY] = 1
+    result = self._incremental_run(self._examples, 'incremental')
+
+    # one output per input file, even the ones without any kept record
+    self.assertLen(fileio.listdir(os.path.join(result.uri, 'Split-eval')),
+                   len(fileio.listdir(os.path.join(self._examples.uri, 'Split-eval'))))
+    expected_records = self._get_records(os.path.join(expected.uri, 'Split-eval', '*'))
+    self.assertTrue(expected_records)
+    self.assertCountEqual(expected_records, self._get_records(os.path.join(result.uri, 'Split-eval', '*')))
+
 
 if __name__ == '__main__':
   tf.test.main()
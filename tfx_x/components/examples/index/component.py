@@ -0,0 +1,103 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Index the records of examples for random-access reads"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from typing import Optional, Text, List
+
+from tfx import types
+from tfx.dsl.components.base import base_component
+from tfx.dsl.components.base import executor_spec
+from tfx.types import ComponentSpec
+from tfx.types import standard_artifacts
+from tfx.types.component_spec import ChannelParameter, ExecutionParameter
+from tfx.utils import json_utils
+
+from tfx_x.components.examples.index import executor
+from tfx_x.components.examples.index.executor import SPLITS_TO_TRANSFORM_KEY, EXAMPLES_INDEX_KEY, EXAMPLES_KEY, \
+  PIPELINE_CONFIGURATION_KEY, TO_KEY_FN_KEY, TO_KEY_FN_KEY_KEY, LAZY_DECODING_KEY
+from tfx_x import PipelineConfiguration, ExamplesIndex
+
+
+class IndexSpec(ComponentSpec):
+  """Index component spec."""
+
+  PARAMETERS = {
+    SPLITS_TO_TRANSFORM_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    TO_KEY_FN_KEY: ExecutionParameter(type=Text, optional=True),
+    TO_KEY_FN_KEY_KEY: ExecutionParameter(type=Text, optional=True),
+    LAZY_DECODING_KEY: ExecutionParameter(type=int, optional=True),
+  }
+  INPUTS = {
+    EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+    PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+  }
+  OUTPUTS = {
+    EXAMPLES_INDEX_KEY: ChannelParameter(type=ExamplesIndex),
+  }
+
+
+class Index(base_component.BaseComponent):
+  """A TFX component to index the records of examples.
+  Index consumes examples data, and produces an `ExamplesIndex`: the offset and length of each record of each file
+  - and optionally its key - so that records can be read by position, see `utils.read_indexed_records()`. The size
+  and modification time of each file are recorded too: an index whose files changed since is refused.
+
+  ## Example
+    >>> index = Index(
+    >>>    examples=example_gen.outputs['examples'],
+    >>>    to_key_fn=to_key_fn)
+
+  """
+
+  SPEC_CLASS = IndexSpec
+  EXECUTOR_SPEC = executor_spec.BeamExecutorSpec(executor.Executor)
+
+  def __init__(self,
+               examples: types.Channel,
+               pipeline_configuration: Optional[types.Channel] = None,
+               examples_index: Optional[types.Channel] = None,
+               splits_to_transform: Optional[List[Text]] = None,
+               to_key_fn: Optional[Text] = None,
+               to_key_fn_key: Optional[Text] = 'to_key_fn',
+               lazy_decoding: Optional[bool] = None):
+    """Construct an Index component.
+    Args:
+      examples: A Channel of 'Examples' type, usually produced by ExampleGen
+        component. _required_
+      pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig
+        component.
+      examples_index: Channel of `ExamplesIndex` to store the index.
+      splits_to_transform: Optional list of split names to index - default is all the splits.
+      to_key_fn: Optional to key function, the function that will extract the key stored with each record - must be
+                 'to_key: Example -> key'. Keys are stored as strings: the utf-8 string of bytes keys, `str(key)`
+                 otherwise.
+      to_key_fn_key: the name of the key that contains the to_key_fn - default is 'to_key_fn'.
+      lazy_decoding: If true (default is false), `to_key` gets a `LazyExample` which only decodes the features it
+                 accesses - `m.features.feature[name]` works as with a `tf.train.Example`.
+    """
+    examples_index = examples_index or types.Channel(type=ExamplesIndex)
+
+    spec = IndexSpec(
+      examples=examples,
+      pipeline_configuration=pipeline_configuration,
+      examples_index=examples_index,
+      splits_to_transform=None if splits_to_transform is None else json_utils.dumps(splits_to_transform),
+      to_key_fn=to_key_fn,
+      to_key_fn_key=to_key_fn_key,
+      lazy_decoding=None if lazy_decoding is None else int(lazy_decoding))
+    super(Index, self).__init__(spec=spec)
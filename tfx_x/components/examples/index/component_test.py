@@ -0,0 +1,40 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+from tfx.types import channel_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples.index.component import Index
+from tfx_x.components.examples.index.executor import EXAMPLES_INDEX_KEY, LAZY_DECODING_KEY
+
+
+class ComponentTest(tf.test.TestCase):
+
+  def testConstruct(self):
+    index = Index(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      to_key_fn='def to_key(m):\n  return 1',
+      lazy_decoding=False)
+    self.assertEqual('ExamplesIndex', index.outputs[EXAMPLES_INDEX_KEY].type_name)
+    self.assertEqual(0, index.exec_properties[LAZY_DECODING_KEY])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,182 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""TFX index executor."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+from typing import Any, Dict, Mapping, List, Optional, Text
+
+import apache_beam as beam
+import tensorflow as tf
+from absl import logging
+from tfx import types
+from tfx.dsl.components.base import base_beam_executor
+from tfx.types import artifact_utils, Artifact
+from tfx.utils import io_utils, json_utils
+
+from tfx_x.components import utils
+from tfx_x.components.examples.lazy_example import LazyExample
+from tfx_x.components.examples.stratified_sampler import sampling
+
+EXAMPLES_INDEX_KEY = 'examples_index'
+EXAMPLES_KEY = 'examples'
+SPLITS_TO_TRANSFORM_KEY = 'splits_to_transform'
+PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+TO_KEY_FN_KEY = 'to_key_fn'
+TO_KEY_FN_KEY_KEY = 'to_key_fn_key'
+LAZY_DECODING_KEY = 'lazy_decoding'
+
+
+class Executor(base_beam_executor.BaseBeamExecutor):
+  """TFX index executor."""
+
+  def Do(self, input_dict: Dict[Text, List[types.Artifact]],
+         output_dict: Dict[Text, List[types.Artifact]],
+         exec_properties: Dict[Text, Any]) -> None:
+    """Indexes the records of the given input examples.
+    Args:
+      input_dict: Input dict from input key to a list of Artifacts.
+        - examples: examples to index.
+        - pipeline_configuration: optional PipelineConfiguration artifact.
+      output_dict: Output dict from output key to a list of Artifacts.
+        - examples_index: the offset, length - and key - of each record of each file of the indexed splits.
+      exec_properties: A dict of execution properties.
+        - splits_to_transform: list of splits to index - default is all the splits.
+        - to_key_fn: optional function to extract the key of the records - 'to_key: Example -> key' - stored as a
+          column of the index.
+        - to_key_fn_key: alternate name for the key containing the def of `to_key()`
+        - lazy_decoding: if true (default is false), `to_key()` gets a `LazyExample` which only decodes the features it
+          accesses.
+    Returns:
+      None
+    """
+    self._log_startup(input_dict, output_dict, exec_properties)
+
+    examples = input_dict[EXAMPLES_KEY]
+
+    # Priority is as follow:
+    # 1. default value
+    # 2. from PipelineConfiguration
+    # 3. from exec_properties
+
+    splits_to_transform = artifact_utils.decode_split_names(
+      artifact_utils.get_single_instance(examples).split_names)
+    to_key_fn = None
+    lazy_decoding = False
+    to_key_fn_key = exec_properties[TO_KEY_FN_KEY_KEY] if TO_KEY_FN_KEY_KEY in exec_properties else TO_KEY_FN_KEY
+
+    if PIPELINE_CONFIGURATION_KEY in input_dict:
+      pipeline_configuration_dir = artifact_utils.get_single_uri(input_dict[PIPELINE_CONFIGURATION_KEY])
+      pipeline_configuration_file = os.path.join(pipeline_configuration_dir, 'custom_config.json')
+      pipeline_configuration_str = io_utils.read_string_file(pipeline_configuration_file)
+      pipeline_configuration = json.loads(pipeline_configuration_str)
+
+      if SPLITS_TO_TRANSFORM_KEY in pipeline_configuration:
+        splits_to_transform = pipeline_configuration[SPLITS_TO_TRANSFORM_KEY]
+
+      if to_key_fn_key in pipeline_configuration:
+        to_key_fn = pipeline_configuration[to_key_fn_key]
+
+      if LAZY_DECODING_KEY in pipeline_configuration:
+        lazy_decoding = bool(pipeline_configuration[LAZY_DECODING_KEY])
+
+    # Now looking at the exec_properties
+    if SPLITS_TO_TRANSFORM_KEY in exec_properties and exec_properties[SPLITS_TO_TRANSFORM_KEY] is not None:
+      splits_to_transform = json_utils.loads(exec_properties[SPLITS_TO_TRANSFORM_KEY])
+
+    if TO_KEY_FN_KEY in exec_properties and exec_properties[TO_KEY_FN_KEY] is not None:
+      to_key_fn = exec_properties[TO_KEY_FN_KEY]
+
+    if to_key_fn_key in exec_properties and exec_properties[to_key_fn_key] is not None:
+      to_key_fn = exec_properties[to_key_fn_key]
+
+    if LAZY_DECODING_KEY in exec_properties and exec_properties[LAZY_DECODING_KEY] is not None:
+      lazy_decoding = bool(exec_properties[LAZY_DECODING_KEY])
+
+    # Validate we have all we need
+    if EXAMPLES_KEY not in input_dict:
+      raise ValueError('\'examples\' is missing in input dict.')
+
+    if EXAMPLES_INDEX_KEY not in output_dict:
+      raise ValueError('\'examples_index\' is missing in output dict.')
+
+    index_artifact = artifact_utils.get_single_instance(output_dict[EXAMPLES_INDEX_KEY])
+    index_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform)
+
+    example_uris = {}
+
+    for split in splits_to_transform:
+      data_uri = utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
+      example_uris[split] = data_uri
+
+    self._run_indexing(example_uris,
+                       index_artifact=index_artifact,
+                       to_key_fn=to_key_fn,
+                       lazy_decoding=lazy_decoding)
+
+    logging.info('Index generates the index of the examples to %s', index_artifact.uri)
+
+  def _run_indexing(self,
+                    example_uris: Mapping[Text, Text],
+                    index_artifact: Artifact,
+                    to_key_fn: Optional[Text] = None,
+                    lazy_decoding: bool = False) -> None:
+    """Indexes the files of given example data, one Beam element per file.
+    Args:
+      example_uris: Mapping of example split name to example uri.
+      index_artifact: Output ExamplesIndex artifact.
+      to_key_fn: optional function to convert an example to a key.
+      lazy_decoding: whether to pass a `LazyExample` to `to_key` instead of a `tf.train.Example`.
+    Returns:
+      None
+    """
+
+    record_to_key = None
+    if to_key_fn is not None:
+      d = {}
+      exec(to_key_fn, globals(), d)  # how ugly is that?
+      to_key = d['to_key']
+
+      decode = LazyExample if lazy_decoding else tf.train.Example.FromString
+
+      def record_to_key(record: bytes) -> Text:
+        return sampling.key_name(to_key(decode(record)))
+
+    with self._make_beam_pipeline() as pipeline:
+      for split_name, example_uri in example_uris.items():
+        index_dir = artifact_utils.get_split_uri([index_artifact], split_name)
+        files = [path for path in tf.io.gfile.glob(io_utils.all_files_pattern(example_uri))
+                 if not tf.io.gfile.isdir(path)]
+
+        def index_file(path: Text, index_dir: Text = index_dir) -> Dict[Text, Any]:
+          # taken first, so that a file changed while it is indexed is not taken for its index
+          fingerprint = utils.file_fingerprint(path)
+          offsets, lengths, keys = utils.index_tfrecord_file(path, to_key=record_to_key)
+          return utils.write_shard_index(index_dir, path, offsets, lengths, keys, fingerprint=fingerprint)
+
+        _ = (
+            pipeline
+            | 'InputFiles[{}]'.format(split_name) >> beam.Create(files)
+            | 'Reshuffle[{}]'.format(split_name) >> beam.Reshuffle()
+            | 'IndexFiles[{}]'.format(split_name) >> beam.Map(index_file)
+            | 'CollectShards[{}]'.format(split_name) >> beam.combiners.ToList()
+            | 'WriteManifest[{}]'.format(split_name) >> beam.Map(
+          lambda shards, index_dir=index_dir: utils.write_split_index_manifest(index_dir, shards)))
+        logging.info('Index of split %s (%d files) written to %s.', split_name, len(files), index_dir)
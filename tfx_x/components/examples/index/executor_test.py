@@ -0,0 +1,109 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+
+import tensorflow as tf
+from tfx.dsl.io import fileio
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+
+from tfx_x import ExamplesIndex
+from tfx_x.components import utils
+from tfx_x.components.examples.index import executor
+from tfx_x.components.examples.index.executor import EXAMPLES_INDEX_KEY, EXAMPLES_KEY, SPLITS_TO_TRANSFORM_KEY, \
+  TO_KEY_FN_KEY
+
+
+class ExecutorTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ExecutorTest, self).setUp()
+    self._source_data_dir = os.path.join(
+      os.path.dirname(os.path.dirname(__file__)), 'testdata')
+    self._output_data_dir = os.path.join(
+      os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+      self._testMethodName)
+    self.component_id = 'test_component'
+
+    # Create input dict.
+    self._examples = standard_artifacts.Examples()
+    self._examples.uri = os.path.join(self._source_data_dir, 'csv_example_gen')
+
+    self._examples.split_names = artifact_utils.encode_split_names(
+      ['train', 'eval', 'unlabelled'])
+
+    self._input_dict = {
+      EXAMPLES_KEY: [self._examples],
+    }
+
+    # Create output dict.
+    self._index = ExamplesIndex()
+    self._index.uri = os.path.join(self._output_data_dir, "something")
+
+    self._output_dict = {
+      EXAMPLES_INDEX_KEY: [self._index],
+    }
+
+    # Create exe properties.
+    self._exec_properties = {
+      'component_id': self.component_id,
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval']),
+    }
+
+    # Create context
+    self._tmp_dir = os.path.join(self._output_data_dir, '.temp')
+    self._context = executor.Executor.Context(
+      tmp_dir=self._tmp_dir, unique_id='2')
+
+  def _get_records(self, filepattern):
+    records = []
+    for f in sorted(fileio.glob(filepattern)):
+      records.extend(tf.compat.v1.python_io.tf_record_iterator(
+        path=f,
+        options=tf.compat.v1.python_io.TFRecordOptions(
+          tf.compat.v1.python_io.TFRecordCompressionType.GZIP)))
+    return records
+
+  def testDo(self):
+    index = executor.Executor(self._context)
+    index.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+    self.assertEqual(['eval'], artifact_utils.decode_split_names(self._index.split_names))
+    split_index = utils.load_examples_index(self._index, 'eval')
+    self.assertIsNone(split_index.keys)
+
+    records = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    self.assertEqual(len(records), split_index.num_records)
+
+    positions = [len(records) - 1, 0, len(records) // 2]
+    self.assertEqual([records[i] for i in positions], utils.read_indexed_records(split_index, positions))
+
+  def testDoWithKeys(self):
+    self._exec_properties[TO_KEY_FN_KEY] = """
+def to_key(m):
+  return m.features.feature['trip_miles'].float_list.value[0] > 42.
+"""
+    index = executor.Executor(self._context)
+    index.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+    split_index = utils.load_examples_index(self._index, 'eval')
+    self.assertEqual(split_index.num_records, len(split_index.keys))
+    self.assertCountEqual(['False', 'True'], set(split_index.keys))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,179 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Lazy, partially decoded view of a serialized tf.train.Example."""
+
+from typing import Dict, Iterator, Optional, Text, Tuple
+
+import tensorflow as tf
+
+# tag of field #1 with wire type 2 (length-delimited):
+#   Example.features, Features.feature (map entry) and map entry key.
+_FIELD_1_TAG = (1 << 3) | 2
+# tag of field #2 with wire type 2: map entry value.
+_FIELD_2_TAG = (2 << 3) | 2
+
+
+def _read_varint(buffer: bytes, pos: int) -> Tuple[int, int]:
+  result = 0
+  shift = 0
+  while True:
+    b = buffer[pos]
+    pos += 1
+    result |= (b & 0x7f) << shift
+    if not b & 0x80:
+      return result, pos
+    shift += 7
+
+
+def _skip_field(buffer: bytes, pos: int, wire_type: int) -> int:
+  if wire_type == 0:
+    _, pos = _read_varint(buffer, pos)
+    return pos
+  if wire_type == 1:
+    return pos + 8
+  if wire_type == 2:
+    length, pos = _read_varint(buffer, pos)
+    return pos + length
+  if wire_type == 5:
+    return pos + 4
+  raise ValueError('Unsupported wire type {}'.format(wire_type))
+
+
+def _index_map_entry(buffer: bytes, pos: int, end: int) -> Tuple[Text, Optional[Tuple[int, int]]]:
+  key = ''
+  value = None
+  while pos < end:
+    tag, pos = _read_varint(buffer, pos)
+    if tag == _FIELD_1_TAG:
+      length, pos = _read_varint(buffer, pos)
+      key = buffer[pos:pos + length].decode('utf-8')
+      pos += length
+    elif tag == _FIELD_2_TAG:
+      length, pos = _read_varint(buffer, pos)
+      value = (pos, pos + length)
+      pos += length
+    else:
+      pos = _skip_field(buffer, pos, tag & 0x7)
+  return key, value
+
+
+def _index_features(buffer: bytes, pos: int, end: int, index: Dict[Text, Optional[Tuple[int, int]]]) -> None:
+  while pos < end:
+    tag, pos = _read_varint(buffer, pos)
+    if tag == _FIELD_1_TAG:
+      length, pos = _read_varint(buffer, pos)
+      key, value = _index_map_entry(buffer, pos, pos + length)
+      index[key] = value
+      pos += length
+    else:
+      pos = _skip_field(buffer, pos, tag & 0x7)
+
+
+def index_features(record: bytes) -> Dict[Text, Optional[Tuple[int, int]]]:
+  """Scans a serialized tf.train.Example and locates its features without decoding them.
+  Args:
+    record: a serialized tf.train.Example.
+  Returns:
+    a dict from feature name to the (start, end) span of the serialized tf.train.Feature in `record`
+    (None for an empty feature).
+  """
+  index = {}
+  pos = 0
+  end = len(record)
+  while pos < end:
+    tag, pos = _read_varint(record, pos)
+    if tag == _FIELD_1_TAG:
+      length, pos = _read_varint(record, pos)
+      _index_features(record, pos, pos + length, index)
+      pos += length
+    else:
+      pos = _skip_field(record, pos, tag & 0x7)
+  return index
+
+
+class LazyFeatureMap(object):
+  """Read-only stand-in for `Example.features.feature` which decodes a tf.train.Feature when accessed."""
+
+  def __init__(self, record: bytes):
+    self._record = record
+    self._index = index_features(record)
+    self._decoded = {}
+
+  def __getitem__(self, key: Text) -> tf.train.Feature:
+    feature = self._decoded.get(key)
+    if feature is None:
+      span = self._index.get(key)
+      if span is None:
+        # like a proto map: missing features read as empty ones
+        feature = tf.train.Feature()
+      else:
+        feature = tf.train.Feature.FromString(self._record[span[0]:span[1]])
+      self._decoded[key] = feature
+    return feature
+
+  def __contains__(self, key: Text) -> bool:
+    return key in self._index
+
+  def __len__(self) -> int:
+    return len(self._index)
+
+  def __iter__(self) -> Iterator[Text]:
+    return iter(self._index)
+
+  def get(self, key: Text, default=None):
+    if key not in self._index:
+      return default
+    return self[key]
+
+  def keys(self):
+    return self._index.keys()
+
+  def values(self):
+    return [self[key] for key in self._index]
+
+  def items(self):
+    return [(key, self[key]) for key in self._index]
+
+
+class LazyFeatures(object):
+  """Read-only stand-in for `Example.features`."""
+
+  def __init__(self, record: bytes):
+    self.feature = LazyFeatureMap(record)
+
+
+class LazyExample(object):
+  """Read-only view of a serialized tf.train.Example which only decodes the features that are accessed.
+
+  Supports the `m.features.feature[name].float_list.value` access pattern used in `predicate` and
+  `to_key` functions. Use `ToExample()` to get the fully decoded tf.train.Example.
+  """
+
+  def __init__(self, record: bytes):
+    self._record = record
+    self._features = None
+
+  @property
+  def features(self) -> LazyFeatures:
+    if self._features is None:
+      self._features = LazyFeatures(self._record)
+    return self._features
+
+  def SerializeToString(self) -> bytes:  # pylint: disable=invalid-name
+    return self._record
+
+  def ToExample(self) -> tf.train.Example:  # pylint: disable=invalid-name
+    return tf.train.Example.FromString(self._record)
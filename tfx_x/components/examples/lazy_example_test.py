@@ -0,0 +1,63 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tensorflow as tf
+
+from tfx_x.components.examples.lazy_example import LazyExample
+
+
+class LazyExampleTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(LazyExampleTest, self).setUp()
+    self._example = tf.train.Example(features=tf.train.Features(feature={
+      'image_floats': tf.train.Feature(float_list=tf.train.FloatList(value=[0.5] * 784)),
+      'image_class': tf.train.Feature(int64_list=tf.train.Int64List(value=[7])),
+      'name': tf.train.Feature(bytes_list=tf.train.BytesList(value=[b'seven'])),
+      'empty': tf.train.Feature(),
+    }))
+    self._record = self._example.SerializeToString()
+
+  def testAccess(self):
+    m = LazyExample(self._record)
+    self.assertEqual([7], m.features.feature['image_class'].int64_list.value)
+    self.assertEqual([b'seven'], m.features.feature['name'].bytes_list.value)
+    self.assertLen(m.features.feature['image_floats'].float_list.value, 784)
+    self.assertEqual(self._example.features.feature['empty'], m.features.feature['empty'])
+
+  def testMissingFeature(self):
+    m = LazyExample(self._record)
+    self.assertNotIn('missing', m.features.feature)
+    self.assertIsNone(m.features.feature.get('missing'))
+    self.assertEmpty(m.features.feature['missing'].float_list.value)
+
+  def testMapInterface(self):
+    m = LazyExample(self._record)
+    self.assertLen(m.features.feature, 4)
+    self.assertCountEqual(['image_floats', 'image_class', 'name', 'empty'], list(m.features.feature))
+    self.assertEqual(dict(self._example.features.feature.items()), dict(m.features.feature.items()))
+
+  def testRoundTrip(self):
+    m = LazyExample(self._record)
+    self.assertEqual(self._record, m.SerializeToString())
+    self.assertEqual(self._example, m.ToExample())
+
+  def testEmptyRecord(self):
+    m = LazyExample(b'')
+    self.assertEmpty(m.features.feature)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,124 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Filter, map and sample examples in a single pass"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from typing import Any, Dict, Optional, Text, List
+
+from tfx import types
+from tfx.dsl.components.base import base_component
+from tfx.dsl.components.base import executor_spec
+from tfx.types import ComponentSpec
+from tfx.types import standard_artifacts
+from tfx.types.component_spec import ChannelParameter, ExecutionParameter
+from tfx.utils import json_utils
+
+from tfx_x.components.examples.ops import executor
+from tfx_x.components.examples.ops.executor import SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY, \
+  PROCESSED_EXAMPLES_KEY, EXAMPLES_KEY, PIPELINE_CONFIGURATION_KEY, OPS_KEY, LAZY_DECODING_KEY, COPY_MODE_KEY, \
+  OUTPUT_CONFIG_KEY
+from tfx_x import PipelineConfiguration
+
+
+class ExamplesOpsSpec(ComponentSpec):
+  """ExamplesOps component spec."""
+
+  PARAMETERS = {
+    SPLITS_TO_TRANSFORM_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    SPLITS_TO_COPY_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    OPS_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    LAZY_DECODING_KEY: ExecutionParameter(type=int, optional=True),
+    COPY_MODE_KEY: ExecutionParameter(type=Text, optional=True),
+    OUTPUT_CONFIG_KEY: ExecutionParameter(type=(str, Text), optional=True),
+  }
+  INPUTS = {
+    EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+    PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+  }
+  OUTPUTS = {
+    PROCESSED_EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+  }
+
+
+class ExamplesOps(base_component.BaseComponent):
+  """A TFX component to filter, map and sample examples.
+  ExamplesOps consumes examples data, applies a list of ops in a single read-parse-write pass and produces
+  examples data - instead of chaining `Filter` and `StratifiedSampler` with an intermediate artifact.
+
+  ## Example
+    >>> ops = ExamplesOps(
+    >>>    examples=example_gen.outputs['examples'],
+    >>>    ops=[{'op': 'filter', 'predicate_fn': "def predicate(m):..."},
+    >>>         {'op': 'sample', 'to_key_fn': "def to_key(m):...", 'samples_per_key': 1200}])
+
+  """
+
+  SPEC_CLASS = ExamplesOpsSpec
+  EXECUTOR_SPEC = executor_spec.BeamExecutorSpec(executor.Executor)
+
+  def __init__(self,
+               examples: types.Channel,
+               ops: Optional[List[Dict[Text, Any]]] = None,
+               pipeline_configuration: Optional[types.Channel] = None,
+               processed_examples: Optional[types.Channel] = None,
+               splits_to_transform: Optional[List[Text]] = None,
+               splits_to_copy: Optional[List[Text]] = None,
+               lazy_decoding: Optional[bool] = None,
+               copy_mode: Optional[Text] = None,
+               output_config: Optional[Dict[Text, Any]] = None):
+    """Construct an ExamplesOps component.
+    Args:
+      examples: A Channel of 'Examples' type, usually produced by ExampleGen
+        component. _required_
+      ops: The ops to apply in order, each a dict with an 'op' and its arguments - they can also come from the
+                 `pipeline_configuration` under the 'ops' key:
+                 - {'op': 'filter', 'predicate_fn': ...} or {'op': 'filter', 'predicate_spec': ...} as for `Filter`,
+                 - {'op': 'map', 'map_fn': ...} where `map_fn` defines 'map_example: tf.train.Example ->
+                   tf.train.Example', for example:
+                   >>> def map_example(m):
+                   >>>   m.features.feature['trip_km'].float_list.value.append(
+                   >>>     m.features.feature['trip_miles'].float_list.value[0] * 1.609)
+                   >>>   return m
+                 - {'op': 'sample', 'to_key_fn': ..., 'samples_per_key': ...} with the optional
+                   'samples_per_key_map', 'allocation', 'sampling_engine', 'sampling_seed' and 'hot_key_fanout' of
+                   `StratifiedSampler`.
+      pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig
+        component.
+      processed_examples: Channel of `Examples` to store the processed examples.
+      splits_to_transform: Optional list of split names to transform.
+      splits_to_copy: Optional list of split names to copy.
+      lazy_decoding: If true (default is false), the predicates and `to_key` get a `LazyExample` which only decodes the
+                 features they access - `m.features.feature[name]` works as with a `tf.train.Example`.
+      copy_mode: How `splits_to_copy` are passed through: 'copy' (default) or 'link' to hard link their files - they
+                 are copied when they cannot be linked.
+      output_config: Compression and sharding of the processed examples: 'compression' is 'gzip' (default) or
+                 'none', 'num_shards' a fixed number of files or 'target_shard_bytes' the size of the serialized
+                 records of each file - the runner picks the number of files otherwise.
+    """
+    processed_examples = processed_examples or types.Channel(type=standard_artifacts.Examples)
+
+    spec = ExamplesOpsSpec(
+      examples=examples,
+      pipeline_configuration=pipeline_configuration,
+      processed_examples=processed_examples,
+      splits_to_transform=json_utils.dumps(splits_to_transform),
+      splits_to_copy=json_utils.dumps(splits_to_copy),
+      ops=None if ops is None else json_utils.dumps(ops),
+      lazy_decoding=None if lazy_decoding is None else int(lazy_decoding),
+      copy_mode=copy_mode,
+      output_config=None if output_config is None else json_utils.dumps(output_config))
+    super(ExamplesOps, self).__init__(spec=spec)
@@ -0,0 +1,54 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+
+import tensorflow as tf
+from tfx import types
+from tfx.types import channel_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples.ops.component import ExamplesOps
+from tfx_x.components.examples.ops.executor import PROCESSED_EXAMPLES_KEY, OPS_KEY
+from tfx_x import PipelineConfiguration
+
+
+class ComponentTest(tf.test.TestCase):
+
+  def testConstruct(self):
+    ops = [{'op': 'filter', 'predicate_spec': {'feature': 'trip_miles', 'op': '>', 'value': 42.}},
+           {'op': 'sample', 'to_key_fn': 'def to_key(m):\n  return 0\n', 'samples_per_key': 10}]
+    examples_ops = ExamplesOps(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      ops=ops,
+      splits_to_transform=['eval'],
+      splits_to_copy=['train'])
+    self.assertEqual('Examples', examples_ops.outputs[PROCESSED_EXAMPLES_KEY].type_name)
+    self.assertEqual(ops, json.loads(examples_ops.exec_properties[OPS_KEY]))
+
+  def testConstructWithPipelineConfiguration(self):
+    examples_ops = ExamplesOps(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      pipeline_configuration=types.Channel(type=PipelineConfiguration))
+    self.assertEqual('Examples', examples_ops.outputs[PROCESSED_EXAMPLES_KEY].type_name)
+    self.assertIsNone(examples_ops.exec_properties[OPS_KEY])
+
+
+if __name__ == '__main__':
+  tf.test.main()
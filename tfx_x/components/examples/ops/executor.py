@@ -0,0 +1,326 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""TFX examples_ops executor."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+from typing import Any, Callable, Dict, Mapping, List, Text
+
+import apache_beam as beam
+import tensorflow as tf
+from absl import logging
+from tfx import types
+from tfx.dsl.components.base import base_beam_executor
+from tfx.types import artifact_utils, Artifact
+from tfx.utils import io_utils, json_utils
+
+from tfx_x.components import utils
+from tfx_x.components.examples import predicate_spec as predicate_spec_lib
+from tfx_x.components.examples import writer
+from tfx_x.components.examples.lazy_example import LazyExample
+from tfx_x.components.examples.stratified_sampler import sampling
+
+PROCESSED_EXAMPLES_KEY = 'processed_examples'
+EXAMPLES_KEY = 'examples'
+OPS_KEY = 'ops'
+SPLITS_TO_COPY_KEY = 'splits_to_copy'
+SPLITS_TO_TRANSFORM_KEY = 'splits_to_transform'
+PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+LAZY_DECODING_KEY = 'lazy_decoding'
+COPY_MODE_KEY = 'copy_mode'
+OUTPUT_CONFIG_KEY = 'output_config'
+
+FILTER_OP = 'filter'
+MAP_OP = 'map'
+SAMPLE_OP = 'sample'
+OPS = (FILTER_OP, MAP_OP, SAMPLE_OP)
+
+_PROCESSED_EXAMPLES_FILE_PREFIX = 'processed_examples'
+
+# applies an op to a PCollection of serialized records, the second argument is the label of the split
+_CompiledOp = Callable[[beam.PCollection, Text], beam.PCollection]
+
+
+def _user_function(fn: Text, name: Text) -> Callable[..., Any]:
+  d = {}
+  exec(fn, globals(), d)  # how ugly is that?
+  if name not in d:
+    raise ValueError('\'{}\' is not defined by: {}'.format(name, fn))
+  return d[name]
+
+
+def _compile_filter(op: Dict[Text, Any], label: Text, lazy_decoding: bool) -> _CompiledOp:
+  if op.get('predicate_spec') is not None:
+    predicate = predicate_spec_lib.compile_predicate(op['predicate_spec'])
+
+    def apply_spec(records: beam.PCollection, split_name: Text) -> beam.PCollection:
+      return (
+          records
+          | 'Batch {} ({})'.format(label, split_name) >> beam.BatchElements()
+          | 'FilterBatches {} ({})'.format(label, split_name) >> beam.FlatMap(predicate.filter_records))
+
+    return apply_spec
+
+  if op.get('predicate_fn') is None:
+    raise ValueError('\'predicate_fn\' or \'predicate_spec\' is missing in {}: {!r}'.format(label, op))
+
+  predicate = _user_function(op['predicate_fn'], 'predicate')
+  decode = LazyExample if lazy_decoding else tf.train.Example.FromString
+
+  def keep_record(record: bytes) -> bool:
+    return predicate(decode(record))
+
+  def apply_predicate(records: beam.PCollection, split_name: Text) -> beam.PCollection:
+    return records | 'Filter {} ({})'.format(label, split_name) >> beam.Filter(keep_record)
+
+  return apply_predicate
+
+
+def _compile_map(op: Dict[Text, Any], label: Text) -> _CompiledOp:
+  if op.get('map_fn') is None:
+    raise ValueError('\'map_fn\' is missing in {}: {!r}'.format(label, op))
+
+  map_example = _user_function(op['map_fn'], 'map_example')
+
+  def map_record(record: bytes) -> bytes:
+    # the example is fully decoded so that it can be modified in place
+    return map_example(tf.train.Example.FromString(record)).SerializeToString()
+
+  def apply_map(records: beam.PCollection, split_name: Text) -> beam.PCollection:
+    return records | 'Map {} ({})'.format(label, split_name) >> beam.Map(map_record)
+
+  return apply_map
+
+
+def _compile_sample(op: Dict[Text, Any], label: Text, lazy_decoding: bool) -> _CompiledOp:
+  if op.get('to_key_fn') is None:
+    raise ValueError('\'to_key_fn\' is missing in {}: {!r}'.format(label, op))
+
+  sampling_engine = op.get('sampling_engine') or sampling.RESERVOIR_ENGINE
+  if sampling_engine not in sampling.STREAMING_ENGINES:
+    raise ValueError('Unknown sampling engine: {!r} - must be one of {}'.format(sampling_engine,
+                                                                                sampling.STREAMING_ENGINES))
+
+  sample_sizes = sampling.SampleSizes(op.get('samples_per_key'), op.get('samples_per_key_map'), op.get('allocation'))
+  if not sample_sizes.is_fixed and sampling_engine == sampling.RESERVOIR_ENGINE:
+    raise ValueError('\'samples_per_key_map\' and \'allocation\' are not supported by the \'reservoir\' engine.')
+
+  to_key = _user_function(op['to_key_fn'], 'to_key')
+  decode = LazyExample if lazy_decoding else tf.train.Example.FromString
+
+  def record_to_key(record: bytes):
+    return to_key(decode(record))
+
+  def apply_sample(records: beam.PCollection, split_name: Text) -> beam.PCollection:
+    keyed_records = records | 'Key {} ({})'.format(label, split_name) >> beam.ParDo(
+      sampling.KeyRecords(record_to_key))
+    keyed_samples, _ = sampling.sample_keyed_records(keyed_records,
+                                                     label='{} ({})'.format(label, split_name),
+                                                     sample_sizes=sample_sizes,
+                                                     sampling_engine=sampling_engine,
+                                                     sampling_seed=op.get('sampling_seed') or 0,
+                                                     hot_key_fanout=op.get('hot_key_fanout'))
+    return keyed_samples | 'Records {} ({})'.format(label, split_name) >> beam.Values()
+
+  return apply_sample
+
+
+def compile_ops(ops: List[Dict[Text, Any]], lazy_decoding: bool = False) -> List[_CompiledOp]:
+  """Checks and compiles a list of ops.
+  Args:
+    ops: the ops, in order, each a dict with an 'op' and its arguments:
+      - {'op': 'filter', 'predicate_fn': ...} or {'op': 'filter', 'predicate_spec': ...}, see `Filter`,
+      - {'op': 'map', 'map_fn': ...} where `map_fn` defines 'map_example: tf.train.Example -> tf.train.Example',
+      - {'op': 'sample', 'to_key_fn': ..., 'samples_per_key': ..., ...} with the 'samples_per_key_map',
+        'allocation', 'sampling_engine', 'sampling_seed' and 'hot_key_fanout' of `StratifiedSampler`.
+    lazy_decoding: whether the predicates and `to_key` get a `LazyExample` instead of a `tf.train.Example`.
+  Returns:
+    the functions applying the ops to a PCollection of serialized records.
+  """
+  if not ops:
+    raise ValueError('\'ops\' is empty.')
+
+  compiled = []
+  for index, op in enumerate(ops):
+    name = op.get('op') if isinstance(op, dict) else None
+    label = '[{}:{}]'.format(index, name)
+    if name == FILTER_OP:
+      compiled.append(_compile_filter(op, label, lazy_decoding))
+    elif name == MAP_OP:
+      compiled.append(_compile_map(op, label))
+    elif name == SAMPLE_OP:
+      compiled.append(_compile_sample(op, label, lazy_decoding))
+    else:
+      raise ValueError('Unknown op #{}: {!r} - \'op\' must be one of {}'.format(index, op, OPS))
+  return compiled
+
+
+class Executor(base_beam_executor.BaseBeamExecutor):
+  """TFX examples ops executor."""
+
+  def Do(self, input_dict: Dict[Text, List[types.Artifact]],
+         output_dict: Dict[Text, List[types.Artifact]],
+         exec_properties: Dict[Text, Any]) -> None:
+    """Runs a sequence of ops on given input examples, in a single pass.
+    Args:
+      input_dict: Input dict from input key to a list of Artifacts.
+        - examples: examples to process.
+        - pipeline_configuration: optional PipelineConfiguration artifact.
+      output_dict: Output dict from output key to a list of Artifacts.
+        - processed_examples: the processed examples.
+      exec_properties: A dict of execution properties.
+        - splits_to_transform: list of splits to transform.
+        - splits_to_copy: list of splits to copy as is.
+        - ops: the list of ops ('filter', 'map' and 'sample') to apply in order, see `compile_ops()`.
+        - lazy_decoding: if true (default is false), the predicates and `to_key()` get a `LazyExample` which only
+          decodes the features they access, otherwise a fully decoded `tf.train.Example`.
+        - copy_mode: how the splits to copy are passed through - 'copy' (default) or 'link' to hard link their
+          files, see `utils.copy_over()`.
+        - output_config: compression and sharding of the processed examples, see the `writer` module.
+    Returns:
+      None
+    """
+    self._log_startup(input_dict, output_dict, exec_properties)
+
+    examples = input_dict[EXAMPLES_KEY]
+
+    # Priority is as follow:
+    # 1. default value
+    # 2. from PipelineConfiguration
+    # 3. from exec_properties
+
+    splits_to_transform = []
+    ops = None
+    lazy_decoding = False
+    copy_mode = utils.COPY_MODE
+    output_config = None
+
+    splits_to_copy = artifact_utils.decode_split_names(
+      artifact_utils.get_single_instance(examples).split_names)
+
+    if PIPELINE_CONFIGURATION_KEY in input_dict:
+      pipeline_configuration_dir = artifact_utils.get_single_uri(input_dict[PIPELINE_CONFIGURATION_KEY])
+      pipeline_configuration_file = os.path.join(pipeline_configuration_dir, 'custom_config.json')
+      pipeline_configuration_str = io_utils.read_string_file(pipeline_configuration_file)
+      pipeline_configuration = json.loads(pipeline_configuration_str)
+
+      if SPLITS_TO_TRANSFORM_KEY in pipeline_configuration:
+        splits_to_transform = pipeline_configuration[SPLITS_TO_TRANSFORM_KEY]
+
+      if SPLITS_TO_COPY_KEY in pipeline_configuration:
+        splits_to_copy = pipeline_configuration[SPLITS_TO_COPY_KEY]
+
+      if OPS_KEY in pipeline_configuration:
+        ops = pipeline_configuration[OPS_KEY]
+
+      if LAZY_DECODING_KEY in pipeline_configuration:
+        lazy_decoding = bool(pipeline_configuration[LAZY_DECODING_KEY])
+
+      if COPY_MODE_KEY in pipeline_configuration:
+        copy_mode = pipeline_configuration[COPY_MODE_KEY]
+
+      if OUTPUT_CONFIG_KEY in pipeline_configuration:
+        output_config = pipeline_configuration[OUTPUT_CONFIG_KEY]
+
+    # Now looking at the exec_properties
+    if SPLITS_TO_TRANSFORM_KEY in exec_properties and exec_properties[SPLITS_TO_TRANSFORM_KEY] is not None:
+      splits_to_transform = json_utils.loads(exec_properties[SPLITS_TO_TRANSFORM_KEY])
+
+    if SPLITS_TO_COPY_KEY in exec_properties and exec_properties[SPLITS_TO_COPY_KEY] is not None:
+      splits_to_copy = json_utils.loads(exec_properties[SPLITS_TO_COPY_KEY])
+
+    if OPS_KEY in exec_properties and exec_properties[OPS_KEY] is not None:
+      ops = json_utils.loads(exec_properties[OPS_KEY])
+
+    if LAZY_DECODING_KEY in exec_properties and exec_properties[LAZY_DECODING_KEY] is not None:
+      lazy_decoding = bool(exec_properties[LAZY_DECODING_KEY])
+
+    if COPY_MODE_KEY in exec_properties and exec_properties[COPY_MODE_KEY] is not None:
+      copy_mode = exec_properties[COPY_MODE_KEY]
+
+    if OUTPUT_CONFIG_KEY in exec_properties and exec_properties[OUTPUT_CONFIG_KEY] is not None:
+      output_config = json_utils.loads(exec_properties[OUTPUT_CONFIG_KEY])
+
+    # Validate we have all we need
+    if ops is None:
+      raise ValueError('\'ops\' is missing in exec dict.')
+
+    if EXAMPLES_KEY not in input_dict:
+      raise ValueError('\'examples\' is missing in input dict.')
+
+    if PROCESSED_EXAMPLES_KEY not in output_dict:
+      raise ValueError('\'processed_examples\' is missing in output dict.')
+
+    output_config = writer.output_config(output_config)
+
+    # fail before anything runs on invalid ops
+    compiled_ops = compile_ops(ops, lazy_decoding=lazy_decoding)
+
+    output_artifact = artifact_utils.get_single_instance(output_dict[PROCESSED_EXAMPLES_KEY])
+    output_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform + splits_to_copy)
+
+    example_uris = {}
+
+    for split in splits_to_transform:
+      data_uri = utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
+      example_uris[split] = data_uri
+
+    # do something with the splits we dont want to transform ('splits_to_copy'), while the pipeline runs
+    with utils.copying_over(examples, output_artifact, splits_to_copy, copy_mode=copy_mode):
+      self._run_ops(example_uris,
+                    output_artifact=output_artifact,
+                    compiled_ops=compiled_ops,
+                    output_config=output_config)
+
+    logging.info('ExamplesOps generates processed examples to %s', output_artifact.uri)
+
+  def _run_ops(self,
+               example_uris: Mapping[Text, Text],
+               output_artifact: Artifact,
+               compiled_ops: List[_CompiledOp],
+               output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
+    """Runs the ops on given example data, the records are read and written once.
+    Args:
+      example_uris: Mapping of example split name to example uri.
+      output_artifact: Output artifact.
+      compiled_ops: the ops, see `compile_ops()`.
+      output_config: how to write the processed examples.
+    Returns:
+      None
+    """
+
+    with self._make_beam_pipeline() as pipeline:
+      for split_name, example_uri in example_uris.items():
+        records = (
+            pipeline | 'ReadData[{}]'.format(split_name) >> beam.io.ReadFromTFRecord(
+          file_pattern=io_utils.all_files_pattern(example_uri)))
+
+        for apply_op in compiled_ops:
+          records = apply_op(records, split_name)
+
+        dest_path = os.path.join(artifact_utils.get_split_uri([output_artifact], split_name),
+                                 _PROCESSED_EXAMPLES_FILE_PREFIX)
+        _ = (
+            records
+            | 'WriteProcessedExamples ({})'.format(split_name) >> writer.WriteExamples(
+          dest_path,
+          output_config,
+          metadata_path=writer.shard_metadata_path(output_artifact, split_name)))
+        logging.info('Processed examples written to %s.', dest_path)
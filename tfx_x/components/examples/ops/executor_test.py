@@ -0,0 +1,171 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import json
+import os
+
+import tensorflow as tf
+from tfx.dsl.io import fileio
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples.filter import executor as filter_executor
+from tfx_x.components.examples.ops import executor
+from tfx_x.components.examples.ops.executor import PROCESSED_EXAMPLES_KEY, EXAMPLES_KEY, OPS_KEY, \
+  SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY
+from tfx_x.components.examples.stratified_sampler import executor as stratified_sampler_executor
+
+_PREDICATE_FN = """
+def predicate(m):
+  return m.features.feature['trip_miles'].float_list.value[0] > 1.
+"""
+
+_TO_KEY_FN = """
+def to_key(m):
+  return m.features.feature['trip_miles'].float_list.value[0] > 5.
+"""
+
+_MAP_FN = """
+def map_example(m):
+  m.features.feature['trip_km'].float_list.value.append(m.features.feature['trip_miles'].float_list.value[0] * 1.609)
+  return m
+"""
+
+
+class ExecutorTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ExecutorTest, self).setUp()
+    self._source_data_dir = os.path.join(
+      os.path.dirname(os.path.dirname(__file__)), 'testdata')
+    self._output_data_dir = os.path.join(
+      os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+      self._testMethodName)
+    self.component_id = 'test_component'
+
+    # Create input dict.
+    self._examples = standard_artifacts.Examples()
+    self._examples.uri = os.path.join(self._source_data_dir, 'csv_example_gen')
+
+    self._examples.split_names = artifact_utils.encode_split_names(
+      ['train', 'eval', 'unlabelled'])
+
+    self._input_dict = {
+      EXAMPLES_KEY: [self._examples],
+    }
+
+    # Create output dict.
+    self._processing_result = standard_artifacts.Examples()
+    self._processed_examples_dir = os.path.join(self._output_data_dir, "something")
+    self._processing_result.uri = self._processed_examples_dir
+
+    self._output_dict = {
+      PROCESSED_EXAMPLES_KEY: [self._processing_result],
+    }
+
+    # Create exe properties.
+    self._exec_properties = {
+      'component_id': self.component_id,
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval']),
+      SPLITS_TO_COPY_KEY: json.dumps(['train']),
+    }
+
+    # Create context
+    self._tmp_dir = os.path.join(self._output_data_dir, '.temp')
+    self._context = executor.Executor.Context(
+      tmp_dir=self._tmp_dir, unique_id='2')
+
+  def _get_records(self, filepattern):
+    records = []
+    for f in fileio.glob(filepattern):
+      records.extend(tf.compat.v1.python_io.tf_record_iterator(
+        path=f,
+        options=tf.compat.v1.python_io.TFRecordOptions(
+          tf.compat.v1.python_io.TFRecordCompressionType.GZIP)))
+    return records
+
+  def _run(self, ops):
+    self._exec_properties[OPS_KEY] = json.dumps(ops)
+    examples_ops = executor.Executor(self._context)
+    examples_ops.Do(self._input_dict, self._output_dict, self._exec_properties)
+    return self._get_records(os.path.join(self._processed_examples_dir, 'Split-eval', '*'))
+
+  def testDoFilterThenSampleIsFilterThenStratifiedSampler(self):
+    results = self._run([{'op': 'filter', 'predicate_fn': _PREDICATE_FN},
+                         {'op': 'sample', 'to_key_fn': _TO_KEY_FN, 'samples_per_key': 10,
+                          'sampling_engine': 'bottom_k', 'sampling_seed': 3}])
+
+    self.assertCountEqual(['eval', 'train'],
+                          artifact_utils.decode_split_names(self._processing_result.split_names))
+    self.assertTrue(fileio.exists(os.path.join(self._processed_examples_dir, 'Split-train')))
+
+    # the same with two components and an intermediate artifact
+    filtered = standard_artifacts.Examples()
+    filtered.uri = os.path.join(self._output_data_dir, 'filtered')
+    filter_executor.Executor(self._context).Do(
+      {filter_executor.EXAMPLES_KEY: [self._examples]},
+      {filter_executor.FILTERED_EXAMPLES_KEY: [filtered]},
+      {filter_executor.SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval']),
+       filter_executor.SPLITS_TO_COPY_KEY: json.dumps([]),
+       filter_executor.PREDICATE_FN_KEY: _PREDICATE_FN})
+    sampled = standard_artifacts.Examples()
+    sampled.uri = os.path.join(self._output_data_dir, 'sampled')
+    stratified_sampler_executor.Executor(self._context).Do(
+      {stratified_sampler_executor.EXAMPLES_KEY: [filtered]},
+      {stratified_sampler_executor.STRATIFIED_EXAMPLES_KEY: [sampled]},
+      {stratified_sampler_executor.SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval']),
+       stratified_sampler_executor.SPLITS_TO_COPY_KEY: json.dumps([]),
+       stratified_sampler_executor.TO_KEY_FN_KEY: _TO_KEY_FN,
+       stratified_sampler_executor.SAMPLES_PER_KEY_KEY: 10,
+       stratified_sampler_executor.SAMPLING_ENGINE_KEY: 'bottom_k',
+       stratified_sampler_executor.SAMPLING_SEED_KEY: 3})
+
+    expected = self._get_records(os.path.join(sampled.uri, 'Split-eval', '*'))
+    self.assertTrue(expected)
+    self.assertCountEqual(expected, results)
+
+  def testDoMap(self):
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    results = [tf.train.Example.FromString(r) for r in self._run([{'op': 'map', 'map_fn': _MAP_FN}])]
+
+    self.assertLen(results, len(inputs))
+    for example in results:
+      self.assertAllClose(example.features.feature['trip_miles'].float_list.value[0] * 1.609,
+                          example.features.feature['trip_km'].float_list.value[0])
+
+  def testDoMapThenFilterOnMappedFeature(self):
+    results = self._run([
+      {'op': 'map', 'map_fn': _MAP_FN},
+      {'op': 'filter', 'predicate_spec': {'feature': 'trip_km', 'op': '>', 'value': 10.}}])
+
+    self.assertTrue(results)
+    for record in results:
+      self.assertGreater(tf.train.Example.FromString(record).features.feature['trip_km'].float_list.value[0], 10.)
+
+  def testDoWithUnknownOp(self):
+    with self.assertRaises(ValueError):
+      self._run([{'op': 'shuffle'}])
+
+  def testDoWithIncompleteSample(self):
+    with self.assertRaises(ValueError):
+      self._run([{'op': 'sample', 'samples_per_key': 10}])
+
+  def testDoWithoutOps(self):
+    examples_ops = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      examples_ops.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,134 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Partitioning of examples into several splits in a single pass"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from typing import Any, Dict, Optional, Text, List
+
+from tfx import types
+from tfx.dsl.components.base import base_component
+from tfx.dsl.components.base import executor_spec
+from tfx.types import ComponentSpec
+from tfx.types import standard_artifacts
+from tfx.types.component_spec import ChannelParameter, ExecutionParameter
+from tfx.utils import json_utils
+
+from tfx_x.components.examples.partition import executor
+from tfx_x.components.examples.partition.executor import SPLITS_TO_TRANSFORM_KEY, \
+  SPLITS_TO_COPY_KEY, PARTITIONED_EXAMPLES_KEY, EXAMPLES_KEY, PIPELINE_CONFIGURATION_KEY, \
+  PARTITIONS_KEY, ROUTE_FN_KEY, PREDICATES_KEY, LAZY_DECODING_KEY, COPY_MODE_KEY, OUTPUT_CONFIG_KEY
+from tfx_x import PipelineConfiguration
+
+
+class PartitionSpec(ComponentSpec):
+  """Partition component spec."""
+
+  PARAMETERS = {
+    SPLITS_TO_TRANSFORM_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    SPLITS_TO_COPY_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    PARTITIONS_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    ROUTE_FN_KEY: ExecutionParameter(type=Text, optional=True),
+    PREDICATES_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    LAZY_DECODING_KEY: ExecutionParameter(type=int, optional=True),
+    COPY_MODE_KEY: ExecutionParameter(type=Text, optional=True),
+    OUTPUT_CONFIG_KEY: ExecutionParameter(type=(str, Text), optional=True),
+  }
+  INPUTS = {
+    EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+    PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+  }
+  OUTPUTS = {
+    PARTITIONED_EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+  }
+
+
+class Partition(base_component.BaseComponent):
+  """A TFX component to partition examples.
+  Partition consumes examples data, and produces examples data with one split per partition.
+
+  ## Example
+    # Uses Partition to split the eval examples by trip length.
+    >>> partition = Partition(
+    >>>    route_fn="def route(m):...",
+    >>>    partitions=['short', 'long'],
+    >>>    splits_to_transform=['eval'],
+    >>>    examples=example_gen.outputs['examples'])
+
+  """
+
+  SPEC_CLASS = PartitionSpec
+  EXECUTOR_SPEC = executor_spec.BeamExecutorSpec(executor.Executor)
+
+  def __init__(self,
+               examples: types.Channel,
+               partitions: Optional[List[Text]] = None,
+               route_fn: Optional[Text] = None,
+               predicates: Optional[List[Dict[Text, Any]]] = None,
+               pipeline_configuration: Optional[types.Channel] = None,
+               partitioned_examples: Optional[types.Channel] = None,
+               splits_to_transform: Optional[List[Text]] = None,
+               splits_to_copy: Optional[List[Text]] = None,
+               lazy_decoding: Optional[bool] = None,
+               copy_mode: Optional[Text] = None,
+               output_config: Optional[Dict[Text, Any]] = None):
+    """Construct a Partition component.
+    Args:
+      examples: A Channel of 'Examples' type, usually produced by ExampleGen
+        component. _required_
+      partitions: names of the partitions - the splits of the output. Required with `route_fn`.
+      route_fn: Route function, the function that will tell in which partition an example goes.
+                 Must be 'route: Example -> partition name'. Examples routed to an unknown partition are dropped.
+                 For example something like:
+                 >>> def route(m):
+                       return 'long' if m.features.feature['trip_miles'].float_list.value[0] > 42. else 'short'
+      predicates: Alternative to `route_fn`, a list of named predicates. An example goes to the partition of the
+                 first predicate it satisfies, or is dropped. For example something like:
+                 >>> [{'name': 'long', 'predicate_spec': {'feature': 'trip_miles', 'op': '>', 'value': 42.}},
+                 >>>  {'name': 'other', 'predicate_fn': 'def predicate(m):\\n  return True'}]
+      pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig
+        component.
+      partitioned_examples: Channel of `Examples` to store the partitions.
+      splits_to_transform: List of split names to partition. They are not partitioned one by one: their
+                 examples all go to the same partitions - e.g. partitioning 'train' and 'eval' into 'long' and
+                 'short' gives two splits, 'long' and 'short', with examples of both. Use a Partition per split to
+                 keep them apart. Required, here or in the `pipeline_configuration`.
+      splits_to_copy: Optional list of split names to copy.
+      lazy_decoding: If true (default is false), `route` and `predicate` get a `LazyExample` which only decodes the
+                 features they access - `m.features.feature[name]` works as with a `tf.train.Example`.
+      copy_mode: How `splits_to_copy` are passed through: 'copy' (default) or 'link' to hard link their files - they
+                 are copied when they cannot be linked.
+      output_config: Compression and sharding of the partitions: 'compression' is 'gzip' (default) or 'none',
+                 'num_shards' a fixed number of files or 'target_shard_bytes' the size of the serialized records of
+                 each file - the runner picks the number of files otherwise.
+    """
+    partitioned_examples = partitioned_examples or types.Channel(
+      type=standard_artifacts.Examples)
+
+    spec = PartitionSpec(
+      examples=examples,
+      pipeline_configuration=pipeline_configuration,
+      partitioned_examples=partitioned_examples,
+      splits_to_transform=None if splits_to_transform is None else json_utils.dumps(splits_to_transform),
+      splits_to_copy=None if splits_to_copy is None else json_utils.dumps(splits_to_copy),
+      partitions=None if partitions is None else json_utils.dumps(partitions),
+      route_fn=route_fn,
+      predicates=None if predicates is None else json_utils.dumps(predicates),
+      lazy_decoding=None if lazy_decoding is None else int(lazy_decoding),
+      copy_mode=copy_mode,
+      output_config=None if output_config is None else json_utils.dumps(output_config))
+    super(Partition, self).__init__(spec=spec)
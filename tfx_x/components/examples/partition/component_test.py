@@ -0,0 +1,69 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+from tfx import types
+from tfx.types import channel_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples.partition.component import Partition
+from tfx_x.components.examples.partition.executor import PARTITIONED_EXAMPLES_KEY
+from tfx_x import PipelineConfiguration
+
+
+class ComponentTest(tf.test.TestCase):
+
+  def testConstructWithRouteFn(self):
+    examples = standard_artifacts.Examples()
+    route_fn = """
+  def route(m):
+    return 'long' if m.features.feature['trip_miles'].float_list.value[0] > 42. else 'short'
+"""
+
+    partition = Partition(
+      pipeline_configuration=None,
+      examples=channel_utils.as_channel([examples]),
+      partitioned_examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      splits_to_transform=['eval'],
+      splits_to_copy=['train'],
+      partitions=['short', 'long'],
+      route_fn=route_fn)
+    self.assertEqual('Examples', partition.outputs[PARTITIONED_EXAMPLES_KEY].type_name)
+
+  def testConstructWithPredicates(self):
+    examples = standard_artifacts.Examples()
+    partition = Partition(
+      examples=channel_utils.as_channel([examples]),
+      splits_to_transform=['eval'],
+      predicates=[{'name': 'long', 'predicate_spec': {'feature': 'trip_miles', 'op': '>', 'value': 42.}},
+                  {'name': 'cash', 'predicate_fn': 'def predicate(m):\n  return True'}])
+    self.assertEqual('Examples', partition.outputs[PARTITIONED_EXAMPLES_KEY].type_name)
+
+  def testConstructWithPipelineConfiguration(self):
+    examples = standard_artifacts.Examples()
+    partition = Partition(
+      examples=channel_utils.as_channel([examples]),
+      partitioned_examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      pipeline_configuration=types.Channel(type=PipelineConfiguration),
+    )
+    self.assertEqual('Examples', partition.outputs[PARTITIONED_EXAMPLES_KEY].type_name)
+
+
+if __name__ == '__main__':
+  tf.test.main()
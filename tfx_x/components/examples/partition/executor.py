@@ -0,0 +1,310 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""TFX partition executor."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+from typing import Any, Callable, Dict, Mapping, List, Optional, Sequence, Text
+
+import apache_beam as beam
+import numpy as np
+import tensorflow as tf
+from absl import logging
+from tfx import types
+from tfx.dsl.components.base import base_beam_executor
+from tfx.types import artifact_utils, Artifact
+from tfx.utils import io_utils, json_utils
+
+from tfx_x.components import utils
+from tfx_x.components.examples import predicate_spec as predicate_spec_lib
+from tfx_x.components.examples import writer
+from tfx_x.components.examples.lazy_example import LazyExample
+
+PARTITIONED_EXAMPLES_KEY = 'partitioned_examples'
+EXAMPLES_KEY = 'examples'
+PARTITIONS_KEY = 'partitions'
+ROUTE_FN_KEY = 'route_fn'
+PREDICATES_KEY = 'predicates'
+SPLITS_TO_COPY_KEY = 'splits_to_copy'
+SPLITS_TO_TRANSFORM_KEY = 'splits_to_transform'
+PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+LAZY_DECODING_KEY = 'lazy_decoding'
+COPY_MODE_KEY = 'copy_mode'
+OUTPUT_CONFIG_KEY = 'output_config'
+
+_PARTITIONED_EXAMPLES_FILE_PREFIX = 'partitioned_examples'
+_METRICS_NAMESPACE = 'Partition'
+
+_Router = Callable[[Sequence[bytes]], List[int]]
+
+
+def _make_router(partitions: List[Text],
+                 route_fn: Optional[Text],
+                 predicates: Optional[List[Dict[Text, Any]]],
+                 lazy_decoding: bool) -> _Router:
+  """Builds the function giving the index of the partition of each record of a batch (-1 to drop it)."""
+  decode = LazyExample if lazy_decoding else tf.train.Example.FromString
+
+  if route_fn is not None:
+    d = {}
+    exec(route_fn, globals(), d)  # how ugly is that?
+    route = d['route']
+    partition_index = {name: i for i, name in enumerate(partitions)}
+
+    def route_batch(records: Sequence[bytes]) -> List[int]:
+      return [partition_index.get(route(decode(record)), -1) for record in records]
+
+    return route_batch
+
+  batch_predicates = []
+  for predicate in predicates:
+    if predicate.get('predicate_spec') is not None:
+      batch_predicates.append(predicate_spec_lib.compile_predicate(predicate['predicate_spec']).evaluate_records)
+    else:
+      d = {}
+      exec(predicate['predicate_fn'], globals(), d)  # how ugly is that?
+      batch_predicates.append(
+        lambda records, fn=d['predicate']: [bool(fn(decode(record))) for record in records])
+
+  def route_batch(records: Sequence[bytes]) -> List[int]:
+    # the first predicate a record satisfies decides its partition
+    routes = np.full(len(records), -1, dtype=np.int64)
+    undecided = np.arange(len(records))
+    for i, batch_predicate in enumerate(batch_predicates):
+      if not undecided.size:
+        break
+      mask = np.asarray(batch_predicate([records[j] for j in undecided]), dtype=bool)
+      routes[undecided[mask]] = i
+      undecided = undecided[~mask]
+    return routes.tolist()
+
+  return route_batch
+
+
+class Executor(base_beam_executor.BaseBeamExecutor):
+  """TFX partition executor."""
+
+  def Do(self, input_dict: Dict[Text, List[types.Artifact]],
+         output_dict: Dict[Text, List[types.Artifact]],
+         exec_properties: Dict[Text, Any]) -> None:
+    """Partitions the given input examples into several splits in a single pass.
+    Args:
+      input_dict: Input dict from input key to a list of Artifacts.
+        - examples: examples to partition.
+        - pipeline_configuration: optional PipelineConfiguration artifact.
+      output_dict: Output dict from output key to a list of Artifacts.
+        - partitioned_examples: the partitioned examples, one split per partition.
+      exec_properties: A dict of execution properties.
+        - splits_to_transform: list of splits to partition, required - their examples all go to the same
+          partitions.
+        - splits_to_copy: list of splits to copy as is.
+        - partitions: list of the names of the partitions, required with `route_fn`.
+        - route_fn: the function giving the partition of an example - must be 'route: Example -> partition name'.
+        - predicates: list of named predicates, `{'name': ..., 'predicate_fn': ...}` or
+          `{'name': ..., 'predicate_spec': ...}`. An example goes to the first partition whose predicate it
+          satisfies.
+        - lazy_decoding: if true (default is false), `route()` and `predicate()` get a `LazyExample` which only decodes
+          the features they access, otherwise a fully decoded `tf.train.Example`.
+        - copy_mode: how the splits to copy are passed through - 'copy' (default) or 'link' to hard link their
+          files, see `utils.copy_over()`.
+        - output_config: compression and sharding of the partitions, see the `writer` module.
+    Returns:
+      None
+    """
+    self._log_startup(input_dict, output_dict, exec_properties)
+
+    examples = input_dict[EXAMPLES_KEY]
+
+    # Priority is as follow:
+    # 1. default value
+    # 2. from PipelineConfiguration
+    # 3. from exec_properties
+
+    splits_to_transform = []
+    splits_to_copy = []
+    partitions = None
+    route_fn = None
+    predicates = None
+    lazy_decoding = False
+    copy_mode = utils.COPY_MODE
+    output_config = None
+
+    if PIPELINE_CONFIGURATION_KEY in input_dict:
+      pipeline_configuration_dir = artifact_utils.get_single_uri(input_dict[PIPELINE_CONFIGURATION_KEY])
+      pipeline_configuration_file = os.path.join(pipeline_configuration_dir, 'custom_config.json')
+      pipeline_configuration_str = io_utils.read_string_file(pipeline_configuration_file)
+      pipeline_configuration = json.loads(pipeline_configuration_str)
+
+      if SPLITS_TO_TRANSFORM_KEY in pipeline_configuration:
+        splits_to_transform = pipeline_configuration[SPLITS_TO_TRANSFORM_KEY]
+
+      if SPLITS_TO_COPY_KEY in pipeline_configuration:
+        splits_to_copy = pipeline_configuration[SPLITS_TO_COPY_KEY]
+
+      if PARTITIONS_KEY in pipeline_configuration:
+        partitions = pipeline_configuration[PARTITIONS_KEY]
+
+      if ROUTE_FN_KEY in pipeline_configuration:
+        route_fn = pipeline_configuration[ROUTE_FN_KEY]
+
+      if PREDICATES_KEY in pipeline_configuration:
+        predicates = pipeline_configuration[PREDICATES_KEY]
+
+      if LAZY_DECODING_KEY in pipeline_configuration:
+        lazy_decoding = bool(pipeline_configuration[LAZY_DECODING_KEY])
+
+      if COPY_MODE_KEY in pipeline_configuration:
+        copy_mode = pipeline_configuration[COPY_MODE_KEY]
+
+      if OUTPUT_CONFIG_KEY in pipeline_configuration:
+        output_config = pipeline_configuration[OUTPUT_CONFIG_KEY]
+
+    # Now looking at the exec_properties
+    if SPLITS_TO_TRANSFORM_KEY in exec_properties and exec_properties[SPLITS_TO_TRANSFORM_KEY] is not None:
+      splits_to_transform = json_utils.loads(exec_properties[SPLITS_TO_TRANSFORM_KEY])
+
+    if SPLITS_TO_COPY_KEY in exec_properties and exec_properties[SPLITS_TO_COPY_KEY] is not None:
+      splits_to_copy = json_utils.loads(exec_properties[SPLITS_TO_COPY_KEY])
+
+    if PARTITIONS_KEY in exec_properties and exec_properties[PARTITIONS_KEY] is not None:
+      partitions = json_utils.loads(exec_properties[PARTITIONS_KEY])
+
+    if ROUTE_FN_KEY in exec_properties and exec_properties[ROUTE_FN_KEY] is not None:
+      route_fn = exec_properties[ROUTE_FN_KEY]
+
+    if PREDICATES_KEY in exec_properties and exec_properties[PREDICATES_KEY] is not None:
+      predicates = json_utils.loads(exec_properties[PREDICATES_KEY])
+
+    if LAZY_DECODING_KEY in exec_properties and exec_properties[LAZY_DECODING_KEY] is not None:
+      lazy_decoding = bool(exec_properties[LAZY_DECODING_KEY])
+
+    if COPY_MODE_KEY in exec_properties and exec_properties[COPY_MODE_KEY] is not None:
+      copy_mode = exec_properties[COPY_MODE_KEY]
+
+    if OUTPUT_CONFIG_KEY in exec_properties and exec_properties[OUTPUT_CONFIG_KEY] is not None:
+      output_config = json_utils.loads(exec_properties[OUTPUT_CONFIG_KEY])
+
+    # Validate we have all we need
+    if (route_fn is None) == (predicates is None):
+      raise ValueError('Exactly one of \'route_fn\' and \'predicates\' is expected in exec dict.')
+
+    if route_fn is not None and not partitions:
+      raise ValueError('\'partitions\' is missing in exec dict.')
+
+    if predicates is not None:
+      for i, predicate in enumerate(predicates):
+        if not isinstance(predicate, dict) or not predicate.get('name'):
+          raise ValueError('The predicate {} has no \'name\': {!r}'.format(i, predicate))
+        if predicate.get('predicate_spec') is None and predicate.get('predicate_fn') is None:
+          raise ValueError('One of \'predicate_fn\' and \'predicate_spec\' is missing for the partition {!r}.'.format(
+            predicate['name']))
+      partitions = [predicate['name'] for predicate in predicates]
+
+    if len(set(partitions)) != len(partitions):
+      raise ValueError('Partition names must be unique: {}'.format(partitions))
+
+    if not splits_to_transform:
+      raise ValueError('\'splits_to_transform\' is empty: there are no examples to partition into {}.'.format(
+        partitions))
+
+    if set(partitions) & set(splits_to_copy):
+      raise ValueError('Partitions {} clash with splits to copy'.format(set(partitions) & set(splits_to_copy)))
+
+    if EXAMPLES_KEY not in input_dict:
+      raise ValueError('\'examples\' is missing in input dict.')
+
+    if PARTITIONED_EXAMPLES_KEY not in output_dict:
+      raise ValueError('\'partitioned_examples\' is missing in output dict.')
+
+    output_config = writer.output_config(output_config)
+
+    output_artifact = artifact_utils.get_single_instance(output_dict[PARTITIONED_EXAMPLES_KEY])
+    output_artifact.split_names = artifact_utils.encode_split_names(partitions + splits_to_copy)
+
+    example_uris = {}
+
+    for split in splits_to_transform:
+      data_uri = utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
+      example_uris[split] = data_uri
+
+    # do something with the splits we dont want to transform ('splits_to_copy'), while the pipeline runs
+    with utils.copying_over(examples, output_artifact, splits_to_copy, copy_mode=copy_mode):
+      self._run_partitioning(example_uris,
+                             output_artifact=output_artifact,
+                             partitions=partitions,
+                             router=_make_router(partitions, route_fn, predicates, lazy_decoding),
+                             output_config=output_config)
+
+    logging.info('Partition generates partitioned examples to %s', output_artifact.uri)
+
+  def _run_partitioning(self,
+                        example_uris: Mapping[Text, Text],
+                        partitions: List[Text],
+                        router: _Router,
+                        output_artifact: Artifact,
+                        output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
+    """Runs partitioning on given example data.
+
+    All the splits to transform are read once and each record is written, untouched, to the split
+    of its partition.
+    Args:
+      example_uris: Mapping of example split name to example uri.
+      partitions: names of the partitions.
+      router: function giving the index of the partition of each record of a batch (-1 to drop it).
+      output_artifact: Output artifact.
+      output_config: how to write the partitions.
+    Returns:
+      None
+    """
+
+    dropped_counter = beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'dropped_examples')
+
+    def route_batch(records: List[bytes]):
+      routes = router(records)
+      dropped_counter.inc(sum(1 for route in routes if route < 0))
+      return zip(routes, records)
+
+    with self._make_beam_pipeline() as pipeline:
+      data_list = [(
+          pipeline | 'ReadData[{}]'.format(split_name) >> beam.io.ReadFromTFRecord(
+        file_pattern=io_utils.all_files_pattern(example_uri)))
+        for split_name, example_uri in example_uris.items()]
+
+      # the last partition collects the records which are not routed anywhere
+      partitioned = (
+          data_list
+          | 'FlattenExamples' >> beam.Flatten(pipeline=pipeline)
+          | 'Batch' >> beam.BatchElements()
+          | 'Route' >> beam.FlatMap(route_batch)
+          | 'Partition' >> beam.Partition(lambda routed, n: routed[0] if routed[0] >= 0 else n - 1,
+                                          len(partitions) + 1))
+
+      for i, partition_name in enumerate(partitions):
+        dest_path = os.path.join(artifact_utils.get_split_uri([output_artifact], partition_name),
+                                 _PARTITIONED_EXAMPLES_FILE_PREFIX)
+
+        _ = (
+            partitioned[i]
+            | 'Records ({})'.format(partition_name) >> beam.Map(lambda routed: routed[1])
+            | 'WritePartition ({})'.format(partition_name) >> writer.WriteExamples(
+          dest_path,
+          output_config,
+          metadata_path=writer.shard_metadata_path(output_artifact, partition_name)))
+        logging.info('Partition result written to %s.', dest_path)
@@ -0,0 +1,164 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+
+import tensorflow as tf
+from absl import logging
+from tfx.dsl.io import fileio
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples.partition import executor
+from tfx_x.components.examples.partition.executor import PARTITIONED_EXAMPLES_KEY, EXAMPLES_KEY, \
+  PARTITIONS_KEY, ROUTE_FN_KEY, PREDICATES_KEY, SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY
+
+
+class ExecutorTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ExecutorTest, self).setUp()
+    self._source_data_dir = os.path.join(
+      os.path.dirname(os.path.dirname(__file__)), 'testdata')
+    self._output_data_dir = os.path.join(
+      os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+      self._testMethodName)
+    self.component_id = 'test_component'
+
+    # Create input dict.
+    self._examples = standard_artifacts.Examples()
+    self._examples.uri = os.path.join(self._source_data_dir, 'csv_example_gen')
+
+    self._examples.split_names = artifact_utils.encode_split_names(
+      ['train', 'eval', 'unlabelled'])
+
+    self._input_dict = {
+      EXAMPLES_KEY: [self._examples],
+    }
+
+    # Create output dict.
+    self._partitioning_result = standard_artifacts.Examples()
+    self._partitioned_examples_dir = os.path.join(self._output_data_dir, "something")
+    self._partitioning_result.uri = self._partitioned_examples_dir
+
+    self._output_dict_sr = {
+      PARTITIONED_EXAMPLES_KEY: [self._partitioning_result],
+    }
+
+    # Create exe properties.
+    self._exec_properties = {
+      'component_id': self.component_id,
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval']),
+      SPLITS_TO_COPY_KEY: json.dumps([]),
+    }
+
+    # Create context
+    self._tmp_dir = os.path.join(self._output_data_dir, '.temp')
+    self._context = executor.Executor.Context(
+      tmp_dir=self._tmp_dir, unique_id='2')
+
+  def _get_records(self, filepattern):
+    records = []
+    for f in fileio.glob(filepattern):
+      records.extend(tf.compat.v1.python_io.tf_record_iterator(
+        path=f,
+        options=tf.compat.v1.python_io.TFRecordOptions(
+          tf.compat.v1.python_io.TFRecordCompressionType.GZIP)))
+    return records
+
+  def _get_partition(self, split_name):
+    dir_path = os.path.join(self._partitioned_examples_dir, 'Split-' + split_name)
+    logging.info("Looking for examples split in %s", dir_path)
+
+    self.assertTrue(fileio.exists(dir_path))
+    return self._get_records(os.path.join(dir_path, '*'))
+
+  def testDoWithRouteFn(self):
+    self._exec_properties[PARTITIONS_KEY] = json.dumps(['short', 'long'])
+    self._exec_properties[ROUTE_FN_KEY] = """
+def route(m):
+  return 'long' if m.features.feature['trip_miles'].float_list.value[0] > 42. else 'short'
+"""
+
+    # Run executor.
+    partition = executor.Executor(self._context)
+    partition.Do(self._input_dict, self._output_dict_sr,
+                 self._exec_properties)
+
+    # Check outputs.
+    self.assertCountEqual(['short', 'long'],
+                          artifact_utils.decode_split_names(self._partitioning_result.split_names))
+    short = self._get_partition('short')
+    long = self._get_partition('long')
+    self.assertTrue(short)
+    self.assertTrue(long)
+    self.assertCountEqual(self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*')), short + long)
+
+  def testDoWithPredicates(self):
+    self._exec_properties[SPLITS_TO_COPY_KEY] = json.dumps(['train'])
+    self._exec_properties[PREDICATES_KEY] = json.dumps([
+      {'name': 'long', 'predicate_spec': {'feature': 'trip_miles', 'op': '>', 'value': 42.}},
+      {'name': 'rest', 'predicate_fn': 'def predicate(m):\n  return True'},
+    ])
+
+    # Run executor.
+    partition = executor.Executor(self._context)
+    partition.Do(self._input_dict, self._output_dict_sr,
+                 self._exec_properties)
+
+    # Check outputs.
+    self.assertCountEqual(['long', 'rest', 'train'],
+                          artifact_utils.decode_split_names(self._partitioning_result.split_names))
+    long = self._get_partition('long')
+    rest = self._get_partition('rest')
+    self.assertTrue(long)
+    self.assertTrue(rest)
+    self.assertCountEqual(self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*')), long + rest)
+    self.assertTrue(self._get_partition('train'))
+
+  def testDoWithRouteFnAndPredicates(self):
+    self._exec_properties[PARTITIONS_KEY] = json.dumps(['all'])
+    self._exec_properties[ROUTE_FN_KEY] = 'def route(m):\n  return \'all\''
+    self._exec_properties[PREDICATES_KEY] = json.dumps([{'name': 'all',
+                                                         'predicate_fn': 'def predicate(m):\n  return True'}])
+
+    partition = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      partition.Do(self._input_dict, self._output_dict_sr,
+                   self._exec_properties)
+
+  def testDoWithoutSplitsToTransform(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps([])
+    self._exec_properties[SPLITS_TO_COPY_KEY] = json.dumps(['train'])
+    self._exec_properties[PARTITIONS_KEY] = json.dumps(['all'])
+    self._exec_properties[ROUTE_FN_KEY] = 'def route(m):\n  return \'all\''
+
+    partition = executor.Executor(self._context)
+    with self.assertRaisesRegex(ValueError, 'splits_to_transform'):
+      partition.Do(self._input_dict, self._output_dict_sr,
+                   self._exec_properties)
+
+  def testDoWithPredicateWithoutFunction(self):
+    self._exec_properties[PREDICATES_KEY] = json.dumps([{'name': 'long'}])
+
+    partition = executor.Executor(self._context)
+    with self.assertRaisesRegex(ValueError, 'long'):
+      partition.Do(self._input_dict, self._output_dict_sr,
+                   self._exec_properties)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,319 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Declarative predicates on tf.train.Example evaluated on batches of records.
+
+A predicate spec is a JSON-able structure made of:
+  - comparisons: {'feature': 'trip_miles', 'op': '>', 'value': 42.}
+    with op in '==', '!=', '<', '<=', '>', '>=', 'in', 'not in' and 'present' (no value).
+    The first value of the feature is compared, a comparison is false when the feature is missing.
+  - combinations: {'and': [spec, ...]}, {'or': [spec, ...]} and {'not': spec}.
+
+`compile_predicate()` turns a spec into a `CompiledPredicate` evaluated with NumPy on the columns of
+a RecordBatch decoded by TFXIO - ideally projected on `CompiledPredicate.features` - so nothing is
+interpreted per example in Python. The cheapest clauses of a combination are evaluated first, the
+others only on the rows they can still change. A bytes feature can only be compared with strings
+and a numeric feature with numbers.
+"""
+
+import itertools
+import json
+import operator
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+from tensorflow_metadata.proto.v0 import schema_pb2
+from tfx_bsl.arrow import array_util
+from tfx_bsl.coders import example_coder
+
+_COMPARISONS = {
+  '==': operator.eq,
+  '!=': operator.ne,
+  '<': operator.lt,
+  '<=': operator.le,
+  '>': operator.gt,
+  '>=': operator.ge,
+}
+_MEMBERSHIPS = {'in', 'not in'}
+_PRESENT = 'present'
+
+
+class RecordBatchColumns(object):
+  """Columns of the first value of features of a RecordBatch of Examples, as NumPy arrays computed on demand."""
+
+  def __init__(self, record_batch: pa.RecordBatch):
+    self._record_batch = record_batch
+    self._columns = {}
+
+  def __len__(self) -> int:
+    return self._record_batch.num_rows
+
+  def _first_values(self, feature_name: Text) -> Tuple[np.ndarray, np.ndarray]:
+    num_rows = self._record_batch.num_rows
+    index = self._record_batch.schema.get_field_index(feature_name)
+    if index < 0:
+      return np.zeros(num_rows, dtype=np.float64), np.zeros(num_rows, dtype=bool)
+
+    column = self._record_batch.column(index)
+    flattened = column.flatten()
+    if pa.types.is_null(flattened.type) or not len(flattened):
+      return np.zeros(num_rows, dtype=np.float64), np.zeros(num_rows, dtype=bool)
+
+    # the first value of a row is where the parent index changes
+    parents = np.asarray(array_util.GetFlattenedArrayParentIndices(column))
+    first = np.ones(len(parents), dtype=bool)
+    first[1:] = parents[1:] != parents[:-1]
+    rows = parents[first]
+
+    flattened_values = flattened.to_numpy(zero_copy_only=False)
+    if pa.types.is_binary(flattened.type) or pa.types.is_large_binary(flattened.type) or \
+        pa.types.is_string(flattened.type) or pa.types.is_large_string(flattened.type):
+      values = np.full(num_rows, b'', dtype=object)
+    else:
+      values = np.zeros(num_rows, dtype=flattened_values.dtype)
+    values[rows] = flattened_values[first]
+    present = np.zeros(num_rows, dtype=bool)
+    present[rows] = True
+    return values, present
+
+  def get(self, feature_name: Text, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The first value of a feature for some rows.
+    Args:
+      feature_name: name of the feature.
+      rows: indices of the rows.
+    Returns:
+      a tuple of arrays (values, present) for these rows. `values` is meaningless where `present` is false.
+    """
+    if feature_name not in self._columns:
+      self._columns[feature_name] = self._first_values(feature_name)
+    values, present = self._columns[feature_name]
+    return values[rows], present[rows]
+
+
+class _Node(object):
+  cost = 0
+
+  def features(self) -> List[Text]:
+    raise NotImplementedError
+
+  def evaluate(self, columns: RecordBatchColumns, rows: np.ndarray) -> np.ndarray:
+    raise NotImplementedError
+
+
+class _Comparison(_Node):
+
+  def __init__(self, feature: Text, op: Text, value: Any):
+    self._feature = feature
+    self._op = op
+    self._value = value
+    # membership tests cost more than a single comparison
+    self.cost = 1 + (len(value) if op in _MEMBERSHIPS else 0)
+
+  def features(self) -> List[Text]:
+    return [self._feature]
+
+  def _check_kind(self, values: np.ndarray):
+    constants = self._value if self._op in _MEMBERSHIPS else [self._value]
+    is_bytes_feature = values.dtype == object
+    for constant in constants:
+      if isinstance(constant, bytes) != is_bytes_feature:
+        raise ValueError('Cannot compare the {} feature {!r} with {!r}'.format(
+          'bytes' if is_bytes_feature else 'numeric', self._feature, constant))
+
+  def evaluate(self, columns: RecordBatchColumns, rows: np.ndarray) -> np.ndarray:
+    values, present = columns.get(self._feature, rows)
+    if self._op == _PRESENT:
+      return present
+    if not present.any():
+      return present
+    self._check_kind(values)
+    if self._op in _MEMBERSHIPS:
+      result = np.isin(values, self._value)
+      if self._op == 'not in':
+        result = ~result
+    else:
+      result = np.asarray(_COMPARISONS[self._op](values, self._value), dtype=bool)
+    return present & result
+
+
+class _Not(_Node):
+
+  def __init__(self, child: _Node):
+    self._child = child
+    self.cost = child.cost
+
+  def features(self) -> List[Text]:
+    return self._child.features()
+
+  def evaluate(self, columns: RecordBatchColumns, rows: np.ndarray) -> np.ndarray:
+    return ~self._child.evaluate(columns, rows)
+
+
+class _And(_Node):
+
+  def __init__(self, children: List[_Node]):
+    self._children = sorted(children, key=lambda c: c.cost)
+    self.cost = sum(c.cost for c in children)
+
+  def features(self) -> List[Text]:
+    return list(itertools.chain.from_iterable(c.features() for c in self._children))
+
+  def evaluate(self, columns: RecordBatchColumns, rows: np.ndarray) -> np.ndarray:
+    # positions (in rows) which are still true
+    alive = np.arange(len(rows))
+    for child in self._children:
+      if not alive.size:
+        break
+      alive = alive[child.evaluate(columns, rows[alive])]
+    result = np.zeros(len(rows), dtype=bool)
+    result[alive] = True
+    return result
+
+
+class _Or(_Node):
+
+  def __init__(self, children: List[_Node]):
+    self._children = sorted(children, key=lambda c: c.cost)
+    self.cost = sum(c.cost for c in children)
+
+  def features(self) -> List[Text]:
+    return list(itertools.chain.from_iterable(c.features() for c in self._children))
+
+  def evaluate(self, columns: RecordBatchColumns, rows: np.ndarray) -> np.ndarray:
+    # positions (in rows) which are still false
+    undecided = np.arange(len(rows))
+    for child in self._children:
+      if not undecided.size:
+        break
+      undecided = undecided[~child.evaluate(columns, rows[undecided])]
+    result = np.ones(len(rows), dtype=bool)
+    result[undecided] = False
+    return result
+
+
+def _to_constant(value: Any) -> Any:
+  if isinstance(value, str):
+    return value.encode('utf-8')
+  return value
+
+
+def _parse(spec: Dict[Text, Any]) -> _Node:
+  if not isinstance(spec, dict):
+    raise ValueError('Invalid predicate spec: {!r}'.format(spec))
+
+  if 'and' in spec or 'or' in spec:
+    combination = 'and' if 'and' in spec else 'or'
+    children = spec[combination]
+    if not isinstance(children, list) or not children:
+      raise ValueError('\'{}\' expects a non empty list of predicate specs: {!r}'.format(combination, spec))
+    nodes = [_parse(c) for c in children]
+    return _And(nodes) if combination == 'and' else _Or(nodes)
+
+  if 'not' in spec:
+    return _Not(_parse(spec['not']))
+
+  if 'feature' not in spec or 'op' not in spec:
+    raise ValueError('Invalid predicate spec, \'feature\' and \'op\' are required: {!r}'.format(spec))
+
+  op = spec['op']
+  if op == _PRESENT:
+    return _Comparison(spec['feature'], op, None)
+  if op not in _COMPARISONS and op not in _MEMBERSHIPS:
+    raise ValueError('Unsupported operator {!r} in predicate spec'.format(op))
+  if 'value' not in spec:
+    raise ValueError('\'value\' is missing in predicate spec: {!r}'.format(spec))
+
+  value = spec['value']
+  if op in _MEMBERSHIPS:
+    if not isinstance(value, list):
+      raise ValueError('\'{}\' expects a list as value: {!r}'.format(op, spec))
+    value = [_to_constant(v) for v in value]
+  else:
+    value = _to_constant(value)
+  return _Comparison(spec['feature'], op, value)
+
+
+class CompiledPredicate(object):
+  """A predicate spec compiled into an evaluation over a RecordBatch of Examples."""
+
+  def __init__(self, root: _Node, schema: Optional[schema_pb2.Schema] = None):
+    self._root = root
+    self.features = sorted(set(root.features()))
+    self._serialized_schema = None
+    if schema is not None:
+      missing_features = set(self.features) - {feature.name for feature in schema.feature}
+      if missing_features:
+        raise ValueError('Features of the predicate spec not in the schema: {}'.format(sorted(missing_features)))
+      projected_schema = schema_pb2.Schema()
+      projected_schema.feature.extend(feature for feature in schema.feature if feature.name in self.features)
+      self._serialized_schema = projected_schema.SerializeToString()
+    self._decoder = None
+
+  def __getstate__(self):
+    # the decoder is not picklable, it is created again where the predicate is used
+    state = dict(self.__dict__)
+    state['_decoder'] = None
+    return state
+
+  def __call__(self, record_batch: pa.RecordBatch) -> np.ndarray:
+    """Evaluates the predicate.
+    Args:
+      record_batch: the decoded Examples, as given by `tfxio.TFExampleRecord` - only the features of the
+        predicate are needed.
+    Returns:
+      the boolean mask of the rows satisfying the predicate.
+    """
+    return self._root.evaluate(RecordBatchColumns(record_batch), np.arange(record_batch.num_rows))
+
+  def filter(self, record_batch: pa.RecordBatch, raw_record_column_name: Text) -> List[bytes]:
+    """Returns the serialized records of the rows satisfying the predicate.
+    Args:
+      record_batch: the decoded Examples with their serialized records in `raw_record_column_name`.
+      raw_record_column_name: name of the column of the serialized records.
+    """
+    raw_records = record_batch.column(record_batch.schema.get_field_index(raw_record_column_name))
+    return raw_records.filter(pa.array(self(record_batch), type=pa.bool_())).flatten().to_pylist()
+
+  def evaluate_records(self, records: Sequence[bytes]) -> np.ndarray:
+    """Evaluates the predicate on serialized Examples, decoded into a RecordBatch.
+
+    Only the features of the predicate are decoded if the schema was given to `compile_predicate()`.
+    """
+    if not len(records):
+      return np.zeros(0, dtype=bool)
+    if self._decoder is None:
+      self._decoder = example_coder.ExamplesToRecordBatchDecoder(self._serialized_schema)
+    return self(self._decoder.DecodeBatch(list(records)))
+
+  def filter_records(self, records: Sequence[bytes]) -> List[bytes]:
+    """Returns the serialized Examples satisfying the predicate."""
+    return list(itertools.compress(records, self.evaluate_records(records)))
+
+
+def compile_predicate(spec: Union[Text, Dict[Text, Any]],
+                      schema: Optional[schema_pb2.Schema] = None) -> CompiledPredicate:
+  """Compiles a predicate spec.
+  Args:
+    spec: the predicate spec or its JSON serialization.
+    schema: optional schema of the examples, to only decode the features of the spec in `evaluate_records()`.
+  Returns:
+    the compiled predicate.
+  Raises:
+    ValueError if the spec is invalid or uses features which are not in the schema.
+  """
+  if isinstance(spec, str):
+    spec = json.loads(spec)
+  return CompiledPredicate(_parse(spec), schema)
@@ -0,0 +1,103 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pyarrow as pa
+import tensorflow as tf
+
+from tfx_x.components.examples.predicate_spec import compile_predicate
+
+
+def _example(**features):
+  feature = {}
+  for name, value in features.items():
+    if isinstance(value, float):
+      feature[name] = tf.train.Feature(float_list=tf.train.FloatList(value=[value]))
+    elif isinstance(value, int):
+      feature[name] = tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
+    else:
+      feature[name] = tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
+  return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+
+class PredicateSpecTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(PredicateSpecTest, self).setUp()
+    self._records = [
+      _example(trip_miles=1.0, trip_seconds=3, payment_type=b'Cash'),
+      _example(trip_miles=50.0, trip_seconds=4, payment_type=b'Credit Card'),
+      _example(trip_seconds=5),
+      _example(trip_miles=43.0, payment_type=b'Cash'),
+    ]
+
+  def testComparison(self):
+    predicate = compile_predicate({'feature': 'trip_miles', 'op': '>', 'value': 42.})
+    self.assertEqual(['trip_miles'], predicate.features)
+    self.assertEqual([False, True, False, True], predicate.evaluate_records(self._records).tolist())
+
+  def testAnd(self):
+    predicate = compile_predicate({'and': [{'feature': 'trip_miles', 'op': '>', 'value': 42.},
+                                           {'feature': 'payment_type', 'op': '==', 'value': 'Cash'}]})
+    self.assertEqual(['payment_type', 'trip_miles'], predicate.features)
+    self.assertEqual([self._records[3]], predicate.filter_records(self._records))
+
+  def testOrAndMembership(self):
+    predicate = compile_predicate({'or': [{'feature': 'trip_seconds', 'op': 'in', 'value': [3, 5]},
+                                          {'feature': 'payment_type', 'op': '==', 'value': 'Credit Card'}]})
+    self.assertEqual([True, True, True, False], predicate.evaluate_records(self._records).tolist())
+
+  def testNotAndPresent(self):
+    predicate = compile_predicate('{"not": {"feature": "trip_miles", "op": "present"}}')
+    self.assertEqual([False, False, True, False], predicate.evaluate_records(self._records).tolist())
+
+  def testEmptyBatch(self):
+    predicate = compile_predicate({'feature': 'trip_miles', 'op': '>', 'value': 42.})
+    self.assertEmpty(predicate.filter_records([]))
+
+  def testRecordBatch(self):
+    record_batch = pa.RecordBatch.from_arrays([
+      pa.array([None, [], [2.5], [43.5, 1.]], type=pa.large_list(pa.float32())),
+      pa.array([[b'a'], [b'b'], [b'c'], [b'd']], type=pa.large_list(pa.large_binary())),
+    ], ['trip_miles', '__raw_record__'])
+    predicate = compile_predicate({'feature': 'trip_miles', 'op': '>', 'value': 2})
+    self.assertEqual([False, False, True, True], predicate(record_batch).tolist())
+    self.assertEqual([b'c', b'd'], predicate.filter(record_batch, '__raw_record__'))
+
+    missing = compile_predicate({'not': {'feature': 'trip_seconds', 'op': 'present'}})
+    self.assertEqual([True, True, True, True], missing(record_batch).tolist())
+
+  def testIntFeatureWithFloatValue(self):
+    predicate = compile_predicate({'feature': 'trip_seconds', 'op': '<', 'value': 3.5})
+    self.assertEqual([True, False, False, False], predicate.evaluate_records(self._records).tolist())
+
+  def testKindMismatch(self):
+    with self.assertRaises(ValueError):
+      compile_predicate({'feature': 'payment_type', 'op': '>', 'value': 42.}).evaluate_records(self._records)
+    with self.assertRaises(ValueError):
+      compile_predicate({'feature': 'trip_miles', 'op': 'in', 'value': ['Cash']}).evaluate_records(self._records)
+
+  def testInvalidSpecs(self):
+    with self.assertRaises(ValueError):
+      compile_predicate({'feature': 'trip_miles', 'op': '~', 'value': 42.})
+    with self.assertRaises(ValueError):
+      compile_predicate({'feature': 'trip_miles', 'op': '>'})
+    with self.assertRaises(ValueError):
+      compile_predicate({'and': []})
+    with self.assertRaises(ValueError):
+      compile_predicate({'feature': 'trip_miles', 'op': 'in', 'value': 42.})
+
+
+if __name__ == '__main__':
+  tf.test.main()
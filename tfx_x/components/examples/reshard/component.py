@@ -0,0 +1,112 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Rewrite examples to a given number of shards or to shards of a given size"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from typing import Any, Dict, Optional, Text, List
+
+from tfx import types
+from tfx.dsl.components.base import base_component
+from tfx.dsl.components.base import executor_spec
+from tfx.types import ComponentSpec
+from tfx.types import standard_artifacts
+from tfx.types.component_spec import ChannelParameter, ExecutionParameter
+from tfx.utils import json_utils
+
+from tfx_x.components.examples.reshard import executor
+from tfx_x.components.examples.reshard.executor import SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY, \
+  RESHARDED_EXAMPLES_KEY, EXAMPLES_KEY, PIPELINE_CONFIGURATION_KEY, COPY_MODE_KEY, OUTPUT_CONFIG_KEY
+from tfx_x import PipelineConfiguration
+
+
+class ReshardSpec(ComponentSpec):
+  """Reshard component spec."""
+
+  PARAMETERS = {
+    SPLITS_TO_TRANSFORM_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    SPLITS_TO_COPY_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    COPY_MODE_KEY: ExecutionParameter(type=Text, optional=True),
+    OUTPUT_CONFIG_KEY: ExecutionParameter(type=(str, Text), optional=True),
+  }
+  INPUTS = {
+    EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+    PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+  }
+  OUTPUTS = {
+    RESHARDED_EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+  }
+
+
+class Reshard(base_component.BaseComponent):
+  """A TFX component to rewrite examples to fewer, larger, shards - or more, smaller, ones.
+  Reshard consumes examples data, and produces the same examples in other files. The records are not parsed.
+
+  ## Example
+    >>> reshard = Reshard(
+    >>>    examples=filter.outputs['filtered_examples'],
+    >>>    output_config={'target_shard_bytes': 128 * 1024 * 1024})
+
+  """
+
+  SPEC_CLASS = ReshardSpec
+  EXECUTOR_SPEC = executor_spec.BeamExecutorSpec(executor.Executor)
+
+  def __init__(self,
+               examples: types.Channel,
+               output_config: Optional[Dict[Text, Any]] = None,
+               num_shards: Optional[int] = None,
+               target_shard_bytes: Optional[int] = None,
+               pipeline_configuration: Optional[types.Channel] = None,
+               resharded_examples: Optional[types.Channel] = None,
+               splits_to_transform: Optional[List[Text]] = None,
+               splits_to_copy: Optional[List[Text]] = None,
+               copy_mode: Optional[Text] = None):
+    """Construct a Reshard component.
+    Args:
+      examples: A Channel of 'Examples' type, usually produced by ExampleGen
+        component. _required_
+      output_config: Compression and sharding of the resharded examples: 'compression' is 'gzip' (default) or
+                 'none', with 'num_shards' a fixed number of files or 'target_shard_bytes' the size of the
+                 serialized records of each file.
+      num_shards: Shortcut for the 'num_shards' of `output_config`.
+      target_shard_bytes: Shortcut for the 'target_shard_bytes' of `output_config`.
+      pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig
+        component.
+      resharded_examples: Channel of `Examples` to store the resharded examples.
+      splits_to_transform: Optional list of split names to reshard - default is all the splits.
+      splits_to_copy: Optional list of split names to copy.
+      copy_mode: How `splits_to_copy` are passed through: 'copy' (default) or 'link' to hard link their files - they
+                 are copied when they cannot be linked.
+    """
+    resharded_examples = resharded_examples or types.Channel(type=standard_artifacts.Examples)
+
+    if num_shards is not None or target_shard_bytes is not None:
+      output_config = dict(output_config or {})
+      if num_shards is not None:
+        output_config['num_shards'] = num_shards
+      if target_shard_bytes is not None:
+        output_config['target_shard_bytes'] = target_shard_bytes
+
+    spec = ReshardSpec(
+      examples=examples,
+      pipeline_configuration=pipeline_configuration,
+      resharded_examples=resharded_examples,
+      splits_to_transform=None if splits_to_transform is None else json_utils.dumps(splits_to_transform),
+      splits_to_copy=None if splits_to_copy is None else json_utils.dumps(splits_to_copy),
+      output_config=None if output_config is None else json_utils.dumps(output_config),
+      copy_mode=copy_mode)
+    super(Reshard, self).__init__(spec=spec)
@@ -0,0 +1,169 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""TFX reshard executor."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+from typing import Any, Dict, Mapping, List, Text
+
+import apache_beam as beam
+from absl import logging
+from tfx import types
+from tfx.dsl.components.base import base_beam_executor
+from tfx.types import artifact_utils, Artifact
+from tfx.utils import io_utils, json_utils
+
+from tfx_x.components import utils
+from tfx_x.components.examples import writer
+
+RESHARDED_EXAMPLES_KEY = 'resharded_examples'
+EXAMPLES_KEY = 'examples'
+SPLITS_TO_COPY_KEY = 'splits_to_copy'
+SPLITS_TO_TRANSFORM_KEY = 'splits_to_transform'
+PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+COPY_MODE_KEY = 'copy_mode'
+OUTPUT_CONFIG_KEY = 'output_config'
+
+_RESHARDED_EXAMPLES_FILE_PREFIX = 'resharded_examples'
+
+
+class Executor(base_beam_executor.BaseBeamExecutor):
+  """TFX reshard executor."""
+
+  def Do(self, input_dict: Dict[Text, List[types.Artifact]],
+         output_dict: Dict[Text, List[types.Artifact]],
+         exec_properties: Dict[Text, Any]) -> None:
+    """Rewrites the given input examples to other shards.
+    Args:
+      input_dict: Input dict from input key to a list of Artifacts.
+        - examples: examples to reshard.
+        - pipeline_configuration: optional PipelineConfiguration artifact.
+      output_dict: Output dict from output key to a list of Artifacts.
+        - resharded_examples: the resharded examples.
+      exec_properties: A dict of execution properties.
+        - splits_to_transform: list of splits to reshard - default is all the splits.
+        - splits_to_copy: list of splits to copy as is.
+        - output_config: compression and sharding of the resharded examples, see the `writer` module - with
+          'num_shards' or 'target_shard_bytes'.
+        - copy_mode: how the splits to copy are passed through - 'copy' (default) or 'link' to hard link their
+          files, see `utils.copy_over()`.
+    Returns:
+      None
+    """
+    self._log_startup(input_dict, output_dict, exec_properties)
+
+    examples = input_dict[EXAMPLES_KEY]
+
+    # Priority is as follow:
+    # 1. default value
+    # 2. from PipelineConfiguration
+    # 3. from exec_properties
+
+    splits_to_transform = artifact_utils.decode_split_names(
+      artifact_utils.get_single_instance(examples).split_names)
+    splits_to_copy = []
+    output_config = None
+    copy_mode = utils.COPY_MODE
+
+    if PIPELINE_CONFIGURATION_KEY in input_dict:
+      pipeline_configuration_dir = artifact_utils.get_single_uri(input_dict[PIPELINE_CONFIGURATION_KEY])
+      pipeline_configuration_file = os.path.join(pipeline_configuration_dir, 'custom_config.json')
+      pipeline_configuration_str = io_utils.read_string_file(pipeline_configuration_file)
+      pipeline_configuration = json.loads(pipeline_configuration_str)
+
+      if SPLITS_TO_TRANSFORM_KEY in pipeline_configuration:
+        splits_to_transform = pipeline_configuration[SPLITS_TO_TRANSFORM_KEY]
+
+      if SPLITS_TO_COPY_KEY in pipeline_configuration:
+        splits_to_copy = pipeline_configuration[SPLITS_TO_COPY_KEY]
+
+      if OUTPUT_CONFIG_KEY in pipeline_configuration:
+        output_config = pipeline_configuration[OUTPUT_CONFIG_KEY]
+
+      if COPY_MODE_KEY in pipeline_configuration:
+        copy_mode = pipeline_configuration[COPY_MODE_KEY]
+
+    # Now looking at the exec_properties
+    if SPLITS_TO_TRANSFORM_KEY in exec_properties and exec_properties[SPLITS_TO_TRANSFORM_KEY] is not None:
+      splits_to_transform = json_utils.loads(exec_properties[SPLITS_TO_TRANSFORM_KEY])
+
+    if SPLITS_TO_COPY_KEY in exec_properties and exec_properties[SPLITS_TO_COPY_KEY] is not None:
+      splits_to_copy = json_utils.loads(exec_properties[SPLITS_TO_COPY_KEY])
+
+    if OUTPUT_CONFIG_KEY in exec_properties and exec_properties[OUTPUT_CONFIG_KEY] is not None:
+      output_config = json_utils.loads(exec_properties[OUTPUT_CONFIG_KEY])
+
+    if COPY_MODE_KEY in exec_properties and exec_properties[COPY_MODE_KEY] is not None:
+      copy_mode = exec_properties[COPY_MODE_KEY]
+
+    # Validate we have all we need
+    output_config = writer.output_config(output_config)
+    if not output_config.is_sharded:
+      raise ValueError('\'num_shards\' or \'target_shard_bytes\' is missing in \'output_config\'.')
+
+    if EXAMPLES_KEY not in input_dict:
+      raise ValueError('\'examples\' is missing in input dict.')
+
+    if RESHARDED_EXAMPLES_KEY not in output_dict:
+      raise ValueError('\'resharded_examples\' is missing in output dict.')
+
+    output_artifact = artifact_utils.get_single_instance(output_dict[RESHARDED_EXAMPLES_KEY])
+    output_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform + splits_to_copy)
+
+    example_uris = {}
+
+    for split in splits_to_transform:
+      data_uri = utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
+      example_uris[split] = data_uri
+
+    # do something with the splits we dont want to transform ('splits_to_copy'), while the pipeline runs
+    with utils.copying_over(examples, output_artifact, splits_to_copy, copy_mode=copy_mode):
+      self._run_resharding(example_uris,
+                           output_artifact=output_artifact,
+                           output_config=output_config)
+
+    logging.info('Reshard generates resharded examples to %s', output_artifact.uri)
+
+  def _run_resharding(self,
+                      example_uris: Mapping[Text, Text],
+                      output_artifact: Artifact,
+                      output_config: writer.OutputConfig) -> None:
+    """Rewrites the records of given example data to new shards, the records are not parsed.
+    Args:
+      example_uris: Mapping of example split name to example uri.
+      output_artifact: Output artifact.
+      output_config: compression and sharding of the output.
+    Returns:
+      None
+    """
+
+    with self._make_beam_pipeline() as pipeline:
+      for split_name, example_uri in example_uris.items():
+        dest_path = os.path.join(artifact_utils.get_split_uri([output_artifact], split_name),
+                                 _RESHARDED_EXAMPLES_FILE_PREFIX)
+        _ = (
+            pipeline
+            | 'ReadData[{}]'.format(split_name) >> beam.io.ReadFromTFRecord(
+          file_pattern=io_utils.all_files_pattern(example_uri))
+            | 'WriteReshardedExamples ({})'.format(split_name) >> writer.WriteExamples(
+          dest_path,
+          output_config,
+          metadata_path=writer.shard_metadata_path(output_artifact, split_name)))
+        logging.info('Resharded examples written to %s.', dest_path)
@@ -0,0 +1,116 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import json
+import os
+
+import tensorflow as tf
+from tfx.dsl.io import fileio
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.examples import writer
+from tfx_x.components.examples.reshard import executor
+from tfx_x.components.examples.reshard.executor import RESHARDED_EXAMPLES_KEY, EXAMPLES_KEY, OUTPUT_CONFIG_KEY, \
+  SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY
+
+
+class ExecutorTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ExecutorTest, self).setUp()
+    self._source_data_dir = os.path.join(
+      os.path.dirname(os.path.dirname(__file__)), 'testdata')
+    self._output_data_dir = os.path.join(
+      os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+      self._testMethodName)
+    self.component_id = 'test_component'
+
+    # Create input dict.
+    self._examples = standard_artifacts.Examples()
+    self._examples.uri = os.path.join(self._source_data_dir, 'csv_example_gen')
+
+    self._examples.split_names = artifact_utils.encode_split_names(
+      ['train', 'eval', 'unlabelled'])
+
+    self._input_dict = {
+      EXAMPLES_KEY: [self._examples],
+    }
+
+    # Create output dict.
+    self._resharding_result = standard_artifacts.Examples()
+    self._resharded_examples_dir = os.path.join(self._output_data_dir, "something")
+    self._resharding_result.uri = self._resharded_examples_dir
+
+    self._output_dict = {
+      RESHARDED_EXAMPLES_KEY: [self._resharding_result],
+    }
+
+    # Create exe properties.
+    self._exec_properties = {
+      'component_id': self.component_id,
+      SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval']),
+      SPLITS_TO_COPY_KEY: json.dumps(['train']),
+    }
+
+    # Create context
+    self._tmp_dir = os.path.join(self._output_data_dir, '.temp')
+    self._context = executor.Executor.Context(
+      tmp_dir=self._tmp_dir, unique_id='2')
+
+  def _get_records(self, filepattern):
+    records = []
+    for f in fileio.glob(filepattern):
+      records.extend(tf.compat.v1.python_io.tf_record_iterator(
+        path=f,
+        options=tf.compat.v1.python_io.TFRecordOptions(
+          tf.compat.v1.python_io.TFRecordCompressionType.GZIP)))
+    return records
+
+  def _run(self, output_config):
+    self._exec_properties[OUTPUT_CONFIG_KEY] = json.dumps(output_config)
+    reshard = executor.Executor(self._context)
+    reshard.Do(self._input_dict, self._output_dict, self._exec_properties)
+    return sorted(fileio.glob(os.path.join(self._resharded_examples_dir, 'Split-eval', '*')))
+
+  def testDoWithNumShards(self):
+    files = self._run({'num_shards': 2})
+
+    self.assertLen(files, 2)
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    self.assertCountEqual(inputs, self._get_records(os.path.join(self._resharded_examples_dir, 'Split-eval', '*')))
+    self.assertCountEqual(['eval', 'train'],
+                          artifact_utils.decode_split_names(self._resharding_result.split_names))
+    self.assertTrue(fileio.exists(os.path.join(self._resharded_examples_dir, 'Split-train')))
+
+    metadata = writer.read_shard_metadata(self._resharding_result, 'eval')
+    self.assertEqual(len(inputs), metadata['records'])
+    self.assertEqual(sum(len(record) for record in inputs), metadata['bytes'])
+
+  def testDoWithTargetShardBytes(self):
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    total_bytes = sum(len(record) for record in inputs)
+
+    files = self._run({'target_shard_bytes': total_bytes // 3 + 1})
+
+    self.assertLen(files, 3)
+    self.assertCountEqual(inputs, self._get_records(os.path.join(self._resharded_examples_dir, 'Split-eval', '*')))
+
+  def testDoWithoutSharding(self):
+    with self.assertRaises(ValueError):
+      self._run({'compression': 'none'})
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -17,7 +17,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from typing import Optional, Text, List
+from typing import Any, Dict, Optional, Text, List, Union
 
 from tfx import types
 from tfx.dsl.components.base import base_component
@@ -28,10 +28,14 @@ from tfx.types.component_spec import ChannelParameter, ExecutionParameter
 from tfx.utils import json_utils
 
 from tfx_x.components.examples.stratified_sampler import executor
+from tfx_x.components.examples.stratified_sampler.sampling import BOTTOM_K_ENGINE
 from tfx_x.components.examples.stratified_sampler.executor import SPLITS_TO_TRANSFORM_KEY, \
   SAMPLES_PER_KEY_KEY, TO_KEY_FN_KEY, SPLITS_TO_COPY_KEY, STRATIFIED_EXAMPLES_KEY, EXAMPLES_KEY, \
-  PIPELINE_CONFIGURATION_KEY, TO_KEY_FN_KEY_KEY
-from tfx_x import PipelineConfiguration
+  PIPELINE_CONFIGURATION_KEY, TO_KEY_FN_KEY_KEY, LAZY_DECODING_KEY, \
+  SAMPLING_ENGINE_KEY, SAMPLING_SEED_KEY, HOT_KEY_FANOUT_KEY, SAMPLES_PER_KEY_MAP_KEY, ALLOCATION_KEY, \
+  KEY_HISTOGRAM_KEY, COPY_MODE_KEY, SAMPLER_STATE_KEY, PREVIOUS_SAMPLER_STATE_KEY, OUTPUT_CONFIG_KEY, \
+  EXAMPLES_INDEX_KEY, PER_KEY_METRICS_KEY
+from tfx_x import PipelineConfiguration, KeyHistogram, SamplerState, ExamplesIndex
 
 
 class StratifiedSamplerSpec(ComponentSpec):
@@ -43,13 +47,26 @@ class StratifiedSamplerSpec(ComponentSpec):
     TO_KEY_FN_KEY: ExecutionParameter(type=Text, optional=True),
     TO_KEY_FN_KEY_KEY: ExecutionParameter(type=Text, optional=True),
     SAMPLES_PER_KEY_KEY: ExecutionParameter(type=int, optional=True),
+    LAZY_DECODING_KEY: ExecutionParameter(type=int, optional=True),
+    COPY_MODE_KEY: ExecutionParameter(type=Text, optional=True),
+    SAMPLING_ENGINE_KEY: ExecutionParameter(type=Text, optional=True),
+    SAMPLING_SEED_KEY: ExecutionParameter(type=int, optional=True),
+    HOT_KEY_FANOUT_KEY: ExecutionParameter(type=int, optional=True),
+    PER_KEY_METRICS_KEY: ExecutionParameter(type=int, optional=True),
+    SAMPLES_PER_KEY_MAP_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    ALLOCATION_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    OUTPUT_CONFIG_KEY: ExecutionParameter(type=(str, Text), optional=True),
   }
   INPUTS = {
     EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
     PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+    PREVIOUS_SAMPLER_STATE_KEY: ChannelParameter(type=SamplerState, optional=True),
+    EXAMPLES_INDEX_KEY: ChannelParameter(type=ExamplesIndex, optional=True),
   }
   OUTPUTS = {
     STRATIFIED_EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+    KEY_HISTOGRAM_KEY: ChannelParameter(type=KeyHistogram),
+    SAMPLER_STATE_KEY: ChannelParameter(type=SamplerState, optional=True),
   }
 
 
@@ -77,7 +94,20 @@ class StratifiedSampler(base_component.BaseComponent):
                stratified_examples: Optional[types.Channel] = None,
                splits_to_transform: Optional[List[Text]] = None,
                splits_to_copy: Optional[List[Text]] = None,
-               samples_per_key: Optional[int] = None):
+               samples_per_key: Optional[int] = None,
+               lazy_decoding: Optional[bool] = None,
+               sampling_engine: Optional[Text] = None,
+               sampling_seed: Optional[int] = None,
+               hot_key_fanout: Optional[int] = None,
+               samples_per_key_map: Optional[Dict[Text, int]] = None,
+               allocation: Optional[Dict[Text, Any]] = None,
+               key_histogram: Optional[types.Channel] = None,
+               copy_mode: Optional[Text] = None,
+               previous_sampler_state: Optional[types.Channel] = None,
+               sampler_state: Optional[Union[types.Channel, bool]] = None,
+               output_config: Optional[Dict[Text, Any]] = None,
+               examples_index: Optional[types.Channel] = None,
+               per_key_metrics: Optional[bool] = None):
     """Construct an StratifiedSampler component.
     Args:
       examples: A Channel of 'Examples' type, usually produced by ExampleGen
@@ -94,6 +124,47 @@ class StratifiedSampler(base_component.BaseComponent):
                  For example something like:
                  >>> def to_key(m):
                  >>>   return m.features.feature['trip_miles'].float_list.value[0] > 42.
+      lazy_decoding: If true (default is false), `to_key` gets a `LazyExample` which only decodes the features it
+                 accesses - `m.features.feature[name]` works as with a `tf.train.Example`.
+      sampling_engine: 'reservoir' (default) uses `Sample.FixedSizePerKey`, 'bottom_k' keeps the records with the
+                 smallest seeded hash for each key so the sample is the same from one run to the next, 'bernoulli'
+                 counts the records per key first and then streams each record with probability
+                 samples_per_key / count(key) so no record is kept - the records are joined with the rate of their
+                 key so memory does not grow with the number of keys, and `to_key_fn` runs twice per record -,
+                 'index' picks the records of each key from the keys of `examples_index` and only reads these ones -
+                 without `to_key_fn`. Only uncompressed examples are read with positional reads: the gzip files
+                 ExampleGen writes by default are decompressed from their start up to their last selected record,
+                 a warning is logged.
+      sampling_seed: Seed of the hash used by the 'bottom_k', 'bernoulli' and 'index' engines - default is 0.
+      hot_key_fanout: If > 1, the per-key combines are first done in parallel on that many sub-keys so a dominant
+                 key does not end up on a single worker. By default, the keys of a sample of the records of each
+                 split are counted and the hot keys get a fan-out in proportion of their share - 0 or 1 for none.
+      samples_per_key_map: Number of samples of some keys, by name of the key - `str(key)` or the utf-8 string of
+                 a bytes key. For example to keep the minority classes in full:
+                 >>> {'fraud': 1000000}
+      allocation: Number of samples of the keys in proportion of their counts of records, bounded by a floor and
+                 a cap (both optional), with the 'bottom_k', 'bernoulli' and 'index' engines. For example:
+                 >>> {'policy': 'proportional', 'total': 10000, 'floor': 100, 'cap': 5000}
+                 `samples_per_key_map` takes precedence over `allocation` which takes precedence over
+                 `samples_per_key`.
+      key_histogram: Channel of `KeyHistogram` to store, for each split, the input and output counts and bytes of
+                 each key.
+      copy_mode: How `splits_to_copy` are passed through: 'copy' (default) or 'link' to hard link their files - they
+                 are copied when they cannot be linked.
+      previous_sampler_state: A Channel of 'SamplerState' type produced by a previous run of the component on
+                 (a previous version of) the same examples. When the configuration is the same and the input files
+                 of the previous run are unchanged, only the new input files are read and merged with this state.
+      sampler_state: Channel of `SamplerState` - or True for a new one - to store the state of the 'bottom_k'
+                 engine, which must be chosen as the default engine is 'reservoir' - a `ValueError` is raised with
+                 the other engines or with an `allocation`. Declared by default only with a `previous_sampler_state`:
+                 writing the state makes each run list the input files and read them one by one.
+      output_config: Compression and sharding of the stratified examples: 'compression' is 'gzip' (default) or
+                 'none', 'num_shards' a fixed number of files or 'target_shard_bytes' the size of the serialized
+                 records of each file - the runner picks the number of files otherwise.
+      examples_index: A Channel of 'ExamplesIndex' type, produced by the Index component with a `to_key_fn`, for
+                 the 'index' engine.
+      per_key_metrics: If true, the records, bytes and time in `to_key` of each key are counted in the pipeline
+                 metrics - one counter per key, only for a few keys. The totals are always counted.
     """
     stratified_examples = stratified_examples or types.Channel(
       type=standard_artifacts.Examples)
@@ -101,13 +172,34 @@ class StratifiedSampler(base_component.BaseComponent):
     if stratified_examples is None:
       stratified_examples = types.Channel(type=standard_artifacts.Examples, matching_channel_name='examples')
 
+    key_histogram = key_histogram or types.Channel(type=KeyHistogram)
+    if sampler_state is None:
+      sampler_state = previous_sampler_state is not None
+    if sampler_state is True:
+      sampler_state = types.Channel(type=SamplerState)
+    if sampler_state and (sampling_engine not in (None, BOTTOM_K_ENGINE) or allocation is not None):
+      raise ValueError('\'sampler_state\' is only supported by the \'bottom_k\' engine without \'allocation\'.')
+
     spec = StratifiedSamplerSpec(
       examples=examples,
       pipeline_configuration=pipeline_configuration,
       stratified_examples=stratified_examples,
+      key_histogram=key_histogram,
+      previous_sampler_state=previous_sampler_state,
+      sampler_state=sampler_state or None,
+      examples_index=examples_index,
       splits_to_transform=json_utils.dumps(splits_to_transform),
       splits_to_copy=json_utils.dumps(splits_to_copy),
       to_key_fn=to_key_fn,
       to_key_fn_key=to_key_fn_key,
-      samples_per_key=samples_per_key)
+      samples_per_key=samples_per_key,
+      lazy_decoding=None if lazy_decoding is None else int(lazy_decoding),
+      sampling_engine=sampling_engine,
+      sampling_seed=sampling_seed,
+      hot_key_fanout=hot_key_fanout,
+      per_key_metrics=None if per_key_metrics is None else int(per_key_metrics),
+      samples_per_key_map=None if samples_per_key_map is None else json_utils.dumps(samples_per_key_map),
+      allocation=None if allocation is None else json_utils.dumps(allocation),
+      copy_mode=copy_mode,
+      output_config=None if output_config is None else json_utils.dumps(output_config))
     super(StratifiedSampler, self).__init__(spec=spec)
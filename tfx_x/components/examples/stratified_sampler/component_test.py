@@ -23,8 +23,10 @@ from tfx.types import channel_utils
 from tfx.types import standard_artifacts
 
 from tfx_x.components.examples.stratified_sampler.component import StratifiedSampler
-from tfx_x.components.examples.stratified_sampler.executor import STRATIFIED_EXAMPLES_KEY
-from tfx_x import PipelineConfiguration
+from tfx_x.components.examples.stratified_sampler.executor import STRATIFIED_EXAMPLES_KEY, \
+  SAMPLES_PER_KEY_MAP_KEY, KEY_HISTOGRAM_KEY, SAMPLER_STATE_KEY, PREVIOUS_SAMPLER_STATE_KEY, \
+  EXAMPLES_INDEX_KEY
+from tfx_x import PipelineConfiguration, KeyHistogram, SamplerState, ExamplesIndex
 
 
 class ComponentTest(tf.test.TestCase):
@@ -81,6 +83,63 @@ class ComponentTest(tf.test.TestCase):
       samples_per_key=112)
     self.assertEqual('Examples', stratified_sampler.outputs[STRATIFIED_EXAMPLES_KEY].type_name)
 
+  def testConstructWithAllocation(self):
+    examples = standard_artifacts.Examples()
+    stratified_sampler = StratifiedSampler(
+      examples=channel_utils.as_channel([examples]),
+      pipeline_configuration=types.Channel(type=PipelineConfiguration),
+      stratified_examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      sampling_engine='bottom_k',
+      samples_per_key_map={'True': 1000000},
+      allocation={'policy': 'proportional', 'total': 10000, 'floor': 100, 'cap': 5000})
+    self.assertEqual('Examples', stratified_sampler.outputs[STRATIFIED_EXAMPLES_KEY].type_name)
+    self.assertEqual('{"True": 1000000}', stratified_sampler.exec_properties[SAMPLES_PER_KEY_MAP_KEY])
+
+  def testConstructWithKeyHistogram(self):
+    stratified_sampler = StratifiedSampler(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      to_key_fn_key='to_key_fn_key',
+      samples_per_key=112)
+    self.assertEqual(KeyHistogram.TYPE_NAME, stratified_sampler.outputs[KEY_HISTOGRAM_KEY].type_name)
+
+  def testConstructWithPreviousSamplerState(self):
+    stratified_sampler = StratifiedSampler(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      previous_sampler_state=channel_utils.as_channel([SamplerState()]),
+      sampling_engine='bottom_k',
+      samples_per_key=112)
+    self.assertEqual(SamplerState.TYPE_NAME, stratified_sampler.outputs[SAMPLER_STATE_KEY].type_name)
+    self.assertEqual(SamplerState.TYPE_NAME, stratified_sampler.inputs[PREVIOUS_SAMPLER_STATE_KEY].type_name)
+
+  def testConstructWithoutSamplerState(self):
+    stratified_sampler = StratifiedSampler(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      sampling_engine='bottom_k',
+      samples_per_key=112)
+    self.assertNotIn(SAMPLER_STATE_KEY, stratified_sampler.outputs)
+
+  def testConstructWithSamplerState(self):
+    stratified_sampler = StratifiedSampler(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      sampling_engine='bottom_k',
+      sampler_state=True,
+      samples_per_key=112)
+    self.assertEqual(SamplerState.TYPE_NAME, stratified_sampler.outputs[SAMPLER_STATE_KEY].type_name)
+
+    with self.assertRaises(ValueError):
+      StratifiedSampler(examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+                        sampling_engine='bernoulli',
+                        sampler_state=True,
+                        samples_per_key=112)
+
+  def testConstructWithExamplesIndex(self):
+    stratified_sampler = StratifiedSampler(
+      examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+      examples_index=channel_utils.as_channel([ExamplesIndex()]),
+      sampling_engine='index',
+      samples_per_key=112)
+    self.assertEqual(ExamplesIndex.TYPE_NAME, stratified_sampler.inputs[EXAMPLES_INDEX_KEY].type_name)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -19,9 +19,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import itertools
 import json
 import os
-from typing import Any, Dict, Mapping, List, Text
+from typing import Any, Callable, Dict, Iterable, Mapping, List, Optional, Text, Tuple
 
 import apache_beam as beam
 import tensorflow as tf
@@ -32,6 +33,10 @@ from tfx.types import artifact_utils, Artifact
 from tfx.utils import io_utils, json_utils
 
 from tfx_x.components import utils
+from tfx_x.components.examples import writer
+from tfx_x.components.examples.lazy_example import LazyExample
+from tfx_x.components.examples.stratified_sampler import sampling
+from tfx_x.components.examples.stratified_sampler import state as state_lib
 
 STRATIFIED_EXAMPLES_KEY = 'stratified_examples'
 EXAMPLES_KEY = 'examples'
@@ -41,9 +46,28 @@ SPLITS_TO_COPY_KEY = 'splits_to_copy'
 SPLITS_TO_TRANSFORM_KEY = 'splits_to_transform'
 PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
 TO_KEY_FN_KEY_KEY = 'to_key_fn_key'
+LAZY_DECODING_KEY = 'lazy_decoding'
+COPY_MODE_KEY = 'copy_mode'
+SAMPLING_ENGINE_KEY = 'sampling_engine'
+SAMPLING_SEED_KEY = 'sampling_seed'
+HOT_KEY_FANOUT_KEY = 'hot_key_fanout'
+SAMPLES_PER_KEY_MAP_KEY = 'samples_per_key_map'
+ALLOCATION_KEY = 'allocation'
+KEY_HISTOGRAM_KEY = 'key_histogram'
+SAMPLER_STATE_KEY = 'sampler_state'
+PREVIOUS_SAMPLER_STATE_KEY = 'previous_sampler_state'
+OUTPUT_CONFIG_KEY = 'output_config'
+EXAMPLES_INDEX_KEY = 'examples_index'
+PER_KEY_METRICS_KEY = 'per_key_metrics'
 
 _STRATIFIED_EXAMPLES_FILE_PREFIX = 'stratified_examples'
 _STRATIFIED_EXAMPLES_DIR_NAME = 'stratified_examples'
+_KEY_HISTOGRAM_FILE_PREFIX = 'key_histogram'
+# max number of records of an uncompressed file read by a single task of the 'index' engine
+_INDEX_FETCH_BATCH = 1000
+# the hot keys of a split are detected on the first records of a few of its files
+_HOT_KEY_SAMPLE_RECORDS = 10000
+_HOT_KEY_SAMPLE_FILES = 16
 
 
 class Executor(base_beam_executor.BaseBeamExecutor):
@@ -57,14 +81,46 @@ class Executor(base_beam_executor.BaseBeamExecutor):
       input_dict: Input dict from input key to a list of Artifacts.
         - examples: examples for inference.
         - pipeline_configuration: optional PipelineConfiguration artifact.
+        - previous_sampler_state: optional `sampler_state` of a previous run on the same examples. With the same
+          configuration, only the input files added since are read and merged with it.
+        - examples_index: `ExamplesIndex` of the examples, with keys - required by the 'index' engine.
       output_dict: Output dict from output key to a list of Artifacts.
         - stratified_examples: the stratified examples.
+        - key_histogram: optional, for each split, a TFRecord of tf.train.Example with the 'key', 'input_count',
+          'input_bytes', 'output_count' and 'output_bytes' of each key - of the records read by this run.
+        - sampler_state: optional, the state of the 'bottom_k' engine to give to a later run as
+          `previous_sampler_state`. A `ValueError` is raised with the other engines or with an `allocation`.
       exec_properties: A dict of execution properties.
         - splits_to_transform: list of splits to transform.
         - splits_to_copy: list of splits to copy as is.
         - to_key_fn: the function that will extract the key - must be 'to_key: Example -> key
         - to_key_fn_key: alternate name for the key containing the def of `to_key()`
         - samples_per_key: the number samples per classes
+        - samples_per_key_map: number of samples of some keys, by name of the key - `str(key)` or the
+          utf-8 string of a bytes key - it takes precedence over `allocation` and `samples_per_key`.
+        - allocation: number of samples of the keys proportional to their counts:
+          {'policy': 'proportional', 'total': N, 'floor': f, 'cap': c} - it takes precedence over
+          `samples_per_key`. Only with the 'bottom_k', 'bernoulli' and 'index' engines.
+        - lazy_decoding: if true (default is false), `to_key()` gets a `LazyExample` which only decodes
+          the features it accesses, otherwise a fully decoded `tf.train.Example`.
+        - sampling_engine: 'reservoir' (default) for `Sample.FixedSizePerKey` or 'bottom_k' to keep, per key,
+          the records with the smallest seeded hash - reproducible from one run to the next - or 'bernoulli'
+          to count the records per key first and then keep each record with probability
+          samples_per_key / count(key) - no record is kept, the records are joined with the rate of their key and
+          `to_key()` runs twice per record - or 'index' to pick the records from the keys of `examples_index`
+          and only read these ones - `to_key_fn` is not used. Compressed files - ExampleGen writes gzip files by
+          default - are decompressed from their start up to their last selected record, a warning is logged.
+        - sampling_seed: the seed of the hash used by the 'bottom_k', 'bernoulli' and 'index' engines - default
+          is 0.
+        - hot_key_fanout: if > 1, the per-key combines are first done in parallel on that many sub-keys
+          so a dominant key does not end up on a single worker. By default, the keys of a sample of the records
+          of each split are counted and the hot keys get a fan-out in proportion of their share of the sample,
+          see `sampling.hot_key_fanouts()`. 0 or 1 for no fan-out.
+        - per_key_metrics: if true, the records, bytes and time in `to_key()` are also counted for each key -
+          one counter per key, only for a few keys. Default is false.
+        - copy_mode: how the splits to copy are passed through - 'copy' (default) or 'link' to hard link their
+          files, see `utils.copy_over()`.
+        - output_config: compression and sharding of the stratified examples, see the `writer` module.
     Returns:
       None
     """
@@ -80,6 +136,15 @@ class Executor(base_beam_executor.BaseBeamExecutor):
     splits_to_transform = []
     samples_per_key = None
     to_key_fn = None
+    lazy_decoding = False
+    copy_mode = utils.COPY_MODE
+    sampling_engine = sampling.RESERVOIR_ENGINE
+    sampling_seed = 0
+    hot_key_fanout = None
+    per_key_metrics = False
+    samples_per_key_map = None
+    allocation = None
+    output_config = None
     to_key_fn_key = exec_properties[TO_KEY_FN_KEY_KEY] if TO_KEY_FN_KEY_KEY in exec_properties else TO_KEY_FN_KEY
 
     splits_to_copy = artifact_utils.decode_split_names(
@@ -105,6 +170,33 @@ class Executor(base_beam_executor.BaseBeamExecutor):
       if SAMPLES_PER_KEY_KEY in pipeline_configuration:
         samples_per_key = pipeline_configuration[SAMPLES_PER_KEY_KEY]
 
+      if LAZY_DECODING_KEY in pipeline_configuration:
+        lazy_decoding = bool(pipeline_configuration[LAZY_DECODING_KEY])
+
+      if COPY_MODE_KEY in pipeline_configuration:
+        copy_mode = pipeline_configuration[COPY_MODE_KEY]
+
+      if SAMPLING_ENGINE_KEY in pipeline_configuration:
+        sampling_engine = pipeline_configuration[SAMPLING_ENGINE_KEY]
+
+      if SAMPLING_SEED_KEY in pipeline_configuration:
+        sampling_seed = pipeline_configuration[SAMPLING_SEED_KEY]
+
+      if HOT_KEY_FANOUT_KEY in pipeline_configuration:
+        hot_key_fanout = pipeline_configuration[HOT_KEY_FANOUT_KEY]
+
+      if PER_KEY_METRICS_KEY in pipeline_configuration:
+        per_key_metrics = bool(pipeline_configuration[PER_KEY_METRICS_KEY])
+
+      if SAMPLES_PER_KEY_MAP_KEY in pipeline_configuration:
+        samples_per_key_map = pipeline_configuration[SAMPLES_PER_KEY_MAP_KEY]
+
+      if ALLOCATION_KEY in pipeline_configuration:
+        allocation = pipeline_configuration[ALLOCATION_KEY]
+
+      if OUTPUT_CONFIG_KEY in pipeline_configuration:
+        output_config = pipeline_configuration[OUTPUT_CONFIG_KEY]
+
     # Now looking at the exec_properties
     if SPLITS_TO_TRANSFORM_KEY in exec_properties and exec_properties[SPLITS_TO_TRANSFORM_KEY] is not None:
       splits_to_transform = json_utils.loads(exec_properties[SPLITS_TO_TRANSFORM_KEY])
@@ -121,13 +213,63 @@ class Executor(base_beam_executor.BaseBeamExecutor):
     if SAMPLES_PER_KEY_KEY in exec_properties and exec_properties[SAMPLES_PER_KEY_KEY] is not None:
       samples_per_key = exec_properties[SAMPLES_PER_KEY_KEY]
 
+    if LAZY_DECODING_KEY in exec_properties and exec_properties[LAZY_DECODING_KEY] is not None:
+      lazy_decoding = bool(exec_properties[LAZY_DECODING_KEY])
+
+    if COPY_MODE_KEY in exec_properties and exec_properties[COPY_MODE_KEY] is not None:
+      copy_mode = exec_properties[COPY_MODE_KEY]
+
+    if SAMPLING_ENGINE_KEY in exec_properties and exec_properties[SAMPLING_ENGINE_KEY] is not None:
+      sampling_engine = exec_properties[SAMPLING_ENGINE_KEY]
+
+    if SAMPLING_SEED_KEY in exec_properties and exec_properties[SAMPLING_SEED_KEY] is not None:
+      sampling_seed = exec_properties[SAMPLING_SEED_KEY]
+
+    if HOT_KEY_FANOUT_KEY in exec_properties and exec_properties[HOT_KEY_FANOUT_KEY] is not None:
+      hot_key_fanout = exec_properties[HOT_KEY_FANOUT_KEY]
+
+    if PER_KEY_METRICS_KEY in exec_properties and exec_properties[PER_KEY_METRICS_KEY] is not None:
+      per_key_metrics = bool(exec_properties[PER_KEY_METRICS_KEY])
+
+    if SAMPLES_PER_KEY_MAP_KEY in exec_properties and exec_properties[SAMPLES_PER_KEY_MAP_KEY] is not None:
+      samples_per_key_map = json_utils.loads(exec_properties[SAMPLES_PER_KEY_MAP_KEY])
+
+    if ALLOCATION_KEY in exec_properties and exec_properties[ALLOCATION_KEY] is not None:
+      allocation = json_utils.loads(exec_properties[ALLOCATION_KEY])
+
+    if OUTPUT_CONFIG_KEY in exec_properties and exec_properties[OUTPUT_CONFIG_KEY] is not None:
+      output_config = json_utils.loads(exec_properties[OUTPUT_CONFIG_KEY])
+
     # Validate we have all we need
-    if to_key_fn is None:
+    if to_key_fn is None and sampling_engine != sampling.INDEX_ENGINE:
       raise ValueError('\'to_key_fn\' is missing in exec dict.')
 
-    if samples_per_key is None:
+    if samples_per_key is None and allocation is None:
       raise ValueError('\'samples_per_key\' is missing in exec dict.')
 
+    if sampling_engine not in sampling.ENGINES:
+      raise ValueError('Unsupported \'sampling_engine\': {} - must be one of {}'.format(sampling_engine,
+                                                                                       sampling.ENGINES))
+
+    sample_sizes = sampling.SampleSizes(samples_per_key, samples_per_key_map, allocation)
+    if not sample_sizes.is_fixed and sampling_engine == sampling.RESERVOIR_ENGINE:
+      raise ValueError('\'samples_per_key_map\' and \'allocation\' need the \'bottom_k\', \'bernoulli\' or '
+                       '\'index\' sampling engine.')
+
+    # the engine is only known here, once the defaults, the PipelineConfiguration and the exec_properties are merged
+    with_state = bool(output_dict.get(SAMPLER_STATE_KEY) or input_dict.get(PREVIOUS_SAMPLER_STATE_KEY))
+    if with_state and (sampling_engine != sampling.BOTTOM_K_ENGINE or sample_sizes.depends_on_counts):
+      raise ValueError('Sampler states are only supported by the \'bottom_k\' engine without \'allocation\', the '
+                       'engine is \'{}\'.'.format(sampling_engine))
+
+    index_artifact = None
+    if sampling_engine == sampling.INDEX_ENGINE:
+      if not input_dict.get(EXAMPLES_INDEX_KEY):
+        raise ValueError('\'examples_index\' is missing in input dict, it is required by the \'index\' engine.')
+      index_artifact = artifact_utils.get_single_instance(input_dict[EXAMPLES_INDEX_KEY])
+
+    output_config = writer.output_config(output_config)
+
     if EXAMPLES_KEY not in input_dict:
       raise ValueError('\'examples\' is missing in input dict.')
 
@@ -137,19 +279,67 @@ class Executor(base_beam_executor.BaseBeamExecutor):
     output_artifact = artifact_utils.get_single_instance(output_dict[STRATIFIED_EXAMPLES_KEY])
     output_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform + splits_to_copy)
 
+    histogram_artifact = None
+    if output_dict.get(KEY_HISTOGRAM_KEY):
+      histogram_artifact = artifact_utils.get_single_instance(output_dict[KEY_HISTOGRAM_KEY])
+      histogram_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform)
+
     example_uris = {}
 
     for split in splits_to_transform:
-      data_uri = artifact_utils.get_split_uri(examples, split)
+      data_uri = utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
       example_uris[split] = data_uri
 
-    # do something with the splits we dont want to transform ('splits_to_copy')
-    utils.copy_over(examples, output_artifact, splits_to_copy)
-
-    self._run_sampling(example_uris,
-                       output_artifact=output_artifact,
-                       samples_per_key=samples_per_key,
-                       to_key_fn=to_key_fn)
+    state_artifact = None
+    input_files = None
+    state_fingerprint = None
+    if with_state:
+      state_fingerprint = state_lib.config_fingerprint(to_key_fn, sampling_seed, samples_per_key,
+                                                       samples_per_key_map)
+      if output_dict.get(SAMPLER_STATE_KEY):
+        state_artifact = artifact_utils.get_single_instance(output_dict[SAMPLER_STATE_KEY])
+        state_artifact.split_names = artifact_utils.encode_split_names(splits_to_transform)
+
+      previous_state = None
+      if input_dict.get(PREVIOUS_SAMPLER_STATE_KEY):
+        previous_state = artifact_utils.get_single_instance(input_dict[PREVIOUS_SAMPLER_STATE_KEY])
+      previous_manifest = state_lib.read_manifest(previous_state, state_fingerprint)
+
+      input_files = {}
+      fingerprints = {}
+      for split, example_uri in example_uris.items():
+        input_files[split], fingerprints[split] = state_lib.plan_split(split, example_uri, previous_state,
+                                                                       previous_manifest)
+
+    # do something with the splits we dont want to transform ('splits_to_copy'), while the pipeline runs
+    with utils.copying_over(examples, output_artifact, splits_to_copy, copy_mode=copy_mode):
+      if index_artifact is not None:
+        self._run_index_sampling(example_uris,
+                                 index_artifact=index_artifact,
+                                 output_artifact=output_artifact,
+                                 sample_sizes=sample_sizes,
+                                 sampling_seed=sampling_seed,
+                                 hot_key_fanout=hot_key_fanout,
+                                 histogram_artifact=histogram_artifact,
+                                 output_config=output_config)
+      else:
+        self._run_sampling(example_uris,
+                           output_artifact=output_artifact,
+                           samples_per_key=samples_per_key,
+                           to_key_fn=to_key_fn,
+                           lazy_decoding=lazy_decoding,
+                           sampling_engine=sampling_engine,
+                           sampling_seed=sampling_seed,
+                           hot_key_fanout=hot_key_fanout,
+                           per_key_metrics=per_key_metrics,
+                           sample_sizes=sample_sizes,
+                           histogram_artifact=histogram_artifact,
+                           input_files=input_files,
+                           state_artifact=state_artifact,
+                           output_config=output_config)
+
+    if state_artifact is not None:
+      state_lib.write_manifest(state_artifact, state_fingerprint, fingerprints)
 
     logging.info('StratifiedSampler generates stratified examples to %s', output_artifact.uri)
 
@@ -157,43 +347,292 @@ class Executor(base_beam_executor.BaseBeamExecutor):
                     example_uris: Mapping[Text, Text],
                     to_key_fn: Text,
                     output_artifact: Artifact,
-                    samples_per_key: int) -> None:
+                    samples_per_key: int,
+                    lazy_decoding: bool = False,
+                    sampling_engine: Text = sampling.RESERVOIR_ENGINE,
+                    sampling_seed: int = 0,
+                    hot_key_fanout: Optional[int] = None,
+                    per_key_metrics: bool = False,
+                    sample_sizes: Optional[sampling.SampleSizes] = None,
+                    histogram_artifact: Optional[Artifact] = None,
+                    input_files: Optional[Mapping[Text, List[Text]]] = None,
+                    state_artifact: Optional[Artifact] = None,
+                    output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
     """Runs stratified sampling on given example data.
     Args:
       example_uris: Mapping of example split name to example uri.
       to_key_fn: function to convert an example to a key
       output_artifact: Output artifact.
       samples_per_key: number of examples to keep per value of the key.
+      lazy_decoding: whether to pass a `LazyExample` to `to_key` instead of a `tf.train.Example`.
+      sampling_engine: 'reservoir', 'bottom_k' or 'bernoulli'.
+      sampling_seed: seed of the hash of the 'bottom_k' and 'bernoulli' engines.
+      hot_key_fanout: number of sub-keys the per-key combines are spread on first, if > 1 - detected from a
+        sample of the records of each split if None.
+      per_key_metrics: whether to count the records, bytes and time in `to_key()` of each key.
+      sample_sizes: number of samples of each key, if they are not all `samples_per_key`.
+      histogram_artifact: optional KeyHistogram artifact to write the per-key sizes of the input and the sample to.
+      input_files: the files to read for each split, instead of all the files of `example_uris`.
+      state_artifact: optional SamplerState artifact to write the sample of each split to.
+      output_config: how to write the stratified examples.
     Returns:
       None
     """
 
+    if sample_sizes is None:
+      sample_sizes = sampling.SampleSizes(samples_per_key)
+
     d = {}
     exec(to_key_fn, globals(), d)  # how ugly is that?
     to_key = d['to_key']
 
-    def to_keyed_value(m):
-      return to_key(m), m
+    decode = LazyExample if lazy_decoding else tf.train.Example.FromString
+
+    def record_to_key(record: bytes):
+      # the record is only parsed to compute the key, the original bytes are what gets sampled
+      return to_key(decode(record))
 
     with self._make_beam_pipeline() as pipeline:
       for split_name, example_uri in example_uris.items():
-        data_list = [(
-            pipeline | 'ReadData[{}]'.format(split_name) >> beam.io.ReadFromTFRecord(
-          file_pattern=io_utils.all_files_pattern(example_uri)))]
+        def read_data(label: Text, split_name: Text = split_name, example_uri: Text = example_uri) \
+            -> beam.PCollection:
+          if input_files is not None:
+            return (
+                pipeline
+                | 'InputFiles{}[{}]'.format(label, split_name) >> beam.Create(input_files[split_name])
+                | 'ReadData{}[{}]'.format(label, split_name) >> beam.io.ReadAllFromTFRecord())
+          return pipeline | 'ReadData{}[{}]'.format(label, split_name) >> beam.io.ReadFromTFRecord(
+            file_pattern=io_utils.all_files_pattern(example_uri))
+
+        data_list = [read_data('')]
+
+        split_fanout = hot_key_fanout
+        if split_fanout is None:
+          files = input_files[split_name] if input_files is not None else _split_files(example_uri)
+          split_fanout = _detect_hot_keys(split_name, _sample_keys(files, record_to_key))
 
         dest_path = os.path.join(artifact_utils.get_split_uri([output_artifact], split_name),
                                  _STRATIFIED_EXAMPLES_FILE_PREFIX)
 
-        _ = (
+        keyed_records = (
             [data for data in data_list]
             | 'FlattenExamples ({})'.format(split_name) >> beam.Flatten(pipeline=pipeline)
-            | 'ParseExamples ({})'.format(split_name) >> beam.Map(tf.train.Example.FromString)
-            | 'Key ({})'.format(split_name) >> beam.Map(to_keyed_value)
-            | 'Sample per key ({})'.format(split_name) >> beam.combiners.Sample.FixedSizePerKey(samples_per_key)
-            | 'Values ({})'.format(split_name) >> beam.Values()
-            | 'Flatten lists ({})'.format(split_name) >> beam.FlatMap(lambda elements: elements)
-            | 'WriteStratifiedSamples ({})'.format(split_name) >> beam.io.WriteToTFRecord(
+            | 'Key ({})'.format(split_name) >> beam.ParDo(
+          sampling.KeyRecords(record_to_key, per_key_metrics=per_key_metrics)))
+
+        keyed_records_again = None
+        if sampling_engine == sampling.BERNOULLI_ENGINE or (sampling_engine == sampling.BOTTOM_K_ENGINE and
+                                                            not sample_sizes.is_fixed):
+          # the second pass reads the records again rather than keeping them all until the sizes are known - so
+          # `to_key()` runs twice per record
+          keyed_records_again = (
+              read_data('Again')
+              | 'KeyAgain ({})'.format(split_name) >> beam.ParDo(
+            sampling.KeyRecords(record_to_key, with_metrics=False)))
+
+        keyed_samples, input_sizes = sampling.sample_keyed_records(keyed_records,
+                                                                   label=split_name,
+                                                                   sample_sizes=sample_sizes,
+                                                                   sampling_engine=sampling_engine,
+                                                                   sampling_seed=sampling_seed,
+                                                                   hot_key_fanout=split_fanout,
+                                                                   keyed_records_again=keyed_records_again,
+                                                                   with_input_sizes=histogram_artifact is not None)
+
+        samples = keyed_samples | 'Records ({})'.format(split_name) >> beam.Values()
+
+        if state_artifact is not None:
+          state_path = os.path.join(artifact_utils.get_split_uri([state_artifact], split_name),
+                                    state_lib.STATE_FILE_PREFIX)
+          _ = (
+              samples
+              | 'WriteSamplerState ({})'.format(split_name) >> beam.io.WriteToTFRecord(
+            state_path,
+            file_name_suffix='.gz'))
+
+        if histogram_artifact:
+          _write_key_histogram(keyed_samples, input_sizes, histogram_artifact, split_name)
+
+        _ = (
+            samples
+            | 'WriteStratifiedSamples ({})'.format(split_name) >> writer.WriteExamples(
+          dest_path,
+          output_config,
+          metadata_path=writer.shard_metadata_path(output_artifact, split_name)))
+        logging.info('Sampling result written to %s.', dest_path)
+
+  def _run_index_sampling(self,
+                          example_uris: Mapping[Text, Text],
+                          index_artifact: Artifact,
+                          output_artifact: Artifact,
+                          sample_sizes: sampling.SampleSizes,
+                          sampling_seed: int = 0,
+                          hot_key_fanout: Optional[int] = None,
+                          histogram_artifact: Optional[Artifact] = None,
+                          output_config: writer.OutputConfig = writer.OutputConfig()) -> None:
+    """Runs stratified sampling from the keys of an index, only the selected records are read.
+
+    The indexes of the files are read by the workers - only the manifest of the index is read here - and the
+    records of each key with the smallest priorities are kept by a bottom-k per key, see
+    `sampling.index_entry_priority()`. Only uncompressed files are read with positional reads, a warning is logged
+    for the compressed ones.
+    Args:
+      example_uris: Mapping of example split name to example uri.
+      index_artifact: ExamplesIndex artifact of the examples, with keys.
+      output_artifact: Output artifact.
+      sample_sizes: number of samples of each key.
+      sampling_seed: seed of the priorities of the records.
+      hot_key_fanout: number of sub-keys the per-key combines are spread on first, if > 1 - detected from the
+        keys of a few files of the index if None.
+      histogram_artifact: optional KeyHistogram artifact to write the per-key sizes of the input and the sample to.
+      output_config: how to write the stratified examples.
+    Returns:
+      None
+    """
+
+    with self._make_beam_pipeline() as pipeline:
+      for split_name, example_uri in example_uris.items():
+        index_dir = artifact_utils.get_split_uri([index_artifact], split_name)
+        # raises if a file changed since it was indexed
+        shards = utils.read_index_manifest(index_artifact, split_name)
+        if any(not shard['keys'] for shard in shards):
+          raise ValueError('The index of split {} has no keys, see the \'to_key_fn\' of Index.'.format(split_name))
+        other_files = [shard['path'] for shard in shards if os.path.dirname(shard['path']) != example_uri]
+        if other_files:
+          raise ValueError('The index of split {} is the index of other examples: {}'.format(split_name,
+                                                                                            other_files[:10]))
+        logging.info('Split %s: sampling from the index of %d files.', split_name, len(shards))
+        compressed = [shard['path'] for shard in shards
+                      if writer.file_compression(shard['path']) != writer.COMPRESSION_NONE]
+        if compressed:
+          logging.warning('Split %s: %d of the %d indexed files are compressed - each one is decompressed from its '
+                          'start up to its last selected record, the I/O is not proportional to the size of the '
+                          'sample. Write the examples with compression \'none\' to only read the selected records: %s',
+                          split_name, len(compressed), len(shards), compressed[:10])
+
+        split_fanout = hot_key_fanout
+        if split_fanout is None:
+          split_fanout = _detect_hot_keys(split_name, _sample_index_keys(index_dir, shards))
+
+        # (key, (path, offset, length))
+        keyed_entries = (
+            pipeline
+            | 'IndexShards[{}]'.format(split_name) >> beam.Create(shards)
+            | 'Reshuffle[{}]'.format(split_name) >> beam.Reshuffle()
+            | 'IndexEntries[{}]'.format(split_name) >> beam.FlatMap(_keyed_index_entries, index_dir=index_dir))
+
+        keyed_samples, input_sizes = sampling.sample_keyed_records(
+          keyed_entries,
+          label=split_name,
+          sample_sizes=sample_sizes,
+          sampling_engine=sampling.BOTTOM_K_ENGINE,
+          sampling_seed=sampling_seed,
+          hot_key_fanout=split_fanout,
+          with_input_sizes=histogram_artifact is not None,
+          priority=lambda entry: sampling.index_entry_priority(entry, sampling_seed),
+          length=sampling.index_entry_length)
+
+        # compressed files are decompressed from their start, so each one is read by a single task
+        samples = (
+            keyed_samples
+            | 'SelectedOffsets[{}]'.format(split_name) >> beam.MapTuple(lambda key, entry: (entry[0], entry[1]))
+            | 'GroupByFile[{}]'.format(split_name) >> beam.GroupByKey()
+            | 'Fetches[{}]'.format(split_name) >> beam.FlatMapTuple(_fetches)
+            | 'ReshuffleFetches[{}]'.format(split_name) >> beam.Reshuffle()
+            | 'ReadSelectedRecords[{}]'.format(split_name) >> beam.FlatMapTuple(utils.read_records_at))
+
+        if histogram_artifact:
+          # the sizes of the input are in the index
+          _write_key_histogram(keyed_samples, input_sizes, histogram_artifact, split_name,
+                               length=sampling.index_entry_length)
+
+        dest_path = os.path.join(artifact_utils.get_split_uri([output_artifact], split_name),
+                                 _STRATIFIED_EXAMPLES_FILE_PREFIX)
+        _ = (
+            samples
+            | 'WriteStratifiedSamples ({})'.format(split_name) >> writer.WriteExamples(
           dest_path,
-          file_name_suffix='.gz',
-          coder=beam.coders.ProtoCoder(tf.train.Example)))
+          output_config,
+          metadata_path=writer.shard_metadata_path(output_artifact, split_name)))
         logging.info('Sampling result written to %s.', dest_path)
+
+
+def _spread(items: List[Any], count: int) -> List[Any]:
+  """Up to `count` items, spread over `items`."""
+  return items[::max(1, len(items) // count)][:count]
+
+
+def _split_files(example_uri: Text) -> List[Text]:
+  return sorted(path for path in tf.io.gfile.glob(io_utils.all_files_pattern(example_uri))
+                if not tf.io.gfile.isdir(path))
+
+
+def _sample_keys(files: List[Text], record_to_key: Callable[[bytes], Any]) -> List[Any]:
+  """Keys of the first records of a few files of a split."""
+  files = _spread(sorted(files), _HOT_KEY_SAMPLE_FILES)
+  records_per_file = _HOT_KEY_SAMPLE_RECORDS // max(1, len(files))
+  keys = []
+  for path in files:
+    keys.extend(record_to_key(record)
+                for record in itertools.islice(utils.read_tfrecord_file(path), records_per_file))
+  return keys
+
+
+def _sample_index_keys(index_dir: Text, shards: List[Dict[Text, Any]]) -> List[Text]:
+  """Keys of the first records of a few files of an index - as given by `_keyed_index_entries()`."""
+  shards = _spread(shards, _HOT_KEY_SAMPLE_FILES)
+  records_per_file = _HOT_KEY_SAMPLE_RECORDS // max(1, len(shards))
+  keys = []
+  for shard in shards:
+    keys.extend(str(key) for key in utils.load_shard_index(index_dir, shard).keys[:records_per_file])
+  return keys
+
+
+def _detect_hot_keys(split_name: Text, keys: List[Any]) -> Dict[Any, int]:
+  """Fan-out of the hot keys of a split, from a sample of its keys."""
+  fanouts = sampling.hot_key_fanouts(keys)
+  if fanouts:
+    logging.info('Split %s: hot keys detected on %d records, fan-outs: %s', split_name, len(keys),
+                 {sampling.key_name(key): fanout for key, fanout in fanouts.items()})
+  return fanouts
+
+
+def _keyed_index_entries(shard: Dict[Text, Any], index_dir: Text) -> Iterable[Tuple[Text, sampling.IndexEntry]]:
+  """(key, (path, offset, length)) of the records of a file, from its index."""
+  shard_index = utils.load_shard_index(index_dir, shard)
+  for key, offset, length in zip(shard_index.keys, shard_index.offsets, shard_index.lengths):
+    yield str(key), (shard_index.path, int(offset), int(length))
+
+
+def _fetches(path: Text, offsets: Iterable[int]) -> Iterable[Tuple[Text, List[int]]]:
+  """Batches of offsets of a file to read, a single one for compressed files."""
+  offsets = sorted(offsets)
+  batch = _INDEX_FETCH_BATCH if writer.file_compression(path) == writer.COMPRESSION_NONE else len(offsets)
+  for start in range(0, len(offsets), batch):
+    yield path, offsets[start:start + batch]
+
+
+def _write_key_histogram(keyed_samples: beam.PCollection,
+                         input_sizes: beam.PCollection,
+                         histogram_artifact: Artifact,
+                         split_name: Text,
+                         length: Callable[[Any], int] = len) -> None:
+  """Writes the (records, bytes) of each key of the input and of the sample of a split."""
+  output_sizes = (
+      keyed_samples
+      | 'Sample size per key ({})'.format(split_name) >> beam.CombinePerKey(sampling.SizeCombineFn(length)))
+
+  histogram_path = os.path.join(artifact_utils.get_split_uri([histogram_artifact], split_name),
+                                _KEY_HISTOGRAM_FILE_PREFIX)
+  _ = (
+      {'input': input_sizes, 'output': output_sizes}
+      | 'Join sizes ({})'.format(split_name) >> beam.CoGroupByKey()
+      | 'Histogram rows ({})'.format(split_name) >> beam.MapTuple(
+    lambda key, sizes: sampling.key_histogram_record(key,
+                                                     sizes['input'][0],
+                                                     next(iter(sizes['output']), (0, 0))))
+      | 'WriteKeyHistogram ({})'.format(split_name) >> beam.io.WriteToTFRecord(
+    histogram_path,
+    file_name_suffix='.gz',
+    num_shards=1))
+  logging.info('Key histogram written to %s.', histogram_path)
@@ -20,10 +20,15 @@ from absl import logging
 from tfx.dsl.io import fileio
 from tfx.types import artifact_utils
 from tfx.types import standard_artifacts
+from tfx.utils import io_utils
 
+from tfx_x import KeyHistogram, SamplerState, ExamplesIndex
+from tfx_x.components.examples.index import executor as index_executor
 from tfx_x.components.examples.stratified_sampler import executor
 from tfx_x.components.examples.stratified_sampler.executor import STRATIFIED_EXAMPLES_KEY, EXAMPLES_KEY, \
-  SAMPLES_PER_KEY_KEY, TO_KEY_FN_KEY, SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY
+  SAMPLES_PER_KEY_KEY, TO_KEY_FN_KEY, SPLITS_TO_TRANSFORM_KEY, SPLITS_TO_COPY_KEY, LAZY_DECODING_KEY, \
+  SAMPLING_ENGINE_KEY, SAMPLING_SEED_KEY, HOT_KEY_FANOUT_KEY, SAMPLES_PER_KEY_MAP_KEY, ALLOCATION_KEY, \
+  KEY_HISTOGRAM_KEY, SAMPLER_STATE_KEY, PREVIOUS_SAMPLER_STATE_KEY, EXAMPLES_INDEX_KEY
 
 
 class ExecutorTest(tf.test.TestCase):
@@ -88,6 +93,15 @@ def to_key(m):
         results.append(stratified_examples)
     return results
 
+  def _get_records(self, filepattern):
+    records = []
+    for f in fileio.glob(filepattern):
+      records.extend(tf.compat.v1.python_io.tf_record_iterator(
+        path=f,
+        options=tf.compat.v1.python_io.TFRecordOptions(
+          tf.compat.v1.python_io.TFRecordCompressionType.GZIP)))
+    return records
+
   def _verify_stratified_example_split(self, split_name):
     dir_path = os.path.join(self._stratified_examples_dir, 'Split-' + split_name)
     logging.info("Looking for examples split in %s", dir_path)
@@ -176,6 +190,311 @@ def to_key(m):
     self._verify_copied_example_split('unlabelled')
     self._verify_stratified_example_split('eval')
 
+  def testDoWithLazyDecoding(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[LAZY_DECODING_KEY] = 1
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    self._verify_stratified_example_split('eval')
+
+  def testDoWithBottomKIsReproducible(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bottom_k'
+    self._exec_properties[SAMPLING_SEED_KEY] = 3
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+
+    results = []
+    for run in ['first', 'second']:
+      self._sampling_result.uri = os.path.join(self._output_data_dir, run)
+
+      # Run executor.
+      stratified_sampler = executor.Executor(self._context)
+      stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                            self._exec_properties)
+
+      results.append(self._get_records(os.path.join(self._output_data_dir, run, 'Split-eval', '*')))
+
+    # Check outputs.
+    self.assertTrue(results[0])
+    self.assertLessEqual(len(results[0]), 2 * 10)
+    self.assertCountEqual(results[0], results[1])
+
+  def _run_with_hot_key_fanouts(self, sampling_engine):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = sampling_engine
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+
+    results = []
+    # no fan-out, a fan-out for all the keys and the fan-out of the detected hot keys
+    for run, hot_key_fanout in [('direct', 0), ('fanout', 4), ('detected', None)]:
+      self._sampling_result.uri = os.path.join(self._output_data_dir, run)
+      self._exec_properties[HOT_KEY_FANOUT_KEY] = hot_key_fanout
+
+      # Run executor.
+      stratified_sampler = executor.Executor(self._context)
+      stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                            self._exec_properties)
+
+      results.append(self._get_records(os.path.join(self._output_data_dir, run, 'Split-eval', '*')))
+    return results
+
+  def testDoWithHotKeyFanoutGivesSameBottomK(self):
+    results = self._run_with_hot_key_fanouts('bottom_k')
+
+    self.assertTrue(results[0])
+    self.assertCountEqual(results[0], results[1])
+    self.assertCountEqual(results[0], results[2])
+
+  def testDoWithHotKeyFanoutGivesSameBernoulli(self):
+    results = self._run_with_hot_key_fanouts('bernoulli')
+
+    self.assertTrue(results[0])
+    self.assertCountEqual(results[0], results[1])
+    self.assertCountEqual(results[0], results[2])
+
+  def testDoWithBernoulli(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bernoulli'
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    self._verify_stratified_example_split('eval')
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    results = self._get_records(os.path.join(self._stratified_examples_dir, 'Split-eval', '*'))
+    self.assertLess(len(results), len(inputs))
+    for result in results:
+      self.assertIn(result, inputs)
+
+  def testDoWithBernoulliKeepsSmallStrata(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bernoulli'
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 1000000
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    self.assertCountEqual(self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*')),
+                          self._get_records(os.path.join(self._stratified_examples_dir, 'Split-eval', '*')))
+
+  def _is_long_trip(self, record):
+    return tf.train.Example.FromString(record).features.feature['trip_miles'].float_list.value[0] > 42.
+
+  def testDoWithSamplesPerKeyMap(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bottom_k'
+    self._exec_properties[SAMPLES_PER_KEY_MAP_KEY] = json.dumps({'True': 1000000, 'False': 5})
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    results = self._get_records(os.path.join(self._stratified_examples_dir, 'Split-eval', '*'))
+    self.assertCountEqual([r for r in inputs if self._is_long_trip(r)],
+                          [r for r in results if self._is_long_trip(r)])
+    self.assertLen([r for r in results if not self._is_long_trip(r)], 5)
+
+  def testDoWithProportionalAllocation(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bottom_k'
+    self._exec_properties[ALLOCATION_KEY] = json.dumps({'policy': 'proportional', 'total': 20, 'floor': 3})
+    del self._exec_properties[SAMPLES_PER_KEY_KEY]
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    results = self._get_records(os.path.join(self._stratified_examples_dir, 'Split-eval', '*'))
+    for is_long_trip in [True, False]:
+      count = len([r for r in inputs if self._is_long_trip(r) == is_long_trip])
+      expected = min(count, max(3, int(round(20 * count / len(inputs)))))
+      self.assertLen([r for r in results if self._is_long_trip(r) == is_long_trip], expected)
+
+  def testDoWithKeyHistogram(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+    key_histogram = KeyHistogram()
+    key_histogram.uri = os.path.join(self._output_data_dir, 'key_histogram')
+    self._output_dict_sr[KEY_HISTOGRAM_KEY] = [key_histogram]
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    self.assertEqual(['eval'], artifact_utils.decode_split_names(key_histogram.split_names))
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    results = self._get_records(os.path.join(self._stratified_examples_dir, 'Split-eval', '*'))
+    rows = [tf.train.Example.FromString(r)
+            for r in self._get_records(os.path.join(key_histogram.uri, 'Split-eval', '*'))]
+
+    histogram = {row.features.feature['key'].bytes_list.value[0]: row.features.feature for row in rows}
+    self.assertCountEqual([b'True', b'False'], histogram.keys())
+    for key, feature in histogram.items():
+      is_long_trip = key == b'True'
+      key_inputs = [r for r in inputs if self._is_long_trip(r) == is_long_trip]
+      key_results = [r for r in results if self._is_long_trip(r) == is_long_trip]
+      self.assertEqual(len(key_inputs), feature['input_count'].int64_list.value[0])
+      self.assertEqual(sum(len(r) for r in key_inputs), feature['input_bytes'].int64_list.value[0])
+      self.assertEqual(len(key_results), feature['output_count'].int64_list.value[0])
+      self.assertEqual(sum(len(r) for r in key_results), feature['output_bytes'].int64_list.value[0])
+
+  def _run_with_state(self, run, examples, previous_state=None):
+    self._sampling_result.uri = os.path.join(self._output_data_dir, run)
+    sampler_state = SamplerState()
+    sampler_state.uri = os.path.join(self._output_data_dir, run + '_state')
+    input_dict = {EXAMPLES_KEY: [examples]}
+    if previous_state:
+      input_dict[PREVIOUS_SAMPLER_STATE_KEY] = [previous_state]
+    output_dict = {STRATIFIED_EXAMPLES_KEY: [self._sampling_result], SAMPLER_STATE_KEY: [sampler_state]}
+
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(input_dict, output_dict, self._exec_properties)
+
+    return sampler_state, self._get_records(os.path.join(self._sampling_result.uri, 'Split-eval', '*'))
+
+  def _partial_examples(self, filenames):
+    examples = standard_artifacts.Examples()
+    examples.uri = os.path.join(self._output_data_dir, 'examples')
+    examples.split_names = artifact_utils.encode_split_names(['eval'])
+    for filename in filenames:
+      io_utils.copy_file(os.path.join(self._examples.uri, 'Split-eval', filename),
+                         os.path.join(examples.uri, 'Split-eval', filename), overwrite=True)
+    return examples
+
+  def testDoWithPreviousSamplerState(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bottom_k'
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+    filenames = sorted(fileio.listdir(os.path.join(self._examples.uri, 'Split-eval')))
+
+    examples = self._partial_examples(filenames[:6])
+    first_state, _ = self._run_with_state('first', examples)
+    self.assertEqual(['eval'], artifact_utils.decode_split_names(first_state.split_names))
+
+    # new files land in the split, only them and the state are read
+    examples = self._partial_examples(filenames[6:])
+    _, incremental = self._run_with_state('incremental', examples, previous_state=first_state)
+    _, full = self._run_with_state('full', examples)
+
+    self.assertTrue(full)
+    self.assertCountEqual(full, incremental)
+
+  def testDoWithPreviousSamplerStateOfAnotherConfiguration(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'bottom_k'
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+
+    first_state, _ = self._run_with_state('first', self._examples)
+
+    # with another seed the previous state is ignored and everything is sampled again
+    self._exec_properties[SAMPLING_SEED_KEY] = 7
+    _, incremental = self._run_with_state('incremental', self._examples, previous_state=first_state)
+    _, full = self._run_with_state('full', self._examples)
+
+    self.assertTrue(full)
+    self.assertCountEqual(full, incremental)
+
+  def testDoWithSamplerStateAndDefaultEngine(self):
+    # the default engine is 'reservoir', which has no state
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+
+    with self.assertRaises(ValueError):
+      self._run_with_state('first', self._examples)
+
+  def _index(self, with_keys=True):
+    examples_index = ExamplesIndex()
+    examples_index.uri = os.path.join(self._output_data_dir, 'index')
+    exec_properties = {index_executor.SPLITS_TO_TRANSFORM_KEY: json.dumps(['eval'])}
+    if with_keys:
+      exec_properties[index_executor.TO_KEY_FN_KEY] = self._exec_properties[TO_KEY_FN_KEY]
+    index_executor.Executor(self._context).Do({index_executor.EXAMPLES_KEY: [self._examples]},
+                                              {index_executor.EXAMPLES_INDEX_KEY: [examples_index]},
+                                              exec_properties)
+    return examples_index
+
+  def testDoWithIndex(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'index'
+    self._exec_properties[SAMPLES_PER_KEY_MAP_KEY] = json.dumps({'True': 5})
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+    key_histogram = KeyHistogram()
+    key_histogram.uri = os.path.join(self._output_data_dir, 'key_histogram')
+    self._output_dict_sr[KEY_HISTOGRAM_KEY] = [key_histogram]
+    self._input_dict[EXAMPLES_INDEX_KEY] = [self._index()]
+
+    # Run executor.
+    stratified_sampler = executor.Executor(self._context)
+    stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                          self._exec_properties)
+
+    # Check outputs.
+    inputs = self._get_records(os.path.join(self._examples.uri, 'Split-eval', '*'))
+    results = self._get_records(os.path.join(self._stratified_examples_dir, 'Split-eval', '*'))
+    self.assertEqual(5, len([r for r in results if self._is_long_trip(r)]))
+    self.assertEqual(10, len([r for r in results if not self._is_long_trip(r)]))
+    self.assertTrue(set(results).issubset(set(inputs)))
+
+    rows = [tf.train.Example.FromString(r)
+            for r in self._get_records(os.path.join(key_histogram.uri, 'Split-eval', '*'))]
+    histogram = {row.features.feature['key'].bytes_list.value[0]: row.features.feature for row in rows}
+    key_inputs = [r for r in inputs if self._is_long_trip(r)]
+    self.assertEqual(len(key_inputs), histogram[b'True']['input_count'].int64_list.value[0])
+    self.assertEqual(sum(len(r) for r in key_inputs), histogram[b'True']['input_bytes'].int64_list.value[0])
+    self.assertEqual(5, histogram[b'True']['output_count'].int64_list.value[0])
+
+  def testDoWithIndexWithoutKeys(self):
+    self._exec_properties[SPLITS_TO_TRANSFORM_KEY] = json.dumps(['eval'])
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'index'
+    self._exec_properties[SAMPLES_PER_KEY_KEY] = 10
+    self._input_dict[EXAMPLES_INDEX_KEY] = [self._index(with_keys=False)]
+
+    stratified_sampler = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      stratified_sampler.Do(self._input_dict, self._output_dict_sr, self._exec_properties)
+
+  def testDoWithoutIndex(self):
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'index'
+
+    stratified_sampler = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      stratified_sampler.Do(self._input_dict, self._output_dict_sr, self._exec_properties)
+
+  def testDoWithSamplesPerKeyMapAndReservoir(self):
+    self._exec_properties[SAMPLES_PER_KEY_MAP_KEY] = json.dumps({'True': 10})
+
+    stratified_sampler = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                            self._exec_properties)
+
+  def testDoWithUnknownEngine(self):
+    self._exec_properties[SAMPLING_ENGINE_KEY] = 'unknown'
+
+    stratified_sampler = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      stratified_sampler.Do(self._input_dict, self._output_dict_sr,
+                            self._exec_properties)
+
 
 if __name__ == '__main__':
   tf.test.main()
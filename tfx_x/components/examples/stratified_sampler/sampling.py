@@ -0,0 +1,482 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Sampling engines of the StratifiedSampler."""
+
+import collections
+import hashlib
+import heapq
+import os
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Text, Tuple, Union
+
+import apache_beam as beam
+import tensorflow as tf
+
+RESERVOIR_ENGINE = 'reservoir'
+BOTTOM_K_ENGINE = 'bottom_k'
+BERNOULLI_ENGINE = 'bernoulli'
+INDEX_ENGINE = 'index'
+# the engines which sample a stream of keyed records, see `sample_keyed_records()`
+STREAMING_ENGINES = (RESERVOIR_ENGINE, BOTTOM_K_ENGINE, BERNOULLI_ENGINE)
+ENGINES = STREAMING_ENGINES + (INDEX_ENGINE,)
+
+PROPORTIONAL_ALLOCATION = 'proportional'
+
+_METRICS_NAMESPACE = 'StratifiedSampler'
+
+# fan-out of a key with all the records, see `hot_key_fanouts()`
+MAX_HOT_KEY_FANOUT = 16
+
+# tags of the join of the 'bernoulli' engine
+_RATE_TAG = 'rate'
+_RECORDS_TAG = 'records'
+
+_PRIORITY_BYTES = 8
+_PRIORITY_RANGE = float(1 << (8 * _PRIORITY_BYTES))
+
+# (priority, serialized record)
+PrioritizedRecord = Tuple[int, bytes]
+
+# (number of records, number of bytes)
+Size = Tuple[int, int]
+
+# (path, offset, length) of a record in an index
+IndexEntry = Tuple[Text, int, int]
+
+
+def record_priority(record: bytes, seed: int) -> int:
+  """Deterministic pseudo-random priority of a record.
+  Args:
+    record: the serialized record.
+    seed: the seed of the hash, a different seed gives independent priorities.
+  Returns:
+    an integer in [0, 2**64).
+  """
+  digest = hashlib.blake2b(record, digest_size=_PRIORITY_BYTES, key=str(seed).encode('utf-8')).digest()
+  return int.from_bytes(digest, 'big')
+
+
+def inclusion_rate(samples: int, count: int) -> float:
+  """Probability to keep each of `count` records to get `samples` records on average."""
+  if count <= samples:
+    return 1.
+  return samples / count
+
+
+def keep_record(record: bytes, rate: float, seed: int) -> bool:
+  """Bernoulli trial of probability `rate`, deterministic for a given record and seed."""
+  return record_priority(record, seed) < rate * _PRIORITY_RANGE
+
+
+def hot_key_fanouts(keys: Iterable[Any], max_fanout: int = MAX_HOT_KEY_FANOUT) -> Dict[Any, int]:
+  """Fan-out of the hot keys of a sample of keys, in proportion of their share of the sample.
+
+  A key with all the records gets `max_fanout`, one with half of them half of it, ... The keys with less than
+  2 / `max_fanout` of the records get none.
+  """
+  counts = collections.Counter(keys)
+  total = sum(counts.values())
+  fanouts = {}
+  for key, count in counts.items():
+    fanout = max_fanout * count // total
+    if fanout > 1:
+      fanouts[key] = fanout
+  return fanouts
+
+
+def key_name(key: Any) -> Text:
+  """Name of a key in a `samples_per_key_map`: the utf-8 string of bytes keys, `str(key)` otherwise."""
+  if isinstance(key, bytes):
+    return key.decode('utf-8', errors='replace')
+  return str(key)
+
+
+class SampleSizes(object):
+  """Number of records to sample for each key.
+
+  In order of precedence, the size of a key is:
+    1. its entry in `samples_per_key_map`,
+    2. from the `allocation` policy,
+    3. `samples_per_key`.
+  The only policy is {'policy': 'proportional', 'total': N, 'floor': f, 'cap': c}: each key gets its share of
+  N in proportion of its count of records, bounded by f and c (both optional).
+  """
+
+  def __init__(self,
+               samples_per_key: Optional[int] = None,
+               samples_per_key_map: Optional[Mapping[Text, int]] = None,
+               allocation: Optional[Dict[Text, Any]] = None):
+    if samples_per_key is None and allocation is None:
+      raise ValueError('\'samples_per_key\' or an \'allocation\' is required.')
+
+    if allocation is not None:
+      if allocation.get('policy') != PROPORTIONAL_ALLOCATION:
+        raise ValueError('Unsupported allocation policy: {!r} - must be {!r}'.format(allocation.get('policy'),
+                                                                                   PROPORTIONAL_ALLOCATION))
+      total = allocation.get('total')
+      if not isinstance(total, int) or isinstance(total, bool) or total < 0:
+        raise ValueError('\'total\' of the allocation must be a non-negative int: {!r}'.format(allocation))
+      floor = allocation.get('floor')
+      cap = allocation.get('cap')
+      if floor is not None and cap is not None and floor > cap:
+        raise ValueError('\'floor\' of the allocation is larger than its \'cap\': {!r}'.format(allocation))
+
+    self._samples_per_key = samples_per_key
+    self._samples_per_key_map = dict(samples_per_key_map or {})
+    self._allocation = allocation
+
+  @property
+  def samples_per_key(self) -> Optional[int]:
+    return self._samples_per_key
+
+  @property
+  def is_fixed(self) -> bool:
+    """Whether all the keys get `samples_per_key` records."""
+    return not self._samples_per_key_map and self._allocation is None
+
+  @property
+  def depends_on_counts(self) -> bool:
+    """Whether the size of a key depends on the counts of records."""
+    return self._allocation is not None
+
+  def size(self, key: Any, count: int, total_count: int) -> int:
+    """Sample size of a key.
+    Args:
+      key: the key.
+      count: number of records of this key.
+      total_count: number of records of all the keys.
+    Returns:
+      the number of records to keep for this key.
+    """
+    name = key_name(key)
+    if name in self._samples_per_key_map:
+      return self._samples_per_key_map[name]
+
+    if self._allocation is None:
+      return self._samples_per_key
+
+    size = int(round(self._allocation['total'] * count / total_count)) if total_count else 0
+    if self._allocation.get('floor') is not None:
+      size = max(size, self._allocation['floor'])
+    if self._allocation.get('cap') is not None:
+      size = min(size, self._allocation['cap'])
+    return size
+
+
+def index_entry_priority(entry: IndexEntry, seed: int) -> int:
+  """Priority of a record of an index - the 'index' engine - from the name of its file and its offset."""
+  path, offset, _ = entry
+  return record_priority('{}:{}'.format(os.path.basename(path), offset).encode('utf-8'), seed)
+
+
+def index_entry_length(entry: IndexEntry) -> int:
+  """Length of the record of an entry of an index."""
+  return entry[2]
+
+
+class SizeCombineFn(beam.CombineFn):
+  """Counts records and their bytes - given by `length`."""
+
+  def __init__(self, length: Callable[[Any], int] = len):
+    super(SizeCombineFn, self).__init__()
+    self._length = length
+
+  def create_accumulator(self) -> Size:
+    return 0, 0
+
+  def add_input(self, size: Size, record: bytes) -> Size:
+    return size[0] + 1, size[1] + self._length(record)
+
+  def merge_accumulators(self, sizes: List[Size]) -> Size:
+    count, size = 0, 0
+    for c, s in sizes:
+      count += c
+      size += s
+    return count, size
+
+  def extract_output(self, size: Size) -> Size:
+    return size
+
+
+def key_histogram_record(key: Any, input_size: Size, output_size: Size) -> bytes:
+  """Serialized tf.train.Example of a key histogram row.
+  Args:
+    key: the key.
+    input_size: (records, bytes) of the key in the input.
+    output_size: (records, bytes) of the key in the sample.
+  Returns:
+    a serialized tf.train.Example with the 'key', 'input_count', 'output_count', 'input_bytes' and 'output_bytes'
+    features.
+  """
+
+  def int_feature(value: int) -> tf.train.Feature:
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
+
+  return tf.train.Example(features=tf.train.Features(feature={
+    'key': tf.train.Feature(bytes_list=tf.train.BytesList(value=[key_name(key).encode('utf-8')])),
+    'input_count': int_feature(input_size[0]),
+    'input_bytes': int_feature(input_size[1]),
+    'output_count': int_feature(output_size[0]),
+    'output_bytes': int_feature(output_size[1]),
+  })).SerializeToString()
+
+
+class KeyRecords(beam.DoFn):
+  """Keys serialized records, optionally counting records, bytes and time spent in `to_key`.
+
+  The counters are 'records', 'bytes' and 'to_key_usec' and, with `per_key_metrics`, 'records[<key>]',
+  'bytes[<key>]' and 'to_key_usec[<key>]' for each key - as many counters as keys, only for a few keys.
+  """
+
+  def __init__(self, to_key: Callable[[bytes], Any], with_metrics: bool = True, per_key_metrics: bool = False):
+    super(KeyRecords, self).__init__()
+    self._to_key = to_key
+    self._with_metrics = with_metrics
+    self._per_key_metrics = per_key_metrics
+    self._counters = {}
+
+  def setup(self):
+    self._counters = {}
+    self._total_counters = (
+      beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'records'),
+      beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'bytes'),
+      beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'to_key_usec'))
+
+  def _key_counters(self, key):
+    counters = self._counters.get(key)
+    if counters is None:
+      counters = self._counters[key] = (
+        beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'records[{}]'.format(key)),
+        beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'bytes[{}]'.format(key)),
+        beam.metrics.Metrics.counter(_METRICS_NAMESPACE, 'to_key_usec[{}]'.format(key)))
+    return counters
+
+  def process(self, record: bytes):
+    if not self._with_metrics:
+      yield self._to_key(record), record
+      return
+
+    start = time.perf_counter()
+    key = self._to_key(record)
+    elapsed_usec = int((time.perf_counter() - start) * 1e6)
+
+    counters = [self._total_counters]
+    if self._per_key_metrics:
+      counters.append(self._key_counters(key))
+    for records, size, to_key_usec in counters:
+      records.inc()
+      size.inc(len(record))
+      to_key_usec.inc(elapsed_usec)
+    yield key, record
+
+
+def bernoulli_trials(sub_key: Tuple[Any, int], joined: Mapping[Text, Iterable[Any]], seed: int) \
+    -> Iterator[Tuple[Any, bytes]]:
+  """(key, record) of the records of a sub-key of the 'bernoulli' engine which pass their trial.
+  Args:
+    sub_key: (key, shard) - the records of a key are spread on several shards.
+    joined: the rate of the key and the records of the sub-key, from a `CoGroupByKey`.
+    seed: the seed of the trials.
+  """
+  key, _ = sub_key
+  rate = next(iter(joined[_RATE_TAG]))
+  for record in joined[_RECORDS_TAG]:
+    if keep_record(record, rate, seed):
+      yield key, record
+
+
+def _push(heap: List[Tuple[int, bytes]], k: int, priority: int, record: bytes) -> None:
+  if len(heap) < k:
+    heapq.heappush(heap, (-priority, record))
+  elif heap and (-priority, record) > heap[0]:
+    heapq.heapreplace(heap, (-priority, record))
+
+
+class BottomKCombineFn(beam.CombineFn):
+  """Keeps the k records with the smallest priorities.
+
+  The accumulator is a max-heap (on priority) of at most k (-priority, record), its content only depends on
+  the set of inputs - not on their order or on how they are merged - so the sample is reproducible.
+  """
+
+  def __init__(self, k: int):
+    super(BottomKCombineFn, self).__init__()
+    self._k = k
+
+  def create_accumulator(self) -> List[Tuple[int, bytes]]:
+    return []
+
+  def add_input(self, heap: List[Tuple[int, bytes]], element: PrioritizedRecord) -> List[Tuple[int, bytes]]:
+    priority, record = element
+    _push(heap, self._k, priority, record)
+    return heap
+
+  def merge_accumulators(self, heaps: List[List[Tuple[int, bytes]]]) -> List[Tuple[int, bytes]]:
+    heaps = iter(heaps)
+    merged = next(heaps)
+    for heap in heaps:
+      for negated_priority, record in heap:
+        self.add_input(merged, (-negated_priority, record))
+    return merged
+
+  def extract_output(self, heap: List[Tuple[int, bytes]]) -> List[bytes]:
+    return [record for _, record in sorted(heap, reverse=True)]
+
+
+class SizedBottomKCombineFn(beam.CombineFn):
+  """`BottomKCombineFn` where k comes with each input, as (k, priority, record).
+
+  All the inputs of a key are expected to have the same k. The accumulator is [k, heap].
+  """
+
+  def create_accumulator(self) -> List[Any]:
+    return [0, []]
+
+  def add_input(self, accumulator: List[Any], element: Tuple[int, int, bytes]) -> List[Any]:
+    k, priority, record = element
+    accumulator[0] = k
+    _push(accumulator[1], k, priority, record)
+    return accumulator
+
+  def merge_accumulators(self, accumulators: List[List[Any]]) -> List[Any]:
+    accumulators = list(accumulators)
+    k = max(accumulator[0] for accumulator in accumulators)
+    merged = [k, []]
+    for _, heap in accumulators:
+      for negated_priority, record in heap:
+        _push(merged[1], k, -negated_priority, record)
+    return merged
+
+  def extract_output(self, accumulator: List[Any]) -> List[bytes]:
+    return [record for _, record in sorted(accumulator[1], reverse=True)]
+
+
+def sample_keyed_records(keyed_records: beam.PCollection,
+                         label: Text,
+                         sample_sizes: SampleSizes,
+                         sampling_engine: Text = RESERVOIR_ENGINE,
+                         sampling_seed: int = 0,
+                         hot_key_fanout: Optional[Union[int, Mapping[Any, int]]] = None,
+                         keyed_records_again: Optional[beam.PCollection] = None,
+                         with_input_sizes: bool = False,
+                         priority: Optional[Callable[[Any], int]] = None,
+                         length: Callable[[Any], int] = len) -> Tuple[beam.PCollection, Optional[beam.PCollection]]:
+  """Samples (key, record) with one of the engines.
+  Args:
+    keyed_records: the (key, serialized record) to sample.
+    label: suffix of the labels of the transforms, e.g. the name of the split.
+    sample_sizes: the number of samples of each key.
+    sampling_engine: 'reservoir', 'bottom_k' or 'bernoulli'.
+    sampling_seed: seed of the hash of the 'bottom_k' and 'bernoulli' engines.
+    hot_key_fanout: number of sub-keys the per-key combines - and the join of the 'bernoulli' engine - are spread
+      on, if > 1 - or the number of each key, e.g. from `hot_key_fanouts()`.
+    keyed_records_again: the same records for the second pass of the 'bernoulli' engine and of the 'bottom_k' one
+      when the sample sizes are not fixed - e.g. read again from the files. `keyed_records` is used otherwise, which
+      keeps - or spills - all the records until the sample sizes are known.
+    with_input_sizes: whether to also return the (key, (records, bytes)) of `keyed_records`.
+    priority: priority of a record for the 'bottom_k' engine - `record_priority()` with `sampling_seed` by default.
+    length: number of bytes of a record.
+  Returns:
+    the sampled (key, serialized record) and the (key, (records, bytes)) of the input, if computed.
+  """
+
+  if isinstance(hot_key_fanout, Mapping):
+    key_fanouts = dict(hot_key_fanout)
+
+    def fanout(key: Any) -> int:
+      return key_fanouts.get(key, 1)
+
+    with_fanout = bool(key_fanouts)
+  else:
+    constant_fanout = hot_key_fanout if hot_key_fanout is not None and hot_key_fanout > 1 else 1
+
+    def fanout(key: Any) -> int:
+      return constant_fanout
+
+    with_fanout = constant_fanout > 1
+
+  def per_key(combine_fn: beam.CombineFn) -> beam.CombinePerKey:
+    combine = beam.CombinePerKey(combine_fn)
+    if with_fanout:
+      combine = combine.with_hot_key_fanout(fanout)
+    return combine
+
+  if priority is None:
+    def priority(record: bytes) -> int:
+      return record_priority(record, sampling_seed)
+
+  input_sizes = None
+  if sampling_engine == BERNOULLI_ENGINE or not sample_sizes.is_fixed or with_input_sizes:
+    # (key, (records, bytes)) of the input, no payload is kept
+    input_sizes = (
+        keyed_records
+        | 'Size per key ({})'.format(label) >> per_key(SizeCombineFn(length)))
+    total_count = (
+        input_sizes
+        | 'Counts ({})'.format(label) >> beam.MapTuple(lambda key, size: size[0])
+        | 'Total count ({})'.format(label) >> beam.CombineGlobally(sum))
+    # (key, (count, sample size))
+    key_sizes = (
+        input_sizes
+        | 'Sample sizes ({})'.format(label) >> beam.MapTuple(
+      lambda key, size, total: (key, (size[0], sample_sizes.size(key, size[0], total))),
+      total=beam.pvalue.AsSingleton(total_count)))
+
+  if sampling_engine == BERNOULLI_ENGINE:
+    # ((key, shard), rate) for each of the sub-keys of each key
+    rates = (
+        key_sizes
+        | 'Inclusion rates ({})'.format(label) >> beam.FlatMapTuple(
+      lambda key, count_size: [((key, shard), inclusion_rate(count_size[1], count_size[0]))
+                               for shard in range(fanout(key))]))
+    sharded_records = (
+        (keyed_records if keyed_records_again is None else keyed_records_again)
+        | 'Shard records ({})'.format(label) >> beam.Map(
+      lambda kv: ((kv[0], zlib.crc32(kv[1]) % fanout(kv[0])), kv[1])))
+
+    # second pass: the records are joined with the rate of their key - no worker holds the rates of all the keys
+    keyed_samples = (
+        {_RATE_TAG: rates, _RECORDS_TAG: sharded_records}
+        | 'Join rates ({})'.format(label) >> beam.CoGroupByKey()
+        | 'Bernoulli sampling ({})'.format(label) >> beam.FlatMapTuple(bernoulli_trials, seed=sampling_seed))
+    return keyed_samples, input_sizes
+
+  if sampling_engine == BOTTOM_K_ENGINE and not sample_sizes.is_fixed:
+    # second pass, once the sizes are known
+    samples_per_key_lists = (
+        (keyed_records if keyed_records_again is None else keyed_records_again)
+        | 'Prioritize ({})'.format(label) >> beam.Map(
+      lambda kv, sizes: (kv[0], (sizes[kv[0]][1], priority(kv[1]), kv[1])),
+      sizes=beam.pvalue.AsDict(key_sizes))
+        | 'Sample per key ({})'.format(label) >> per_key(SizedBottomKCombineFn()))
+  elif sampling_engine == BOTTOM_K_ENGINE:
+    samples_per_key_lists = (
+        keyed_records
+        | 'Prioritize ({})'.format(label) >> beam.Map(
+      lambda kv: (kv[0], (priority(kv[1]), kv[1])))
+        | 'Sample per key ({})'.format(label) >> per_key(BottomKCombineFn(sample_sizes.samples_per_key)))
+  else:
+    samples_per_key_lists = (
+        keyed_records
+        | 'Sample per key ({})'.format(label) >> per_key(
+      beam.combiners.SampleCombineFn(sample_sizes.samples_per_key)))
+
+  keyed_samples = (
+      samples_per_key_lists
+      | 'Flatten lists ({})'.format(label) >> beam.FlatMapTuple(
+    lambda key, records: [(key, record) for record in records]))
+  return keyed_samples, input_sizes
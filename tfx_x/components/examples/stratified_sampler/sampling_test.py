@@ -0,0 +1,176 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import random
+
+import tensorflow as tf
+
+from tfx_x.components.examples.stratified_sampler import sampling
+
+
+class SamplingTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(SamplingTest, self).setUp()
+    self._records = [('record-%d' % i).encode('utf-8') for i in range(100)]
+
+  def testRecordPriority(self):
+    self.assertEqual(sampling.record_priority(b'abc', 0), sampling.record_priority(b'abc', 0))
+    self.assertNotEqual(sampling.record_priority(b'abc', 0), sampling.record_priority(b'abc', 1))
+    self.assertNotEqual(sampling.record_priority(b'abc', 0), sampling.record_priority(b'abd', 0))
+
+  def _sample(self, combine_fn, records, seed, chunks):
+    accumulators = []
+    for chunk in range(chunks):
+      accumulator = combine_fn.create_accumulator()
+      for record in records[chunk::chunks]:
+        accumulator = combine_fn.add_input(accumulator, (sampling.record_priority(record, seed), record))
+      accumulators.append(accumulator)
+    return combine_fn.extract_output(combine_fn.merge_accumulators(accumulators))
+
+  def testBottomKIsDeterministic(self):
+    combine_fn = sampling.BottomKCombineFn(10)
+    expected = sorted(self._records, key=lambda r: sampling.record_priority(r, 7))[:10]
+
+    shuffled = list(self._records)
+    random.Random(42).shuffle(shuffled)
+
+    self.assertEqual(expected, self._sample(combine_fn, self._records, 7, 1))
+    self.assertEqual(expected, self._sample(combine_fn, shuffled, 7, 3))
+    self.assertNotEqual(expected, self._sample(combine_fn, self._records, 8, 1))
+
+  def testBottomKWithFewerRecords(self):
+    combine_fn = sampling.BottomKCombineFn(1000)
+    self.assertCountEqual(self._records, self._sample(combine_fn, self._records, 0, 4))
+
+  def testSizedBottomKMatchesBottomK(self):
+    expected = self._sample(sampling.BottomKCombineFn(10), self._records, 7, 1)
+    combine_fn = sampling.SizedBottomKCombineFn()
+
+    accumulators = []
+    for chunk in range(3):
+      accumulator = combine_fn.create_accumulator()
+      for record in self._records[chunk::3]:
+        accumulator = combine_fn.add_input(accumulator, (10, sampling.record_priority(record, 7), record))
+      accumulators.append(accumulator)
+    # an empty accumulator does not know k
+    accumulators.append(combine_fn.create_accumulator())
+
+    self.assertEqual(expected, combine_fn.extract_output(combine_fn.merge_accumulators(accumulators)))
+
+  def testSampleSizes(self):
+    sizes = sampling.SampleSizes(samples_per_key=10, samples_per_key_map={'rare': 1000, '1': 3})
+    self.assertFalse(sizes.is_fixed)
+    self.assertEqual(1000, sizes.size(b'rare', 5, 100))
+    self.assertEqual(3, sizes.size(1, 50, 100))
+    self.assertEqual(10, sizes.size('other', 50, 100))
+    self.assertTrue(sampling.SampleSizes(samples_per_key=10).is_fixed)
+
+  def testProportionalAllocation(self):
+    sizes = sampling.SampleSizes(allocation={'policy': 'proportional', 'total': 100, 'floor': 5, 'cap': 60})
+    self.assertEqual(30, sizes.size('a', 300, 1000))
+    self.assertEqual(5, sizes.size('b', 10, 1000))
+    self.assertEqual(60, sizes.size('c', 690, 1000))
+
+  def testInvalidSampleSizes(self):
+    with self.assertRaises(ValueError):
+      sampling.SampleSizes()
+    with self.assertRaises(ValueError):
+      sampling.SampleSizes(allocation={'policy': 'equal', 'total': 100})
+    with self.assertRaises(ValueError):
+      sampling.SampleSizes(allocation={'policy': 'proportional', 'total': 100, 'floor': 10, 'cap': 5})
+    for total in [-1, True, 10.5, None]:
+      with self.assertRaises(ValueError):
+        sampling.SampleSizes(allocation={'policy': 'proportional', 'total': total})
+    # nothing is sampled
+    self.assertEqual(0, sampling.SampleSizes(allocation={'policy': 'proportional', 'total': 0}).size('a', 10, 100))
+
+  def testIndexEntryPriority(self):
+    entry = ('/data/Split-train/data-00000-of-00002.gz', 1234, 56)
+    priority = sampling.index_entry_priority(entry, seed=7)
+    # the priority does not depend on where the files are
+    self.assertEqual(priority, sampling.index_entry_priority(('/copy/data-00000-of-00002.gz', 1234, 56), seed=7))
+    self.assertNotEqual(priority, sampling.index_entry_priority(entry, seed=8))
+    self.assertNotEqual(priority, sampling.index_entry_priority(('/data/data-00001-of-00002.gz', 1234, 56), seed=7))
+
+  def testSizeCombineFnWithLength(self):
+    combine_fn = sampling.SizeCombineFn(sampling.index_entry_length)
+    accumulator = combine_fn.create_accumulator()
+    for entry in [('a', 0, 10), ('a', 22, 5)]:
+      accumulator = combine_fn.add_input(accumulator, entry)
+    self.assertEqual((2, 15), combine_fn.extract_output(accumulator))
+
+  def testSizeCombineFn(self):
+    combine_fn = sampling.SizeCombineFn()
+    accumulators = []
+    for chunk in range(3):
+      accumulator = combine_fn.create_accumulator()
+      for record in self._records[chunk::3]:
+        accumulator = combine_fn.add_input(accumulator, record)
+      accumulators.append(accumulator)
+    self.assertEqual((100, sum(len(r) for r in self._records)),
+                     combine_fn.extract_output(combine_fn.merge_accumulators(accumulators)))
+
+  def testKeyHistogramRecord(self):
+    row = tf.train.Example.FromString(sampling.key_histogram_record(True, (10, 100), (2, 20)))
+    self.assertEqual([b'True'], row.features.feature['key'].bytes_list.value)
+    self.assertEqual([10], row.features.feature['input_count'].int64_list.value)
+    self.assertEqual([100], row.features.feature['input_bytes'].int64_list.value)
+    self.assertEqual([2], row.features.feature['output_count'].int64_list.value)
+    self.assertEqual([20], row.features.feature['output_bytes'].int64_list.value)
+
+  def testKeyRecords(self):
+    key_records = sampling.KeyRecords(lambda record: record[-1:])
+    key_records.setup()
+    self.assertEqual([(b'7', b'record-7')], list(key_records.process(b'record-7')))
+    # no counter per key by default
+    self.assertEqual({}, key_records._counters)
+
+    key_records = sampling.KeyRecords(lambda record: record[-1:], per_key_metrics=True)
+    key_records.setup()
+    self.assertEqual([(b'7', b'record-7')], list(key_records.process(b'record-7')))
+    self.assertEqual([b'7'], list(key_records._counters))
+
+    key_records = sampling.KeyRecords(lambda record: record[-1:], with_metrics=False)
+    key_records.setup()
+    self.assertEqual([(b'7', b'record-7')], list(key_records.process(b'record-7')))
+
+  def testInclusionRate(self):
+    self.assertEqual(1., sampling.inclusion_rate(10, 5))
+    self.assertEqual(1., sampling.inclusion_rate(10, 10))
+    self.assertAlmostEqual(0.1, sampling.inclusion_rate(10, 100))
+
+  def testKeepRecord(self):
+    self.assertTrue(all(sampling.keep_record(record, 1., 0) for record in self._records))
+    self.assertFalse(any(sampling.keep_record(record, 0., 0) for record in self._records))
+
+    kept = [record for record in self._records if sampling.keep_record(record, .5, 0)]
+    self.assertEqual(kept, [record for record in self._records if sampling.keep_record(record, .5, 0)])
+    self.assertBetween(len(kept), 25, 75)
+
+  def testHotKeyFanouts(self):
+    keys = ['hot'] * 60 + ['warm'] * 30 + ['cold'] * 10
+    self.assertEqual({'hot': 9, 'warm': 4}, sampling.hot_key_fanouts(keys, max_fanout=16))
+    self.assertEqual({}, sampling.hot_key_fanouts(['a', 'b', 'c', 'd'], max_fanout=4))
+    self.assertEqual({}, sampling.hot_key_fanouts([]))
+
+  def testBernoulliTrials(self):
+    joined = {'rate': [.5], 'records': self._records}
+    expected = [('k', record) for record in self._records if sampling.keep_record(record, .5, 3)]
+    self.assertEqual(expected, list(sampling.bernoulli_trials(('k', 2), joined, 3)))
+
+
+if __name__ == '__main__':
+  tf.test.main()
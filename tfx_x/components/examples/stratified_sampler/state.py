@@ -0,0 +1,110 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Persisted state of the 'bottom_k' engine of the StratifiedSampler.
+
+The priority of a record is a seeded hash of its bytes, so the bottom-k of a key over some records is the bottom-k
+over the union of the bottom-k of any partition of these records. The state of a split is therefore the records of
+its sample - in the split of the SamplerState artifact - and the fingerprints of the input files they were sampled
+from - in its manifest. A later run only reads the new input files and the records of the state.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Mapping, Optional, Text, Tuple
+
+import tensorflow as tf
+from absl import logging
+from tfx.types import artifact_utils, Artifact
+from tfx.utils import io_utils
+
+from tfx_x.components import utils
+
+STATE_FILE_PREFIX = 'sampler_state'
+_MANIFEST_FILE = 'sampler_state.json'
+
+# fingerprint of each input file, by name
+FileFingerprints = Dict[Text, Dict[Text, int]]
+
+
+def config_fingerprint(to_key_fn: Text,
+                       sampling_seed: int,
+                       samples_per_key: Optional[int],
+                       samples_per_key_map: Optional[Mapping[Text, int]]) -> Text:
+  """Fingerprint of what the sample depends on, besides the input records."""
+  config = json.dumps([to_key_fn, sampling_seed, samples_per_key, samples_per_key_map], sort_keys=True)
+  return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+
+def read_manifest(state_artifact: Optional[Artifact], fingerprint: Text) -> Optional[Dict[Text, Any]]:
+  """Manifest of a SamplerState artifact if it was produced with the same configuration."""
+  if state_artifact is None:
+    return None
+
+  manifest_file = os.path.join(state_artifact.uri, _MANIFEST_FILE)
+  if not tf.io.gfile.exists(manifest_file):
+    logging.info('No sampler state in %s, sampling everything.', state_artifact.uri)
+    return None
+
+  manifest = json.loads(io_utils.read_string_file(manifest_file))
+  if manifest['config'] != fingerprint:
+    logging.info('The sampler state in %s has another configuration, sampling everything.', state_artifact.uri)
+    return None
+  return manifest
+
+
+def write_manifest(state_artifact: Artifact, fingerprint: Text, splits: Mapping[Text, FileFingerprints]) -> None:
+  io_utils.write_string_file(os.path.join(state_artifact.uri, _MANIFEST_FILE),
+                             json.dumps({'config': fingerprint, 'splits': splits}))
+
+
+def plan_split(split_name: Text,
+               example_uri: Text,
+               previous_state: Optional[Artifact],
+               previous_manifest: Optional[Dict[Text, Any]]) -> Tuple[List[Text], FileFingerprints]:
+  """Files to read to sample a split.
+  Args:
+    split_name: name of the split.
+    example_uri: uri of the input split.
+    previous_state: the previous SamplerState artifact, if any.
+    previous_manifest: its manifest if it can be used, see `read_manifest()`.
+  Returns:
+    the files to read - the new input files and the records of the previous state, or all the input files if the
+    previous state cannot be used - and the fingerprints of the input files.
+  """
+  files = {}
+  for filename in sorted(tf.io.gfile.listdir(example_uri)):
+    path = os.path.join(example_uri, filename)
+    if not tf.io.gfile.isdir(path):
+      files[filename] = utils.file_fingerprint(path)
+  all_files = [os.path.join(example_uri, filename) for filename in files]
+
+  previous_files = previous_manifest['splits'].get(split_name) if previous_manifest else None
+  if previous_files is None:
+    return all_files, files
+
+  changed = [filename for filename, fingerprint in previous_files.items() if files.get(filename) != fingerprint]
+  if changed:
+    logging.info('Files of split %s changed or were removed since the previous state (%s), sampling everything.',
+                 split_name, changed[:10])
+    return all_files, files
+
+  state_dir = artifact_utils.get_split_uri([previous_state], split_name)
+  state_files = [os.path.join(state_dir, filename) for filename in sorted(tf.io.gfile.listdir(state_dir))]
+  new_files = [os.path.join(example_uri, filename) for filename in files if filename not in previous_files]
+  logging.info('Split %s: %d new files out of %d, merged with the previous state.', split_name, len(new_files),
+               len(files))
+  return new_files + state_files, files
@@ -0,0 +1,300 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Writing of the examples produced by the components.
+
+An output config is a dict with:
+  - 'compression': 'gzip' (default) or 'none'. The files are named '*.gz' or have no suffix, so that
+    `beam.io.ReadFromTFRecord()` and the TFXIO of the Trainer, Transform, ... detect their compression. With
+    `tf.data.TFRecordDataset`, the compression_type is 'GZIP' or ''. 'zlib' is refused: the TFXIO only recognizes
+    '*.gz' files and would read zlib files as uncompressed ones.
+  - 'num_shards': a fixed number of output files,
+  - 'target_shard_bytes': or a number of output files such that each holds about that many bytes of serialized
+    records - before compression.
+Without 'num_shards' or 'target_shard_bytes', the runner picks the number of files. Otherwise the records are spread
+on the shards by a hash of their bytes. In both cases the number of records and bytes of each shard is written to a
+`shard_metadata/Split-<split>.json` file at the root of the artifact - not in the split, where it would be taken for
+examples. The files written by the runner are read back to count them.
+"""
+
+import json
+import math
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Text, Tuple
+
+import apache_beam as beam
+import tensorflow as tf
+from apache_beam.io.filesystem import CompressionTypes
+from tfx.types import artifact_utils, Artifact
+from tfx.utils import io_utils
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZLIB = 'zlib'
+# zlib files ('*.deflate') can be read - Beam writes them - but not written: the TFXIO reads them as uncompressed
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP)
+
+SHARD_METADATA_DIR = 'shard_metadata'
+
+_SUFFIXES = {
+  COMPRESSION_NONE: '',
+  COMPRESSION_GZIP: '.gz',
+  COMPRESSION_ZLIB: '.deflate',
+}
+_BEAM_COMPRESSION_TYPES = {
+  COMPRESSION_NONE: CompressionTypes.UNCOMPRESSED,
+  COMPRESSION_GZIP: CompressionTypes.GZIP,
+}
+_TF_COMPRESSION_TYPES = {
+  COMPRESSION_NONE: '',
+  COMPRESSION_GZIP: 'GZIP',
+}
+
+
+class OutputConfig(NamedTuple):
+  """How to write examples, see the module."""
+  compression: Text = COMPRESSION_GZIP
+  num_shards: Optional[int] = None
+  target_shard_bytes: Optional[int] = None
+
+  @property
+  def suffix(self) -> Text:
+    return _SUFFIXES[self.compression]
+
+  @property
+  def tf_compression_type(self) -> Text:
+    return _TF_COMPRESSION_TYPES[self.compression]
+
+  @property
+  def is_sharded(self) -> bool:
+    """Whether the shards are chosen here rather than by the runner."""
+    return bool(self.num_shards or self.target_shard_bytes)
+
+
+def output_config(config: Optional[Mapping[Text, Any]]) -> OutputConfig:
+  """Checks an output config dict and returns its `OutputConfig`."""
+  if config is None:
+    return OutputConfig()
+
+  unknown = set(config) - set(OutputConfig._fields)
+  if unknown:
+    raise ValueError('Unknown output config keys: {} - must be in {}'.format(sorted(unknown), OutputConfig._fields))
+
+  compression = config.get('compression') or COMPRESSION_GZIP
+  if compression == COMPRESSION_ZLIB:
+    raise ValueError('\'zlib\' compression is not supported: the TFXIO of the Trainer, Transform, ... reads '
+                     '\'*.deflate\' files as uncompressed - use \'gzip\' or \'none\'')
+  if compression not in COMPRESSIONS:
+    raise ValueError('Unknown compression: {!r} - must be one of {}'.format(compression, COMPRESSIONS))
+
+  num_shards = config.get('num_shards')
+  target_shard_bytes = config.get('target_shard_bytes')
+  if num_shards is not None and target_shard_bytes is not None:
+    raise ValueError('\'num_shards\' and \'target_shard_bytes\' cannot be both set: {!r}'.format(config))
+  for name, value in [('num_shards', num_shards), ('target_shard_bytes', target_shard_bytes)]:
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+      raise ValueError('\'{}\' must be a positive int: {!r}'.format(name, value))
+
+  return OutputConfig(compression=compression, num_shards=num_shards, target_shard_bytes=target_shard_bytes)
+
+
+def file_compression(path: Text) -> Text:
+  """Compression of a TFRecord file from its suffix, as Beam detects it."""
+  for compression in [COMPRESSION_GZIP, COMPRESSION_ZLIB]:
+    if path.endswith(_SUFFIXES[compression]):
+      return compression
+  return COMPRESSION_NONE
+
+
+def shard_metadata_path(artifact: Artifact, split_name: Text) -> Text:
+  """Where the shard metadata of a split of an artifact are written."""
+  return os.path.join(artifact.uri, SHARD_METADATA_DIR, os.path.basename(
+    artifact_utils.get_split_uri([artifact], split_name)) + '.json')
+
+
+def read_shard_metadata(artifact: Artifact, split_name: Text) -> Optional[Dict[Text, Any]]:
+  """Shard metadata of a split, if they were written."""
+  path = shard_metadata_path(artifact, split_name)
+  if not tf.io.gfile.exists(path):
+    return None
+  return json.loads(io_utils.read_string_file(path))
+
+
+def _shard_path(file_prefix: Text, index: int, num_shards: int, config: OutputConfig) -> Text:
+  # same names as the default shard_name_template of Beam
+  return '{}-{:05d}-of-{:05d}{}'.format(file_prefix, index, num_shards, config.suffix)
+
+
+def _write_shard(path: Text, records: Iterable[bytes], config: OutputConfig) -> Tuple[int, int]:
+  tf.io.gfile.makedirs(os.path.dirname(path))
+  count = 0
+  size = 0
+  with tf.io.TFRecordWriter(path, options=tf.io.TFRecordOptions(compression_type=config.tf_compression_type)) \
+      as writer:
+    for record in records:
+      writer.write(record)
+      count += 1
+      size += len(record)
+  return count, size
+
+
+class _WriteShard(beam.DoFn):
+  """Writes a (shard index, records) to its file and outputs its metadata."""
+
+  def __init__(self, file_prefix: Text, config: OutputConfig):
+    super(_WriteShard, self).__init__()
+    self._file_prefix = file_prefix
+    self._config = config
+
+  def process(self, shard: Tuple[int, Iterable[bytes]], num_shards: int):
+    index, records = shard
+    path = _shard_path(self._file_prefix, index, num_shards, self._config)
+    count, size = _write_shard(path, records, self._config)
+    yield {'index': index, 'file': os.path.basename(path), 'records': count, 'bytes': size}
+
+
+def _finalize_shards(shards: List[Dict[Text, Any]],
+                     num_shards: int,
+                     file_prefix: Text,
+                     config: OutputConfig,
+                     metadata_path: Optional[Text]) -> Iterable[Text]:
+  """Writes the shards which got no record, and the metadata of all of them."""
+  shards = list(shards)
+  written = {shard['index'] for shard in shards}
+  for index in range(num_shards):
+    if index not in written:
+      path = _shard_path(file_prefix, index, num_shards, config)
+      _write_shard(path, [], config)
+      shards.append({'index': index, 'file': os.path.basename(path), 'records': 0, 'bytes': 0})
+
+  shards = sorted(shards, key=lambda shard: shard['index'])
+  if metadata_path is not None:
+    _write_shard_metadata(metadata_path, shards, config)
+
+  for shard in shards:
+    yield os.path.join(os.path.dirname(file_prefix), shard['file'])
+
+
+def _write_shard_metadata(metadata_path: Text, shards: List[Dict[Text, Any]], config: OutputConfig) -> None:
+  io_utils.write_string_file(metadata_path, json.dumps({
+    'compression': config.compression,
+    'num_shards': len(shards),
+    'records': sum(shard['records'] for shard in shards),
+    'bytes': sum(shard['bytes'] for shard in shards),
+    'shards': [{'file': shard['file'], 'records': shard['records'], 'bytes': shard['bytes']} for shard in shards],
+  }))
+
+
+def _file_shard(path: Text, config: OutputConfig) -> Dict[Text, Any]:
+  """Metadata of a file written by the runner, read back."""
+  count = 0
+  size = 0
+  for record in tf.data.TFRecordDataset(path, compression_type=config.tf_compression_type):
+    count += 1
+    size += len(record.numpy())
+  return {'file': os.path.basename(path), 'records': count, 'bytes': size}
+
+
+def _finalize_files(shards: List[Dict[Text, Any]], metadata_path: Text, config: OutputConfig) -> Iterable[Text]:
+  """Writes the metadata of the files written by the runner."""
+  _write_shard_metadata(metadata_path, sorted(shards, key=lambda shard: shard['file']), config)
+  for shard in shards:
+    yield shard['path']
+
+
+class _WriteFile(beam.DoFn):
+  """Writes the records of a (path, {'records': records, 'paths': ...}) to its file and outputs its path."""
+
+  def __init__(self, config: OutputConfig):
+    super(_WriteFile, self).__init__()
+    self._config = config
+
+  def process(self, keyed_records: Tuple[Text, Dict[Text, Iterable[bytes]]]):
+    path, grouped = keyed_records
+    _write_shard(path, grouped['records'], self._config)
+    yield path
+
+
+class WriteFiles(beam.PTransform):
+  """Writes (path, serialized record) pairs to the TFRecord file of their path.
+
+  Each of `paths` gets its file, even without records - the suffix of the compression is not added.
+  Outputs the written paths.
+  """
+
+  def __init__(self, paths: List[Text], config: OutputConfig):
+    super(WriteFiles, self).__init__()
+    self._paths = paths
+    self._config = config
+
+  def expand(self, keyed_records: beam.PCollection) -> beam.PCollection:
+    paths = keyed_records.pipeline | 'Paths' >> beam.Create([(path, True) for path in self._paths])
+    return (
+        {'records': keyed_records, 'paths': paths}
+        | 'GroupByPath' >> beam.CoGroupByKey()
+        | 'WriteFiles' >> beam.ParDo(_WriteFile(self._config)))
+
+
+class WriteExamples(beam.PTransform):
+  """Writes serialized records to TFRecord files of prefix `file_prefix`, see the module.
+
+  Outputs the names of the written files.
+  """
+
+  def __init__(self, file_prefix: Text, config: OutputConfig, metadata_path: Optional[Text] = None):
+    super(WriteExamples, self).__init__()
+    self._file_prefix = file_prefix
+    self._config = config
+    self._metadata_path = metadata_path
+
+  def expand(self, records: beam.PCollection) -> beam.PCollection:
+    config = self._config
+    if not config.is_sharded:
+      files = records | 'WriteToTFRecord' >> beam.io.WriteToTFRecord(
+        self._file_prefix,
+        file_name_suffix=config.suffix,
+        compression_type=_BEAM_COMPRESSION_TYPES[config.compression])
+      if self._metadata_path is None:
+        return files
+      # the records of each file are only known once the runner wrote them
+      return (
+          files
+          | 'ReshuffleFiles' >> beam.Reshuffle()
+          | 'CountRecords' >> beam.Map(lambda path: dict(_file_shard(path, config), path=path))
+          | 'CollectFiles' >> beam.combiners.ToList()
+          | 'FinalizeFiles' >> beam.FlatMap(_finalize_files, metadata_path=self._metadata_path, config=config))
+
+    if config.num_shards:
+      num_shards = records.pipeline | 'NumShards' >> beam.Create([config.num_shards])
+    else:
+      num_shards = (
+          records
+          | 'RecordBytes' >> beam.Map(len)
+          | 'TotalBytes' >> beam.CombineGlobally(sum)
+          | 'NumShards' >> beam.Map(lambda total: max(1, int(math.ceil(total / config.target_shard_bytes)))))
+    num_shards = beam.pvalue.AsSingleton(num_shards)
+
+    return (
+        records
+        | 'AssignShards' >> beam.Map(lambda record, n: (zlib.crc32(record) % n, record), n=num_shards)
+        | 'GroupByShard' >> beam.GroupByKey()
+        | 'WriteShards' >> beam.ParDo(_WriteShard(self._file_prefix, config), num_shards=num_shards)
+        | 'CollectShards' >> beam.combiners.ToList()
+        | 'FinalizeShards' >> beam.FlatMap(_finalize_shards,
+                                           num_shards=num_shards,
+                                           file_prefix=self._file_prefix,
+                                           config=config,
+                                           metadata_path=self._metadata_path))
@@ -0,0 +1,122 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+
+import apache_beam as beam
+import tensorflow as tf
+from apache_beam.testing.test_pipeline import TestPipeline
+
+from tfx_x.components.examples import writer
+
+
+class WriterTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(WriterTest, self).setUp()
+    self._output_dir = os.path.join(self.get_temp_dir(), self._testMethodName)
+    self._records = [b'record-%d' % i for i in range(100)]
+
+  def _write(self, config, metadata_path=None):
+    prefix = os.path.join(self._output_dir, 'examples')
+    with TestPipeline() as pipeline:
+      _ = (
+          pipeline
+          | beam.Create(self._records)
+          | writer.WriteExamples(prefix, config, metadata_path=metadata_path))
+    return sorted(tf.io.gfile.glob(prefix + '*'))
+
+  def _read(self, files, compression_type):
+    return [record.numpy() for record in tf.data.TFRecordDataset(files, compression_type=compression_type)]
+
+  def testOutputConfig(self):
+    self.assertEqual(writer.OutputConfig(), writer.output_config(None))
+    config = writer.output_config({'compression': 'gzip', 'num_shards': 3})
+    self.assertEqual('.gz', config.suffix)
+    self.assertTrue(config.is_sharded)
+    self.assertFalse(writer.output_config({'compression': 'none'}).is_sharded)
+
+  def testOutputConfigIsChecked(self):
+    for config in [{'compression': 'lz4'},
+                   # read as uncompressed by the TFXIO
+                   {'compression': 'zlib'},
+                   {'num_shards': 0},
+                   {'num_shards': True},
+                   {'target_shard_bytes': True},
+                   {'target_shard_bytes': 'large'},
+                   {'num_shards': 2, 'target_shard_bytes': 1024},
+                   {'shards': 2}]:
+      with self.assertRaises(ValueError):
+        writer.output_config(config)
+
+  def testWriteUncompressed(self):
+    files = self._write(writer.output_config({'compression': 'none'}))
+    self.assertTrue(files)
+    for f in files:
+      self.assertFalse(f.endswith('.gz'))
+    self.assertCountEqual(self._records, self._read(files, ''))
+
+  def testWriteUnshardedWithMetadata(self):
+    # the runner picks the files, their records are counted once written
+    metadata_path = os.path.join(self._output_dir, 'metadata.json')
+    files = self._write(writer.output_config(None), metadata_path)
+
+    metadata = json.loads(tf.io.gfile.GFile(metadata_path).read())
+    self.assertEqual('gzip', metadata['compression'])
+    self.assertEqual(len(files), metadata['num_shards'])
+    self.assertEqual(len(self._records), metadata['records'])
+    self.assertEqual(sum(len(record) for record in self._records), metadata['bytes'])
+    self.assertEqual([os.path.basename(f) for f in files], [shard['file'] for shard in metadata['shards']])
+    for shard, f in zip(metadata['shards'], files):
+      self.assertLen(self._read([f], 'GZIP'), shard['records'])
+
+  def testWriteFixedShardsWithMetadata(self):
+    metadata_path = os.path.join(self._output_dir, 'metadata.json')
+    files = self._write(writer.output_config({'compression': 'gzip', 'num_shards': 4}), metadata_path)
+
+    self.assertEqual(['examples-0000%d-of-00004.gz' % i for i in range(4)], [os.path.basename(f) for f in files])
+    self.assertCountEqual(self._records, self._read(files, 'GZIP'))
+
+    metadata = json.loads(tf.io.gfile.GFile(metadata_path).read())
+    self.assertEqual(4, metadata['num_shards'])
+    self.assertEqual(len(self._records), metadata['records'])
+    for shard, f in zip(metadata['shards'], files):
+      self.assertEqual(os.path.basename(f), shard['file'])
+      self.assertLen(self._read([f], 'GZIP'), shard['records'])
+
+  def testWriteTargetShardBytes(self):
+    total_bytes = sum(len(record) for record in self._records)
+    files = self._write(writer.output_config({'target_shard_bytes': total_bytes // 3 + 1}))
+
+    self.assertLen(files, 3)
+    self.assertCountEqual(self._records, self._read(files, 'GZIP'))
+
+  def testWriteFiles(self):
+    paths = [os.path.join(self._output_dir, name) for name in ['even', 'odd', 'empty']]
+    with TestPipeline() as pipeline:
+      _ = (
+          pipeline
+          | beam.Create(self._records)
+          | beam.Map(lambda record: (paths[int(record[len('record-'):]) % 2], record))
+          | writer.WriteFiles(paths, writer.output_config({'compression': 'none'})))
+
+    self.assertCountEqual(self._records[0::2], self._read([paths[0]], ''))
+    self.assertCountEqual(self._records[1::2], self._read([paths[1]], ''))
+    self.assertEmpty(self._read([paths[2]], ''))
+
+
+if __name__ == '__main__':
+  tf.test.main()
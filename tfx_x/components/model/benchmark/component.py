@@ -0,0 +1,115 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from typing import Any, Dict, List, Optional, Text
+
+from tfx import types
+from tfx.dsl.components.base import base_component
+from tfx.dsl.components.base import executor_spec
+from tfx.types import channel_utils
+from tfx.types import standard_artifacts
+from tfx.types.component_spec import ChannelParameter
+from tfx.types.component_spec import ExecutionParameter
+from tfx.utils import json_utils
+
+from tfx_x import PipelineConfiguration, ModelBenchmark
+from tfx_x.components.model.benchmark import executor
+from tfx_x.components.model.benchmark.executor import MODEL_KEY, EXAMPLES_KEY, PIPELINE_CONFIGURATION_KEY, \
+  BENCHMARK_KEY, BLESSING_KEY, SPLIT_KEY, SIGNATURE_NAME_KEY, BATCH_SIZES_KEY, THREAD_COUNTS_KEY, NUM_BATCHES_KEY, \
+  THRESHOLDS_KEY
+
+
+class BenchmarkSpec(types.ComponentSpec):
+  """ComponentSpec for model Benchmark Component."""
+
+  PARAMETERS = {
+    SPLIT_KEY: ExecutionParameter(type=Text, optional=True),
+    SIGNATURE_NAME_KEY: ExecutionParameter(type=Text, optional=True),
+    BATCH_SIZES_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    THREAD_COUNTS_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    NUM_BATCHES_KEY: ExecutionParameter(type=int, optional=True),
+    THRESHOLDS_KEY: ExecutionParameter(type=(str, Text), optional=True),
+  }
+  INPUTS = {
+    MODEL_KEY: ChannelParameter(type=standard_artifacts.Model),
+    EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples),
+    PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
+  }
+  OUTPUTS = {
+    BENCHMARK_KEY: ChannelParameter(type=ModelBenchmark),
+    BLESSING_KEY: ChannelParameter(type=standard_artifacts.InfraBlessing, optional=True),
+  }
+
+
+class Benchmark(base_component.BaseComponent):
+  """Model Benchmark TFX Component.
+
+  Replays batches of examples through the serving signature of a model and records its latency, throughput and
+  peak memory. With `thresholds`, its `blessing` can be given to `Export` - or the Pusher - as `infra_blessing`.
+  """
+
+  SPEC_CLASS = BenchmarkSpec
+  EXECUTOR_SPEC = executor_spec.ExecutorClassSpec(executor.Executor)
+
+  def __init__(self,
+               model: types.Channel = None,
+               examples: types.Channel = None,
+               pipeline_configuration: Optional[types.Channel] = None,
+               split: Optional[Text] = None,
+               signature_name: Optional[Text] = None,
+               batch_sizes: Optional[List[int]] = None,
+               thread_counts: Optional[List[int]] = None,
+               num_batches: Optional[int] = None,
+               thresholds: Optional[Dict[Text, Any]] = None,
+               benchmark: Optional[types.Channel] = None,
+               blessing: Optional[types.Channel] = None):
+    """Construct a model benchmark component.
+
+    Args:
+      model: A Channel of type `standard_artifacts.Model`.
+      examples: A Channel of type `standard_artifacts.Examples`, the examples to send to the model.
+      pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig component.
+      split: The split of the examples to use - default is 'eval'.
+      signature_name: The signature to call, it must take a batch of serialized examples - default is
+        'serving_default'.
+      batch_sizes: The batch sizes to measure - default is [1, 8, 64].
+      thread_counts: The numbers of threads calling the model concurrently - default is [1, 4].
+      num_batches: Number of batches sent for each batch size and thread count - default is 100.
+      thresholds: 'max_p50_latency_ms', 'max_p95_latency_ms', 'max_p99_latency_ms' and 'min_examples_per_second'
+        the model must meet with every batch size and thread count to be blessed, and 'max_benchmark_memory_bytes'
+        for the memory taken by the calls - over the memory once the model and the examples are loaded. The
+        `blessing` output is only declared with thresholds - or an explicit `blessing` channel, for thresholds from
+        the `PipelineConfiguration` - and is not blessed without thresholds.
+      benchmark: A Channel of type `ModelBenchmark`.
+      blessing: A Channel of type `standard_artifacts.InfraBlessing`.
+    """
+
+    if not benchmark:
+      benchmark = channel_utils.as_channel([ModelBenchmark()])
+    if not blessing and thresholds:
+      blessing = channel_utils.as_channel([standard_artifacts.InfraBlessing()])
+
+    spec = BenchmarkSpec(model=model,
+                         examples=examples,
+                         pipeline_configuration=pipeline_configuration,
+                         split=split,
+                         signature_name=signature_name,
+                         batch_sizes=None if batch_sizes is None else json_utils.dumps(batch_sizes),
+                         thread_counts=None if thread_counts is None else json_utils.dumps(thread_counts),
+                         num_batches=num_batches,
+                         thresholds=None if thresholds is None else json_utils.dumps(thresholds),
+                         benchmark=benchmark,
+                         blessing=blessing)
+    super(Benchmark, self).__init__(spec=spec)
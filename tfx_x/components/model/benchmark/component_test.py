@@ -0,0 +1,43 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+
+import tensorflow as tf
+from tfx.types import channel_utils
+from tfx.types import standard_artifacts
+
+from tfx_x.components.model.benchmark import component
+from tfx_x.components.model.benchmark.executor import BENCHMARK_KEY, BLESSING_KEY, THRESHOLDS_KEY
+
+
+class BenchmarkTest(tf.test.TestCase):
+
+  def testConstruct(self):
+    this_component = component.Benchmark(model=channel_utils.as_channel([standard_artifacts.Model()]),
+                                         examples=channel_utils.as_channel([standard_artifacts.Examples()]),
+                                         thresholds={'max_p99_latency_ms': 20.})
+    self.assertEqual('ModelBenchmark', this_component.outputs[BENCHMARK_KEY].type_name)
+    self.assertEqual(standard_artifacts.InfraBlessing.TYPE_NAME, this_component.outputs[BLESSING_KEY].type_name)
+    self.assertEqual({'max_p99_latency_ms': 20.}, json.loads(this_component.exec_properties[THRESHOLDS_KEY]))
+
+  def testConstructWithoutThresholds(self):
+    this_component = component.Benchmark(model=channel_utils.as_channel([standard_artifacts.Model()]),
+                                         examples=channel_utils.as_channel([standard_artifacts.Examples()]))
+    self.assertNotIn(BLESSING_KEY, this_component.outputs)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,286 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import concurrent.futures
+import itertools
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Mapping, Optional, Text
+
+import numpy as np
+import tensorflow as tf
+from absl import logging
+from tfx import types
+from tfx.dsl.components.base import base_executor
+from tfx.types import artifact_utils
+from tfx.utils import io_utils, json_utils
+
+from tfx_x.components import utils as components_utils
+from tfx_x.components.model import utils
+
+MODEL_KEY = 'model'
+EXAMPLES_KEY = 'examples'
+PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+BENCHMARK_KEY = 'benchmark'
+BLESSING_KEY = 'blessing'
+SPLIT_KEY = 'split'
+SIGNATURE_NAME_KEY = 'signature_name'
+BATCH_SIZES_KEY = 'batch_sizes'
+THREAD_COUNTS_KEY = 'thread_counts'
+NUM_BATCHES_KEY = 'num_batches'
+THRESHOLDS_KEY = 'thresholds'
+
+BENCHMARK_FILE = 'benchmark.json'
+
+# thresholds, checked against each (batch size, thread count) - the memory against the whole run
+MAX_P50_LATENCY_MS = 'max_p50_latency_ms'
+MAX_P95_LATENCY_MS = 'max_p95_latency_ms'
+MAX_P99_LATENCY_MS = 'max_p99_latency_ms'
+MIN_EXAMPLES_PER_SECOND = 'min_examples_per_second'
+MAX_BENCHMARK_MEMORY_BYTES = 'max_benchmark_memory_bytes'
+_THRESHOLDS = {
+  MAX_P50_LATENCY_MS: ('p50_latency_ms', max),
+  MAX_P95_LATENCY_MS: ('p95_latency_ms', max),
+  MAX_P99_LATENCY_MS: ('p99_latency_ms', max),
+  MIN_EXAMPLES_PER_SECOND: ('examples_per_second', min),
+  MAX_BENCHMARK_MEMORY_BYTES: ('benchmark_memory_bytes', max),
+}
+
+# same as the InfraValidator, for the Pusher and Export components
+_BLESSED_PROPERTY = 'blessed'
+_BLESSED_FILE = 'INFRA_BLESSED'
+_NOT_BLESSED_FILE = 'INFRA_NOT_BLESSED'
+
+
+# ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+_MAXRSS_BYTES = 1 if sys.platform == 'darwin' else 1024
+
+
+def peak_memory_bytes() -> int:
+  """High-water mark of the resident memory of the process - it never decreases."""
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_BYTES
+
+
+def read_examples(examples: List[types.Artifact], split: Text, count: int) -> List[bytes]:
+  """Up to `count` serialized examples of a split."""
+  split_uri = components_utils.resolve_split_uri(artifact_utils.get_split_uri(examples, split))
+  records = []
+  for path in sorted(tf.io.gfile.glob(io_utils.all_files_pattern(split_uri))):
+    if tf.io.gfile.isdir(path):
+      continue
+    records.extend(itertools.islice(components_utils.read_tfrecord_file(path), count - len(records)))
+    if len(records) >= count:
+      break
+  return records
+
+
+def run_benchmark(fn: Any, records: List[bytes], batch_size: int, threads: int, num_batches: int) -> Dict[Text, Any]:
+  """Calls a signature taking a batch of serialized examples `num_batches` times, from `threads` threads."""
+  _, specs = fn.structured_input_signature
+  input_name = list(specs)[0]
+  batches = [tf.constant([records[(b * batch_size + i) % len(records)] for i in range(batch_size)])
+             for b in range(num_batches)]
+
+  fn(**{input_name: batches[0]})  # warm up
+
+  def call(batch: tf.Tensor) -> float:
+    start = time.perf_counter()
+    fn(**{input_name: batch})
+    return (time.perf_counter() - start) * 1000.
+
+  start = time.perf_counter()
+  with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+    latencies = list(pool.map(call, batches))
+  elapsed = time.perf_counter() - start
+
+  return {
+    'batch_size': batch_size,
+    'threads': threads,
+    'batches': num_batches,
+    'p50_latency_ms': float(np.percentile(latencies, 50)),
+    'p95_latency_ms': float(np.percentile(latencies, 95)),
+    'p99_latency_ms': float(np.percentile(latencies, 99)),
+    'examples_per_second': batch_size * num_batches / elapsed,
+  }
+
+
+def check_thresholds(thresholds: Mapping[Text, float]) -> None:
+  """Raises a ValueError on unknown thresholds."""
+  unknown = sorted(set(thresholds) - set(_THRESHOLDS))
+  if unknown:
+    raise ValueError('Unknown thresholds: {} - must be in {}'.format(unknown, sorted(_THRESHOLDS)))
+
+
+def failed_thresholds(results: List[Dict[Text, Any]], thresholds: Mapping[Text, float],
+                      memory: Optional[Mapping[Text, int]] = None) -> List[Text]:
+  """The thresholds which are not met by all the results - or by the `memory` of the whole run."""
+  check_thresholds(thresholds)
+  failed = []
+  for threshold, limit in sorted(thresholds.items()):
+    metric, worst = _THRESHOLDS[threshold]
+    if threshold == MAX_BENCHMARK_MEMORY_BYTES:
+      # the high-water mark cannot be measured for each batch size and thread count - and the peak of the process
+      # includes the loading of the model and the examples, and what ran before in the same process
+      if memory is None:
+        raise ValueError('\'{}\' needs the memory of the run.'.format(threshold))
+      value = memory[metric]
+    else:
+      value = worst(result[metric] for result in results)
+    if (worst is max and value > limit) or (worst is min and value < limit):
+      failed.append('{}: {} vs {}'.format(threshold, value, limit))
+  return failed
+
+
+class Executor(base_executor.BaseExecutor):
+  """Executor for Benchmark."""
+
+  def Do(self,
+         input_dict: Dict[Text, List[types.Artifact]],
+         output_dict: Dict[Text, List[types.Artifact]],
+         exec_properties: Dict[Text, Any]) -> None:
+    """Measures the latency and throughput of the serving signature of a model.
+
+    Args:
+      input_dict: Input dict from input key to a list of artifacts, including:
+        - model: A list of type `standard_artifacts.Model`
+        - examples: A list of type `standard_artifacts.Examples`, the examples to send to the model.
+        - pipeline_configuration: optional PipelineConfiguration artifact.
+      output_dict: Output dict from key to a list of artifacts, including:
+        - benchmark: `ModelBenchmark` artifact with a `benchmark.json` file.
+        - blessing: optional `InfraBlessing` artifact, blessed if the thresholds are met.
+      exec_properties: A dict of execution properties, including:
+        - split: the split of the examples to use - default is 'eval'.
+        - signature_name: the signature to call, taking a batch of serialized examples - default is
+          'serving_default'.
+        - batch_sizes: JSON list of the batch sizes to measure - default is [1, 8, 64].
+        - thread_counts: JSON list of the numbers of threads calling the model concurrently - default is [1, 4].
+        - num_batches: number of batches sent for each (batch size, thread count) - default is 100.
+        - thresholds: JSON dict of 'max_p50_latency_ms', 'max_p95_latency_ms', 'max_p99_latency_ms' and
+          'min_examples_per_second' to meet with every batch size and thread count, and 'max_benchmark_memory_bytes'
+          for the growth of the high-water mark of the memory during the calls. Without thresholds, the blessing is
+          not blessed.
+
+    Returns:
+      None
+
+    Raises:
+      OSError and its subclasses
+      ValueError
+    """
+    self._log_startup(input_dict, output_dict, exec_properties)
+
+    # Priority is as follow:
+    # 1. default value
+    # 2. from PipelineConfiguration
+    # 3. from exec_properties
+
+    config = {
+      SPLIT_KEY: 'eval',
+      SIGNATURE_NAME_KEY: tf.saved_model.DEFAULT_SERVING_SIGNATURE_DEF_KEY,
+      BATCH_SIZES_KEY: [1, 8, 64],
+      THREAD_COUNTS_KEY: [1, 4],
+      NUM_BATCHES_KEY: 100,
+      THRESHOLDS_KEY: {},
+    }
+
+    if PIPELINE_CONFIGURATION_KEY in input_dict:
+      pipeline_configuration_dir = artifact_utils.get_single_uri(input_dict[PIPELINE_CONFIGURATION_KEY])
+      pipeline_configuration_file = os.path.join(pipeline_configuration_dir, 'custom_config.json')
+      pipeline_configuration_str = io_utils.read_string_file(pipeline_configuration_file)
+      pipeline_configuration = json.loads(pipeline_configuration_str)
+
+      for key in config:
+        if key in pipeline_configuration:
+          config[key] = pipeline_configuration[key]
+
+    # Now looking at the exec_properties
+    for key in [SPLIT_KEY, SIGNATURE_NAME_KEY, NUM_BATCHES_KEY]:
+      if exec_properties.get(key) is not None:
+        config[key] = exec_properties[key]
+    for key in [BATCH_SIZES_KEY, THREAD_COUNTS_KEY, THRESHOLDS_KEY]:
+      if exec_properties.get(key) is not None:
+        config[key] = json_utils.loads(exec_properties[key])
+
+    # Validate we have all we need
+    if MODEL_KEY not in input_dict:
+      raise ValueError('\'model\' is missing in input dict.')
+
+    if EXAMPLES_KEY not in input_dict:
+      raise ValueError('\'examples\' is missing in input dict.')
+
+    if BENCHMARK_KEY not in output_dict:
+      raise ValueError('\'benchmark\' is missing in output dict.')
+
+    if not config[BATCH_SIZES_KEY] or not config[THREAD_COUNTS_KEY] or config[NUM_BATCHES_KEY] < 1:
+      raise ValueError('\'batch_sizes\', \'thread_counts\' and \'num_batches\' cannot be empty.')
+
+    # checked before the model is loaded, even without blessing
+    check_thresholds(config[THRESHOLDS_KEY])
+
+    # only the signatures are needed
+    model_dir = os.path.join(artifact_utils.get_single_uri(input_dict[MODEL_KEY]), 'Format-Serving')
+    model = utils.load_model(model_dir, utils.SAVED_MODEL_LOAD_MODE)
+    fn = model.signatures.get(config[SIGNATURE_NAME_KEY])
+    if fn is None:
+      raise ValueError('No signature {} in {}'.format(config[SIGNATURE_NAME_KEY], model_dir))
+    if not utils.takes_serialized_examples(fn):
+      raise ValueError('The signature {} must take a single batch of serialized examples, it takes {}'.format(
+        config[SIGNATURE_NAME_KEY], fn.structured_input_signature[1]))
+
+    records = read_examples(input_dict[EXAMPLES_KEY], config[SPLIT_KEY],
+                            max(config[BATCH_SIZES_KEY]) * config[NUM_BATCHES_KEY])
+    if not records:
+      raise ValueError('No examples in split {}'.format(config[SPLIT_KEY]))
+
+    # the memory taken by the calls is the growth of the high-water mark from there
+    baseline_memory_bytes = peak_memory_bytes()
+    results = []
+    for batch_size in config[BATCH_SIZES_KEY]:
+      for threads in config[THREAD_COUNTS_KEY]:
+        result = run_benchmark(fn, records, batch_size, threads, config[NUM_BATCHES_KEY])
+        logging.info('Benchmark: %s', result)
+        results.append(result)
+
+    memory = {
+      'peak_memory_bytes': peak_memory_bytes(),
+      'baseline_memory_bytes': baseline_memory_bytes,
+    }
+    memory['benchmark_memory_bytes'] = memory['peak_memory_bytes'] - baseline_memory_bytes
+
+    benchmark = artifact_utils.get_single_instance(output_dict[BENCHMARK_KEY])
+    io_utils.write_string_file(os.path.join(benchmark.uri, BENCHMARK_FILE), json.dumps(dict(memory, **{
+      'signature_name': config[SIGNATURE_NAME_KEY],
+      'split': config[SPLIT_KEY],
+      'results': results,
+    }), indent=2))
+    benchmark.set_float_custom_property('max_p99_latency_ms', max(result['p99_latency_ms'] for result in results))
+    benchmark.set_float_custom_property('max_examples_per_second',
+                                        max(result['examples_per_second'] for result in results))
+    for name, value in memory.items():
+      benchmark.set_int_custom_property(name, value)
+
+    if output_dict.get(BLESSING_KEY):
+      blessing = artifact_utils.get_single_instance(output_dict[BLESSING_KEY])
+      if config[THRESHOLDS_KEY]:
+        failed = failed_thresholds(results, config[THRESHOLDS_KEY], memory)
+      else:
+        # a blessing without thresholds would be granted to any model
+        failed = ['no thresholds']
+      if failed:
+        logging.info('The model is not blessed, thresholds not met: %s', failed)
+      io_utils.write_string_file(os.path.join(blessing.uri, _NOT_BLESSED_FILE if failed else _BLESSED_FILE), '')
+      blessing.set_int_custom_property(_BLESSED_PROPERTY, 0 if failed else 1)
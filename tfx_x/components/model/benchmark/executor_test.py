@@ -0,0 +1,155 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+import tempfile
+
+import tensorflow as tf
+from tensorflow import keras
+from tfx.dsl.io import fileio
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+
+from tfx_x import ModelBenchmark
+from tfx_x.components.model.benchmark import executor
+from tfx_x.components.model.benchmark.executor import MODEL_KEY, EXAMPLES_KEY, BENCHMARK_KEY, BLESSING_KEY, \
+  SPLIT_KEY, BATCH_SIZES_KEY, THREAD_COUNTS_KEY, NUM_BATCHES_KEY, THRESHOLDS_KEY, BENCHMARK_FILE
+
+
+class ExecutorTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ExecutorTest, self).setUp()
+
+    self._model_data_dir = tempfile.mkdtemp()
+
+    model = keras.Sequential([keras.Input(shape=(1,)), keras.layers.Dense(1)])
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string, name='examples')])
+    def serve(serialized):
+      features = tf.io.parse_example(serialized, {
+        'trip_miles': tf.io.FixedLenFeature([1], tf.float32, default_value=[0.]),
+      })
+      return {'outputs': model(features['trip_miles'])}
+
+    model.save(os.path.join(self._model_data_dir, 'Format-Serving'), signatures={'serving_default': serve})
+    del model
+
+    # Create input dict.
+    self._model = standard_artifacts.Model()
+    self._model.uri = self._model_data_dir
+
+    self._examples = standard_artifacts.Examples()
+    self._examples.uri = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'examples',
+                                      'testdata', 'csv_example_gen')
+    self._examples.split_names = artifact_utils.encode_split_names(['train', 'eval', 'unlabelled'])
+
+    self._input_dict = {
+      MODEL_KEY: [self._model],
+      EXAMPLES_KEY: [self._examples],
+    }
+
+    # Create output dict.
+    self._output_dir = tempfile.mkdtemp()
+    self._benchmark = ModelBenchmark()
+    self._benchmark.uri = os.path.join(self._output_dir, 'benchmark')
+    self._blessing = standard_artifacts.InfraBlessing()
+    self._blessing.uri = os.path.join(self._output_dir, 'blessing')
+
+    self._output_dict = {
+      BENCHMARK_KEY: [self._benchmark],
+      BLESSING_KEY: [self._blessing],
+    }
+
+    # Create exe properties.
+    self._exec_properties = {
+      SPLIT_KEY: 'eval',
+      BATCH_SIZES_KEY: json.dumps([1, 16]),
+      THREAD_COUNTS_KEY: json.dumps([1, 2]),
+      NUM_BATCHES_KEY: 10,
+    }
+
+    # Create context
+    self._tmp_dir = os.path.join(self._output_dir, '.temp')
+    self._context = executor.Executor.Context(
+      tmp_dir=self._tmp_dir, unique_id='2')
+
+  def test(self):
+    self._exec_properties[THRESHOLDS_KEY] = json.dumps({'min_examples_per_second': 0.,
+                                                        'max_benchmark_memory_bytes': 1 << 50})
+    benchmark = executor.Executor(self._context)
+    benchmark.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+    with fileio.open(os.path.join(self._benchmark.uri, BENCHMARK_FILE)) as f:
+      output = json.load(f)
+    results = output['results']
+    self.assertCountEqual([(1, 1), (1, 2), (16, 1), (16, 2)], [(r['batch_size'], r['threads']) for r in results])
+    for result in results:
+      self.assertLessEqual(result['p50_latency_ms'], result['p99_latency_ms'])
+      self.assertGreater(result['examples_per_second'], 0.)
+    self.assertGreater(self._benchmark.get_int_custom_property('peak_memory_bytes'), 0)
+    self.assertEqual(output['peak_memory_bytes'] - output['baseline_memory_bytes'], output['benchmark_memory_bytes'])
+    self.assertGreaterEqual(output['benchmark_memory_bytes'], 0)
+    self.assertEqual(1, self._blessing.get_int_custom_property('blessed'))
+    self.assertTrue(fileio.exists(os.path.join(self._blessing.uri, 'INFRA_BLESSED')))
+
+  def testWithoutThresholds(self):
+    benchmark = executor.Executor(self._context)
+    benchmark.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+    # nothing was checked
+    self.assertEqual(0, self._blessing.get_int_custom_property('blessed'))
+    self.assertTrue(fileio.exists(os.path.join(self._blessing.uri, 'INFRA_NOT_BLESSED')))
+
+  def testUnknownThresholdWithoutBlessing(self):
+    del self._output_dict[BLESSING_KEY]
+    self._exec_properties[THRESHOLDS_KEY] = json.dumps({'max_latency': 1.})
+
+    benchmark = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      benchmark.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+  def testThresholdsNotMet(self):
+    self._exec_properties[THRESHOLDS_KEY] = json.dumps({'max_p99_latency_ms': 0.})
+
+    benchmark = executor.Executor(self._context)
+    benchmark.Do(self._input_dict, self._output_dict, self._exec_properties)
+
+    self.assertEqual(0, self._blessing.get_int_custom_property('blessed'))
+    self.assertTrue(fileio.exists(os.path.join(self._blessing.uri, 'INFRA_NOT_BLESSED')))
+
+  def testFailedThresholds(self):
+    results = [{'p99_latency_ms': 10., 'examples_per_second': 100.},
+               {'p99_latency_ms': 30., 'examples_per_second': 1000.}]
+    self.assertEqual([], executor.failed_thresholds(results, {'max_p99_latency_ms': 30.,
+                                                              'min_examples_per_second': 100.}))
+    self.assertLen(executor.failed_thresholds(results, {'max_p99_latency_ms': 20.,
+                                                        'min_examples_per_second': 500.}), 2)
+    with self.assertRaises(ValueError):
+      executor.failed_thresholds(results, {'max_latency': 1.})
+
+    # the memory threshold applies to the memory taken by the calls, not to the peak of the process
+    memory = {'peak_memory_bytes': 1000, 'baseline_memory_bytes': 900, 'benchmark_memory_bytes': 100}
+    self.assertEqual([], executor.failed_thresholds(results, {'max_benchmark_memory_bytes': 100}, memory))
+    self.assertLen(executor.failed_thresholds(results, {'max_benchmark_memory_bytes': 50}, memory), 1)
+    with self.assertRaises(ValueError):
+      executor.failed_thresholds(results, {'max_benchmark_memory_bytes': 100})
+    with self.assertRaises(ValueError):
+      executor.failed_thresholds(results, {'max_peak_memory_bytes': 100}, memory)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -27,7 +27,7 @@ from tfx.types.standard_component_specs import MODEL_BLESSING_KEY, INFRA_BLESSIN
 from tfx_x import PipelineConfiguration
 from tfx_x.components.model.export import executor
 from tfx_x.components.model.export.executor import OUTPUT_KEY, MODEL_KEY, FUNCTION_NAME_KEY, \
-  PIPELINE_CONFIGURATION_KEY
+  PIPELINE_CONFIGURATION_KEY, LOAD_MODE_KEY
 from tfx_x import ExportedModel
 
 
@@ -36,6 +36,7 @@ class ExportSpec(types.ComponentSpec):
 
   PARAMETERS = {
     FUNCTION_NAME_KEY: ExecutionParameter(type=Text),
+    LOAD_MODE_KEY: ExecutionParameter(type=Text, optional=True),
   }
   INPUTS = {
     MODEL_KEY: ChannelParameter(type=standard_artifacts.Model),
@@ -66,7 +67,8 @@ class Export(base_component.BaseComponent):
                pushed_model: Optional[types.Channel] = None,
                output: types.Channel = None,
                pipeline_configuration: Optional[types.Channel] = None,
-               transform_graph: Optional[types.Channel] = None):
+               transform_graph: Optional[types.Channel] = None,
+               load_mode: Optional[Text] = None):
     """Construct a model export component.
 
     Args:
@@ -78,6 +80,9 @@ class Export(base_component.BaseComponent):
       output: A Channel of type `ExportedModel`.
       pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig component.
       transform_graph: A channel of type `standard_artifacts.TransformGraph`.
+      load_mode: 'keras' or 'saved_model' to force how the model is loaded - by default it is loaded with
+        `tf.saved_model.load()` if the function is declared with `@utils.load_mode('saved_model')`, as a Keras model
+        otherwise.
     """
 
     if not output:
@@ -90,5 +95,6 @@ class Export(base_component.BaseComponent):
                       infra_blessing=infra_blessing,
                       pushed_model=pushed_model,
                       output=output,
-                      transform_graph=transform_graph)
+                      transform_graph=transform_graph,
+                      load_mode=load_mode)
     super(Export, self).__init__(spec=spec)
@@ -17,19 +17,22 @@ import json
 import os
 from typing import Any, Dict, List, Text, Optional
 
-import tensorflow as tf
+from absl import logging
 from tfx import types
 from tfx.components.pusher import executor as tfx_pusher_executor
 from tfx.types import artifact_utils, standard_component_specs
 from tfx.utils import io_utils
 
+from tfx_x.components.model import utils
+
 OUTPUT_KEY = 'output'
 MODEL_KEY = 'model'
 FUNCTION_NAME_KEY = 'function_name'
 PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+LOAD_MODE_KEY = 'load_mode'
 
 
-def noop(_model: tf.keras.Model, _pipeline_configuration: Dict[Text, Any], _output_dir: Text,
+def noop(_model: Any, _pipeline_configuration: Dict[Text, Any], _output_dir: Text,
          _model_pushed_dir: Optional[Text],
          _model_pushed_artifact: Optional[types.Artifact],
          _transform_graph_artifact: Optional[types.Artifact]):
@@ -58,7 +61,10 @@ class Executor(tfx_pusher_executor.Executor):
       output_dict: Output dict from key to a list of artifacts, including:
         - output: model export artifact.
       exec_properties: A dict of execution properties, including:
-        - function_name: The name of the function to apply on the model - noop function is used if not specified.
+        - function_name: The name of the function to apply on the model - noop function is used if not specified,
+          the model is then not loaded.
+        - load_mode: 'keras' to load the model with `tf.keras.models.load_model()` or 'saved_model' with
+          `tf.saved_model.load()` - default is what the function declares, see `utils.load_mode()`.
         - instance_name: Optional unique instance_name. Necessary iff multiple Hello components
           are declared in the same pipeline.
 
@@ -109,6 +115,10 @@ class Executor(tfx_pusher_executor.Executor):
     if fn is None:
       raise ValueError('`function_name` not found')
 
+    load_mode = exec_properties.get(LOAD_MODE_KEY)
+    if load_mode is None:
+      load_mode = utils.required_load_mode([fn])
+
     input_dir = artifact_utils.get_single_uri([model])
     output_dir = artifact_utils.get_single_uri([output])
 
@@ -116,8 +126,12 @@ class Executor(tfx_pusher_executor.Executor):
     if model_push_artifact is not None:
       model_push_dir = artifact_utils.get_single_uri([model_push_artifact])
 
+    if fn is noop:
+      logging.info('noop export function: the model is not loaded')
+      return
+
     # load the model
-    model = tf.keras.models.load_model(os.path.join(input_dir, 'Format-Serving'))
+    model = utils.load_model(os.path.join(input_dir, 'Format-Serving'), load_mode)
 
     # export
     fn(model, pipeline_configuration, output_dir, model_push_dir, model_push_artifact, transform_graph_artifact)
@@ -24,6 +24,7 @@ from tfx.dsl.io import fileio
 from tfx.types import standard_artifacts, Artifact
 
 from tfx_x import ExportedModel
+from tfx_x.components.model import utils
 from tfx_x.components.model.export import executor
 from tfx_x.components.model.export.executor import FUNCTION_NAME_KEY, MODEL_KEY, OUTPUT_KEY
 
@@ -91,6 +92,23 @@ class ExecutorTest(tf.test.TestCase):
     # Check outputs.
     self.assertTrue(fileio.exists(self._output_dir))
 
+  def testSavedModelLoadMode(self):
+    self._exec_properties[FUNCTION_NAME_KEY] = 'tfx_x.components.model.export.executor_test.signature_names'
+    exporter = executor.Executor(self._context)
+    exporter.Do(self._input_dict, self._output_dict_sr,
+                self._exec_properties)
+
+    with open(os.path.join(self._output_dir, 'signatures.json')) as f:
+      self.assertEqual(['serving_default'], json.load(f))
+
+  def testNoop(self):
+    del self._exec_properties[FUNCTION_NAME_KEY]
+    # noop does not need the model
+    fileio.rmtree(os.path.join(self._model_data_dir, 'Format-Serving'))
+    exporter = executor.Executor(self._context)
+    exporter.Do(self._input_dict, self._output_dict_sr,
+                self._exec_properties)
+
 
 def stuffs(model: tf.keras.Model, _pipeline_configuration: Dict[Text, Any], _output_dir: Text,
            _model_pushed_dir: Optional[Text], _model_push_artifact: Optional[Artifact],
@@ -98,5 +116,14 @@ def stuffs(model: tf.keras.Model, _pipeline_configuration: Dict[Text, Any], _out
   absl.logging.debug('Model signatures: %s', json.dumps(list(model.signatures.keys())))
 
 
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def signature_names(model: Any, _pipeline_configuration: Dict[Text, Any], output_dir: Text,
+                    _model_pushed_dir: Optional[Text], _model_push_artifact: Optional[Artifact],
+                    _transform_graph_artifact: Optional[Artifact]):
+  assert not isinstance(model, tf.keras.Model)
+  with open(os.path.join(output_dir, 'signatures.json'), 'w') as f:
+    json.dump(list(model.signatures.keys()), f)
+
+
 if __name__ == '__main__':
   tf.test.main()
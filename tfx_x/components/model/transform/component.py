@@ -13,7 +13,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-from typing import Optional, Text
+from typing import List, Optional, Text
 
 from tfx import types
 from tfx.dsl.components.base import base_component
@@ -22,21 +22,27 @@ from tfx.types import channel_utils
 from tfx.types import standard_artifacts
 from tfx.types.component_spec import ChannelParameter
 from tfx.types.component_spec import ExecutionParameter
+from tfx.utils import json_utils
 
 from tfx_x import PipelineConfiguration
 from tfx_x.components.model.transform import executor
 from tfx_x.components.model.transform.executor import OUTPUT_MODEL_KEY, INPUT_MODEL_KEY, FUNCTION_NAME_KEY, \
-  PIPELINE_CONFIGURATION_KEY
+  PIPELINE_CONFIGURATION_KEY, LATENCY_RUNS_KEY, FUNCTION_NAMES_KEY, LOAD_MODE_KEY, EXAMPLES_KEY, LATENCY_SPLIT_KEY
 
 
 class TransformSpec(types.ComponentSpec):
   """ComponentSpec for model Transform Component."""
 
   PARAMETERS = {
-    FUNCTION_NAME_KEY: ExecutionParameter(type=Text),
+    FUNCTION_NAME_KEY: ExecutionParameter(type=Text, optional=True),
+    FUNCTION_NAMES_KEY: ExecutionParameter(type=(str, Text), optional=True),
+    LOAD_MODE_KEY: ExecutionParameter(type=Text, optional=True),
+    LATENCY_RUNS_KEY: ExecutionParameter(type=int, optional=True),
+    LATENCY_SPLIT_KEY: ExecutionParameter(type=Text, optional=True),
   }
   INPUTS = {
     INPUT_MODEL_KEY: ChannelParameter(type=standard_artifacts.Model),
+    EXAMPLES_KEY: ChannelParameter(type=standard_artifacts.Examples, optional=True),
     PIPELINE_CONFIGURATION_KEY: ChannelParameter(type=PipelineConfiguration, optional=True),
   }
   OUTPUTS = {
@@ -56,14 +62,30 @@ class Transform(base_component.BaseComponent):
                function_name: Text = None,
                input_model: types.Channel = None,
                output_model: types.Channel = None,
-               pipeline_configuration: Optional[types.Channel] = None):
+               pipeline_configuration: Optional[types.Channel] = None,
+               latency_runs: Optional[int] = None,
+               function_names: Optional[List[Text]] = None,
+               load_mode: Optional[Text] = None,
+               examples: Optional[types.Channel] = None,
+               latency_split: Optional[Text] = None):
     """Construct a model transformation component.
 
     Args:
       function_name: The instance_name of the function to apply on the model.
+      function_names: Alternatively, the names of functions to apply one after the other on the model, with a
+        single load and a single save of the model.
+      load_mode: 'keras' or 'saved_model' to force how the model is loaded - by default it is loaded with
+        `tf.saved_model.load()` if all the functions are declared with `@utils.load_mode('saved_model')`, as a
+        Keras model otherwise.
       input_model: A Channel of type `standard_artifacts.Model`.
       pipeline_configuration: A Channel of 'PipelineConfiguration' type, usually produced by FromCustomConfig component.
       output_model: A Channel of type `standard_artifacts.Model`.
+      latency_runs: Number of calls of the serving signature of the input and output models to measure their
+        latency - default is 100 with `examples`, 0 otherwise to skip it. The latencies and the sizes of the models
+        are properties of the output model, `latency_skipped` tells why a latency is not measured.
+      examples: A Channel of type `standard_artifacts.Examples`, the serialized examples to measure the latency of
+        signatures taking them, as the usual TFX serving signature - other signatures are called on dummy inputs.
+      latency_split: The split of `examples` to use - default is 'eval'.
     """
 
     if not output_model:
@@ -72,5 +94,10 @@ class Transform(base_component.BaseComponent):
     spec = TransformSpec(function_name=function_name,
                          pipeline_configuration=pipeline_configuration,
                          input_model=input_model,
-                         output_model=output_model)
+                         output_model=output_model,
+                         latency_runs=latency_runs,
+                         function_names=None if function_names is None else json_utils.dumps(function_names),
+                         load_mode=load_mode,
+                         examples=examples,
+                         latency_split=latency_split)
     super(Transform, self).__init__(spec=spec)
@@ -13,12 +13,14 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import json
+
 import tensorflow as tf
 from tfx.types import channel_utils
 from tfx.types import standard_artifacts
 
 from tfx_x.components.model.transform import component
-from tfx_x.components.model.transform.executor import OUTPUT_MODEL_KEY
+from tfx_x.components.model.transform.executor import OUTPUT_MODEL_KEY, FUNCTION_NAMES_KEY, EXAMPLES_KEY
 
 
 def pouet(model, _pipeline_configuration):
@@ -42,6 +44,18 @@ class TransformTest(tf.test.TestCase):
     artifact_collection = this_component.outputs[OUTPUT_MODEL_KEY].get()
     self.assertIsNotNone(artifact_collection)
 
+  def testConstructWithFunctionNames(self):
+    this_component = component.Transform(function_names=['component_test.pouet', 'component_test.pouet'],
+                                         input_model=channel_utils.as_channel([standard_artifacts.Model()]))
+    self.assertEqual(['component_test.pouet', 'component_test.pouet'],
+                     json.loads(this_component.exec_properties[FUNCTION_NAMES_KEY]))
+
+  def testConstructWithExamples(self):
+    this_component = component.Transform(function_name='component_test.pouet',
+                                         input_model=channel_utils.as_channel([standard_artifacts.Model()]),
+                                         examples=channel_utils.as_channel([standard_artifacts.Examples()]))
+    self.assertEqual(standard_artifacts.Examples.TYPE_NAME, this_component.inputs[EXAMPLES_KEY].type_name)
+
 
 if __name__ == '__main__':
   tf.test.main()
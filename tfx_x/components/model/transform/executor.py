@@ -15,19 +15,40 @@
 import importlib
 import json
 import os
-from typing import Any, Dict, List, Text, Optional
+from typing import Any, Callable, Dict, List, Text, Optional, Tuple
 
 import tensorflow as tf
+from absl import logging
 from tensorflow.python.saved_model.save_options import SaveOptions
 from tfx import types
 from tfx.dsl.components.base import base_executor
 from tfx.types import artifact_utils
-from tfx.utils import io_utils
+from tfx.utils import io_utils, json_utils
+
+from tfx_x.components.model import utils
+from tfx_x.components.model.benchmark import executor as benchmark_executor
 
 OUTPUT_MODEL_KEY = 'output_model'
 INPUT_MODEL_KEY = 'input_model'
+EXAMPLES_KEY = 'examples'
 FUNCTION_NAME_KEY = 'function_name'
+FUNCTION_NAMES_KEY = 'function_names'
 PIPELINE_CONFIGURATION_KEY = 'pipeline_configuration'
+LATENCY_RUNS_KEY = 'latency_runs'
+LATENCY_SPLIT_KEY = 'latency_split'
+LOAD_MODE_KEY = 'load_mode'
+
+# properties of the output model
+INPUT_SIZE_PROPERTY = 'input_size_bytes'
+OUTPUT_SIZE_PROPERTY = 'output_size_bytes'
+INPUT_LATENCY_PROPERTY = 'input_latency_ms'
+OUTPUT_LATENCY_PROPERTY = 'output_latency_ms'
+LATENCY_SKIPPED_PROPERTY = 'latency_skipped'
+
+# the latency is only measured by default on real examples
+_LATENCY_RUNS = 0
+_LATENCY_RUNS_WITH_EXAMPLES = 100
+_LATENCY_SPLIT = 'eval'
 
 
 def identity(model: tf.keras.Model, pipeline_configuration: Dict[Text, Any]) -> (
@@ -35,6 +56,45 @@ def identity(model: tf.keras.Model, pipeline_configuration: Dict[Text, Any]) ->
   return model, None, None
 
 
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def signatures_identity(model: Any, pipeline_configuration: Dict[Text, Any]) -> (
+    Any, Dict[Text, Any], Optional[SaveOptions]):
+  """Saves the signatures of the model as they are - without its Keras metadata."""
+  return model, dict(model.signatures), None
+
+
+def _load_function(function_name: Text) -> Callable:
+  # check if function_name can be found
+  function_name_split = function_name.split('.')
+  module_name = '.'.join(function_name_split[0:-1])
+  module = importlib.import_module(module_name)
+
+  fn = getattr(module, function_name_split[-1], None)
+
+  if fn is None:
+    raise ValueError('`function_name` not found: {}'.format(function_name))
+  return fn
+
+
+def _latency(serving_dir: Text, runs: int, records: Optional[List[bytes]]) -> Tuple[Optional[float], Optional[Text]]:
+  """Median latency in ms of the serving signature of a model - or why it is not measured.
+
+  A signature taking serialized examples is called with batches of one of `records`, other ones with dummy inputs.
+  """
+  fn = tf.saved_model.load(serving_dir).signatures.get(tf.saved_model.DEFAULT_SERVING_SIGNATURE_DEF_KEY)
+  if fn is None:
+    return None, 'no serving signature'
+  if utils.takes_serialized_examples(fn):
+    if not records:
+      return None, 'the serving signature takes serialized examples and no examples are given'
+    result = benchmark_executor.run_benchmark(fn, records, batch_size=1, threads=1, num_batches=runs)
+    return result['p50_latency_ms'], None
+  try:
+    return utils.dummy_inputs_latency(fn, runs), None
+  except (tf.errors.OpError, TypeError, ValueError) as e:
+    return None, 'the serving signature cannot be called with dummy inputs: {}'.format(e)
+
+
 class Executor(base_executor.BaseExecutor):
   """Executor for Transform."""
 
@@ -49,11 +109,23 @@ class Executor(base_executor.BaseExecutor):
     Args:
       input_dict: Input dict from input key to a list of artifacts, including:
         - input_model: A list of type `standard_artifacts.Model`
+        - examples: optional `standard_artifacts.Examples` to measure the latency of the models on.
         - pipeline_configuration: optional PipelineConfiguration artifact.
       output_dict: Output dict from key to a list of artifacts, including:
         - output_model: A list of type `standard_artifacts.Model`
       exec_properties: A dict of execution properties, including:
         - function_name: The name of the function to apply on the model - identity function is used if not specified.
+          See the `quantization` and `optimization` modules for ready-to-use ones.
+        - function_names: Alternatively, the JSON list of the names of functions to apply one after the other on
+          the model, between a single load and a single save.
+        - load_mode: 'keras' to load the model with `tf.keras.models.load_model()` or 'saved_model' with
+          `tf.saved_model.load()` - default is 'saved_model' if all the functions declare they can work with it,
+          see `utils.load_mode()`.
+        - latency_runs: number of calls of the 'serving_default' signature of the input and output models to
+          measure their median latency - with one serialized example of `examples` or on dummy inputs if the
+          signature does not take serialized examples. Default is 100 with `examples`, 0 otherwise to skip the
+          measure which loads both models again. Why a latency is not measured is in `latency_skipped`.
+        - latency_split: the split of `examples` to use - default is 'eval'.
         - instance_name: Optional unique instance_name. Necessary iff multiple Hello components
           are declared in the same pipeline.
 
@@ -70,7 +142,13 @@ class Executor(base_executor.BaseExecutor):
       input_dict[INPUT_MODEL_KEY])
     output_model = artifact_utils.get_single_instance(
       output_dict[OUTPUT_MODEL_KEY])
-    function_name = exec_properties.get(FUNCTION_NAME_KEY, 'tfx_x.components.model.transform.executor.identity')
+    function_name = exec_properties.get(FUNCTION_NAME_KEY)
+    function_names = exec_properties.get(FUNCTION_NAMES_KEY)
+    latency_runs = exec_properties.get(LATENCY_RUNS_KEY)
+    latency_split = exec_properties.get(LATENCY_SPLIT_KEY) or _LATENCY_SPLIT
+    load_mode = exec_properties.get(LOAD_MODE_KEY)
+    if latency_runs is None:
+      latency_runs = _LATENCY_RUNS_WITH_EXAMPLES if input_dict.get(EXAMPLES_KEY) else _LATENCY_RUNS
 
     pipeline_configuration = {}
     if PIPELINE_CONFIGURATION_KEY in input_dict:
@@ -79,24 +157,61 @@ class Executor(base_executor.BaseExecutor):
       pipeline_configuration_str = io_utils.read_string_file(pipeline_configuration_file)
       pipeline_configuration = json.loads(pipeline_configuration_str)
 
-    # check if function_name can be found
-    function_name_split = function_name.split('.')
-    module_name = '.'.join(function_name_split[0:-1])
-    module = importlib.import_module(module_name)
-
-    fn = getattr(module, function_name_split[-1])
-
-    if fn is None:
-      raise ValueError('`function_name` not found')
+    if function_name is not None and function_names is not None:
+      raise ValueError('Only one of `function_name` and `function_names` can be given.')
+    if function_names is not None:
+      function_names = json_utils.loads(function_names)
+    elif function_name is not None:
+      function_names = [function_name]
+    else:
+      function_names = ['tfx_x.components.model.transform.executor.identity']
+
+    # all the functions and the examples are found before the model is loaded
+    fns = [_load_function(name) for name in function_names]
+    records = None
+    if input_dict.get(EXAMPLES_KEY) and latency_runs > 0:
+      records = benchmark_executor.read_examples(input_dict[EXAMPLES_KEY], latency_split, latency_runs)
+      if not records:
+        raise ValueError('No examples in split {}'.format(latency_split))
+    if load_mode is None:
+      load_mode = utils.required_load_mode(fns)
 
     input_dir = artifact_utils.get_single_uri([input_model])
     output_dir = artifact_utils.get_single_uri([output_model])
 
+    input_serving_dir = os.path.join(input_dir, 'Format-Serving')
+    output_serving_dir = os.path.join(output_dir, 'Format-Serving')
+
     # load the model
-    model = tf.keras.models.load_model(os.path.join(input_dir, 'Format-Serving'))
+    model = utils.load_model(input_serving_dir, load_mode)
 
     # transform
-    new_model, signatures, options = fn(model, pipeline_configuration)
+    signatures, options = None, None
+    for fn in fns:
+      new_model, new_signatures, new_options = fn(model, pipeline_configuration)
+      # the signatures and options of the previous functions still hold if the model is the same
+      if new_model is model:
+        new_signatures = signatures if new_signatures is None else new_signatures
+        new_options = options if new_options is None else new_options
+      model, signatures, options = new_model, new_signatures, new_options
 
     # save the model
-    tf.saved_model.save(model, os.path.join(output_dir, 'Format-Serving'), signatures, options)
+    tf.saved_model.save(model, output_serving_dir, signatures, options)
+
+    # record what the transformation changed
+    output_model.set_int_custom_property(INPUT_SIZE_PROPERTY, utils.directory_size(input_serving_dir))
+    output_model.set_int_custom_property(OUTPUT_SIZE_PROPERTY, utils.directory_size(output_serving_dir))
+    skipped = []
+    if latency_runs > 0:
+      for latency_property, serving_dir in [(INPUT_LATENCY_PROPERTY, input_serving_dir),
+                                            (OUTPUT_LATENCY_PROPERTY, output_serving_dir)]:
+        latency, reason = _latency(serving_dir, latency_runs, records)
+        if latency is None:
+          logging.warning('The latency of %s is not measured: %s', serving_dir, reason)
+          skipped.append('{}: {}'.format(latency_property, reason))
+        else:
+          output_model.set_float_custom_property(latency_property, latency)
+    else:
+      skipped.append('latency_runs is 0')
+    if skipped:
+      output_model.set_string_custom_property(LATENCY_SKIPPED_PROPERTY, '; '.join(skipped))
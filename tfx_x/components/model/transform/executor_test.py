@@ -13,16 +13,20 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import json
 import os
 import tempfile
 
 import tensorflow as tf
 from tensorflow import keras
 from tfx.dsl.io import fileio
+from tfx.types import artifact_utils
 from tfx.types import standard_artifacts
 
 from tfx_x.components.model.transform import executor
-from tfx_x.components.model.transform.executor import FUNCTION_NAME_KEY, INPUT_MODEL_KEY, OUTPUT_MODEL_KEY
+from tfx_x.components.model.transform.executor import FUNCTION_NAME_KEY, INPUT_MODEL_KEY, OUTPUT_MODEL_KEY, \
+  INPUT_SIZE_PROPERTY, OUTPUT_SIZE_PROPERTY, OUTPUT_LATENCY_PROPERTY, FUNCTION_NAMES_KEY, LATENCY_RUNS_KEY, \
+  INPUT_LATENCY_PROPERTY, LATENCY_SKIPPED_PROPERTY, EXAMPLES_KEY
 
 
 class ExecutorTest(tf.test.TestCase):
@@ -87,6 +91,117 @@ class ExecutorTest(tf.test.TestCase):
 
     # Check outputs.
     self.assertTrue(fileio.exists(self._output_model_dir))
+    self.assertGreater(self._output_model.get_int_custom_property(OUTPUT_SIZE_PROPERTY), 0)
+    # identity keeps the Keras metadata
+    self.assertIsInstance(tf.keras.models.load_model(os.path.join(self._output_model_dir, 'Format-Serving')),
+                          tf.keras.Model)
+    # the latency is not measured by default without examples
+    self.assertEqual('latency_runs is 0', self._output_model.get_string_custom_property(LATENCY_SKIPPED_PROPERTY))
+
+  def testLatencyOnExamples(self):
+    # a model with the usual TFX signature, taking serialized examples
+    model = keras.Sequential([keras.Input(shape=(1,)), keras.layers.Dense(1)])
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string, name='examples')])
+    def serve(serialized):
+      features = tf.io.parse_example(serialized, {
+        'trip_miles': tf.io.FixedLenFeature([1], tf.float32, default_value=[0.]),
+      })
+      return {'outputs': model(features['trip_miles'])}
+
+    model.save(os.path.join(self._model_data_dir, 'Format-Serving'), signatures={'serving_default': serve})
+
+    examples = standard_artifacts.Examples()
+    examples.uri = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'examples',
+                                'testdata', 'csv_example_gen')
+    examples.split_names = artifact_utils.encode_split_names(['train', 'eval', 'unlabelled'])
+    self._input_dict[EXAMPLES_KEY] = [examples]
+    self._exec_properties[FUNCTION_NAME_KEY] = 'tfx_x.components.model.transform.executor.signatures_identity'
+    self._exec_properties[LATENCY_RUNS_KEY] = 3
+
+    transformer = executor.Executor(self._context)
+    transformer.Do(self._input_dict, self._output_dict_sr, self._exec_properties)
+
+    self.assertGreater(self._output_model.get_float_custom_property(INPUT_LATENCY_PROPERTY), 0.)
+    self.assertGreater(self._output_model.get_float_custom_property(OUTPUT_LATENCY_PROPERTY), 0.)
+    self.assertFalse(self._output_model.has_custom_property(LATENCY_SKIPPED_PROPERTY))
+
+  def testLatencySkippedWithoutExamples(self):
+    module = tf.Module()
+    module.serve = tf.function(lambda examples: {'length': tf.strings.length(examples)},
+                               input_signature=[tf.TensorSpec([None], tf.string, name='examples')])
+    tf.saved_model.save(module, os.path.join(self._model_data_dir, 'Format-Serving'),
+                        signatures={'serving_default': module.serve})
+    self._exec_properties[FUNCTION_NAME_KEY] = 'tfx_x.components.model.transform.executor.signatures_identity'
+    self._exec_properties[LATENCY_RUNS_KEY] = 3
+
+    transformer = executor.Executor(self._context)
+    transformer.Do(self._input_dict, self._output_dict_sr, self._exec_properties)
+
+    self.assertFalse(self._output_model.has_custom_property(OUTPUT_LATENCY_PROPERTY))
+    self.assertIn('no examples', self._output_model.get_string_custom_property(LATENCY_SKIPPED_PROPERTY))
+
+  def testSignaturesIdentity(self):
+    expected, actual = self._transform('tfx_x.components.model.transform.executor.signatures_identity')
+    self.assertAllClose(expected, actual)
+
+  def _transform(self, function_name=None, function_names=None):
+    if function_names is not None:
+      del self._exec_properties[FUNCTION_NAME_KEY]
+      self._exec_properties[FUNCTION_NAMES_KEY] = json.dumps(function_names)
+    else:
+      self._exec_properties[FUNCTION_NAME_KEY] = function_name
+    transformer = executor.Executor(self._context)
+    transformer.Do(self._input_dict, self._output_dict_sr,
+                   self._exec_properties)
+
+    images = tf.random.uniform((4, 28, 28, 1), seed=3)
+    expected = tf.keras.models.load_model(os.path.join(self._model_data_dir, 'Format-Serving'))(images)
+    serve = tf.saved_model.load(os.path.join(self._output_model_dir, 'Format-Serving')).signatures['serving_default']
+    actual = list(serve(**{list(serve.structured_input_signature[1])[0]: images}).values())[0]
+    return expected, actual
+
+  def testFloat16Weights(self):
+    self._exec_properties[LATENCY_RUNS_KEY] = 3
+    expected, actual = self._transform('tfx_x.components.model.transform.quantization.float16_weights')
+
+    self.assertAllClose(expected, actual, atol=1e-2)
+    self.assertLess(self._output_model.get_int_custom_property(OUTPUT_SIZE_PROPERTY),
+                    self._output_model.get_int_custom_property(INPUT_SIZE_PROPERTY))
+    self.assertGreater(self._output_model.get_float_custom_property(OUTPUT_LATENCY_PROPERTY), 0.)
+
+  def testInt8Weights(self):
+    expected, actual = self._transform('tfx_x.components.model.transform.quantization.int8_weights')
+
+    self.assertAllClose(expected, actual, atol=5e-2)
+    self.assertLess(self._output_model.get_int_custom_property(OUTPUT_SIZE_PROPERTY),
+                    self._output_model.get_int_custom_property(INPUT_SIZE_PROPERTY))
+
+  def testOptimizeGraph(self):
+    expected, actual = self._transform('tfx_x.components.model.transform.optimization.optimize_graph')
+    self.assertAllClose(expected, actual, atol=1e-5)
+
+  def testOptimizeGraphWithJitCompile(self):
+    expected, actual = self._transform(
+      'tfx_x.components.model.transform.optimization.optimize_graph_with_jit_compile')
+    self.assertAllClose(expected, actual, atol=1e-5)
+
+  def testChainedFunctions(self):
+    expected, actual = self._transform(function_names=[
+      'tfx_x.components.model.transform.executor.signatures_identity',
+      'tfx_x.components.model.transform.optimization.optimize_graph',
+      'tfx_x.components.model.transform.quantization.int8_weights',
+    ])
+
+    self.assertAllClose(expected, actual, atol=5e-2)
+    self.assertLess(self._output_model.get_int_custom_property(OUTPUT_SIZE_PROPERTY),
+                    self._output_model.get_int_custom_property(INPUT_SIZE_PROPERTY))
+
+  def testFunctionNameAndFunctionNames(self):
+    self._exec_properties[FUNCTION_NAMES_KEY] = json.dumps(['tfx_x.components.model.transform.executor.identity'])
+    transformer = executor.Executor(self._context)
+    with self.assertRaises(ValueError):
+      transformer.Do(self._input_dict, self._output_dict_sr, self._exec_properties)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,136 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Frozen serving signatures, for the model transform functions which rewrite the graph."""
+
+import functools
+from typing import Any, Dict, NamedTuple, Text, Tuple
+
+import tensorflow as tf
+from tensorflow.python.framework import convert_to_constants
+
+
+class FrozenSignature(NamedTuple):
+  """A serving signature with its variables turned into constants."""
+  graph_def: tf.compat.v1.GraphDef
+  # by input name: its spec and the name of its placeholder in `graph_def`
+  inputs: Dict[Text, Tuple[tf.TensorSpec, Text]]
+  # by output name: the name of its tensor in `graph_def`
+  outputs: Dict[Text, Text]
+
+
+def _as_dict(outputs: Any) -> Dict[Text, Any]:
+  if isinstance(outputs, dict):
+    return outputs
+  return {'output_{}'.format(i): output for i, output in enumerate(tf.nest.flatten(outputs))}
+
+
+def serving_functions(model: Any) -> Dict[Text, Any]:
+  """Serving functions of a model, by signature name.
+
+  A model loaded with `tf.saved_model.load()` has its signatures, the serving function of a Keras model is traced
+  from its inputs.
+  """
+  signatures = getattr(model, 'signatures', None)
+  if signatures:
+    return dict(signatures)
+
+  if not getattr(model, 'inputs', None):
+    raise ValueError('The model has neither signatures nor inputs to trace a serving function from.')
+
+  names = list(model.input_names)
+  specs = {name: tf.TensorSpec(t.shape, t.dtype, name=name) for name, t in zip(names, model.inputs)}
+
+  @tf.function
+  def serve(**inputs):
+    if len(names) == 1:
+      return _as_dict(model(inputs[names[0]], training=False))
+    return _as_dict(model([inputs[name] for name in names], training=False))
+
+  return {tf.saved_model.DEFAULT_SERVING_SIGNATURE_DEF_KEY: serve.get_concrete_function(**specs)}
+
+
+def freeze(fn: Any) -> FrozenSignature:
+  """Freezes a serving function - with keyword inputs only, as the signatures of a SavedModel.
+
+  Only the variables are turned into constants, a function which captures other resources - such as the lookup
+  tables and assets of a TFT layer - cannot be frozen.
+  """
+  args, kwargs = fn.structured_input_signature
+  if args:
+    raise ValueError('Only functions with keyword inputs can be frozen, got {}'.format(fn.structured_input_signature))
+
+  frozen = convert_to_constants.convert_variables_to_constants_v2(fn)
+
+  # the captures which are not variables are left as placeholders after the inputs
+  captured = frozen.inputs[len(kwargs):]
+  if captured:
+    raise ValueError('Only the variables of a function can be frozen, it also captures {} - e.g. lookup tables or '
+                     'assets'.format(['{} ({})'.format(t.name, t.dtype.name) for t in captured]))
+
+  # the placeholders are in the order of the flattened input signature, by name of the inputs
+  names = sorted(kwargs)
+  inputs = {name: (kwargs[name], t.name) for name, t in zip(names, frozen.inputs)}
+  outputs = {name: t.name for name, t in _as_dict(frozen.structured_outputs).items()}
+  return FrozenSignature(graph_def=frozen.graph.as_graph_def(), inputs=inputs, outputs=outputs)
+
+
+def _serving_function(pruned: Any, names: Tuple[Text, ...], jit_compile: bool = False) -> Any:
+
+  @tf.function(jit_compile=jit_compile)
+  def serve(**inputs):
+    return pruned(*[inputs[name] for name in names])
+
+  return serve
+
+
+class ServingModule(tf.Module):
+  """A module serving frozen signatures.
+
+  Its `signatures` are the concrete functions to save, so that it can be given to another transform function as a
+  model loaded with `tf.saved_model.load()`.
+  """
+
+  def __init__(self, functions: Dict[Text, Any], signatures: Dict[Text, Any]):
+    super(ServingModule, self).__init__()
+    self.functions = functions
+    # not tracked, the functions are saved through `functions`
+    object.__setattr__(self, '_signatures', signatures)
+
+  @property
+  def signatures(self) -> Dict[Text, Any]:
+    return self._signatures
+
+
+def to_module(signatures: Dict[Text, FrozenSignature], jit_compile: bool = False) -> Tuple[tf.Module, Dict[Text, Any]]:
+  """A module serving frozen signatures, and its signatures - to give to `tf.saved_model.save()`.
+
+  With `jit_compile`, the serving functions are compiled with XLA.
+  """
+  functions = {}
+  concrete_functions = {}
+  for signature_name, signature in signatures.items():
+    wrapped = tf.compat.v1.wrap_function(functools.partial(tf.graph_util.import_graph_def, signature.graph_def,
+                                                           name=''), [])
+    names = tuple(sorted(signature.inputs))
+    pruned = wrapped.prune(
+      feeds=[wrapped.graph.get_tensor_by_name(signature.inputs[name][1]) for name in names],
+      fetches={name: wrapped.graph.get_tensor_by_name(output) for name, output in signature.outputs.items()})
+
+    functions[signature_name] = _serving_function(pruned, names, jit_compile)
+    specs = {name: tf.TensorSpec(signature.inputs[name][0].shape, signature.inputs[name][0].dtype, name=name)
+             for name in names}
+    concrete_functions[signature_name] = functions[signature_name].get_concrete_function(**specs)
+
+  return ServingModule(functions, concrete_functions), concrete_functions
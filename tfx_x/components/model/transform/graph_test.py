@@ -0,0 +1,49 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tensorflow as tf
+
+from tfx_x.components.model.transform import graph
+
+
+class GraphTest(tf.test.TestCase):
+
+  def testFreeze(self):
+    weight = tf.Variable(2.)
+
+    @tf.function
+    def serve(**inputs):
+      return {'y': inputs['x'] * weight}
+
+    frozen = graph.freeze(serve.get_concrete_function(x=tf.TensorSpec([None], tf.float32, name='x')))
+    self.assertNotIn('VarHandleOp', [node.op for node in frozen.graph_def.node])
+
+    _, signatures = graph.to_module({'serving_default': frozen})
+    self.assertAllClose([2., 4.], signatures['serving_default'](x=tf.constant([1., 2.]))['y'])
+
+  def testFreezeWithLookupTable(self):
+    table = tf.lookup.StaticHashTable(
+      tf.lookup.KeyValueTensorInitializer(tf.constant(['a', 'b']), tf.constant([1, 2], dtype=tf.int64)), -1)
+
+    @tf.function
+    def serve(**inputs):
+      return {'y': table.lookup(inputs['x'])}
+
+    with self.assertRaises(ValueError):
+      graph.freeze(serve.get_concrete_function(x=tf.TensorSpec([None], tf.string, name='x')))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,78 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Graph optimization functions for the model Transform component.
+
+The serving signatures are frozen - only the inference path of the model is kept, the variables become constants -
+and optimized by Grappler before being saved again, optionally as XLA compiled functions.
+"""
+
+from typing import Any, Dict, List, Optional, Text
+
+import tensorflow as tf
+from tensorflow.core.protobuf import meta_graph_pb2
+from tensorflow.python.grappler import tf_optimizer
+from tensorflow.python.saved_model.save_options import SaveOptions
+
+from tfx_x.components.model import utils
+from tfx_x.components.model.transform import graph
+
+OPTIMIZERS_KEY = 'grappler_optimizers'
+JIT_COMPILE_KEY = 'jit_compile'
+
+# see tensorflow/core/protobuf/rewriter_config.proto
+OPTIMIZERS = ['pruning', 'function', 'constfold', 'shape', 'arithmetic', 'layout', 'remap', 'dependency', 'loop',
+              'debug_stripper']
+
+
+def optimize(signature: graph.FrozenSignature, optimizers: List[Text]) -> graph.FrozenSignature:
+  """Runs Grappler optimizers on a frozen signature, its inputs and outputs are kept."""
+  with tf.Graph().as_default() as g:
+    tf.graph_util.import_graph_def(signature.graph_def, name='')
+    meta_graph = tf.compat.v1.train.export_meta_graph(graph_def=signature.graph_def, graph=g)
+
+  # the nodes Grappler must keep
+  fetch_collection = meta_graph_pb2.CollectionDef()
+  for tensor_name in [name for _, name in signature.inputs.values()] + list(signature.outputs.values()):
+    fetch_collection.node_list.value.append(tensor_name)
+  meta_graph.collection_def['train_op'].CopyFrom(fetch_collection)
+
+  config = tf.compat.v1.ConfigProto()
+  rewrite_options = config.graph_options.rewrite_options
+  rewrite_options.optimizers.extend(optimizers)
+  rewrite_options.min_graph_nodes = -1
+
+  return signature._replace(graph_def=tf_optimizer.OptimizeGraph(config, meta_graph))
+
+
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def optimize_graph(model: Any, pipeline_configuration: Dict[Text, Any]) -> (
+    tf.Module, Dict[Text, Any], Optional[SaveOptions]):
+  """Freezes the serving signatures of a model and optimizes them with Grappler.
+
+  The `PipelineConfiguration` can give the `grappler_optimizers` to run - default is `OPTIMIZERS` - and `jit_compile`
+  to compile the serving functions with XLA.
+  """
+  optimizers = pipeline_configuration.get(OPTIMIZERS_KEY, OPTIMIZERS)
+  signatures = {name: optimize(graph.freeze(fn), optimizers)
+                for name, fn in graph.serving_functions(model).items()}
+  module, signatures = graph.to_module(signatures, jit_compile=bool(pipeline_configuration.get(JIT_COMPILE_KEY)))
+  return module, signatures, None
+
+
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def optimize_graph_with_jit_compile(model: Any, pipeline_configuration: Dict[Text, Any]) -> (
+    tf.Module, Dict[Text, Any], Optional[SaveOptions]):
+  """`optimize_graph()` with XLA compiled serving functions."""
+  return optimize_graph(model, dict(pipeline_configuration, **{JIT_COMPILE_KEY: True}))
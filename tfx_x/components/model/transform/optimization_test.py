@@ -0,0 +1,40 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tensorflow as tf
+
+from tfx_x.components.model.transform import graph
+from tfx_x.components.model.transform import optimization
+
+
+class OptimizationTest(tf.test.TestCase):
+
+  def testOptimizeFoldsConstants(self):
+    with tf.Graph().as_default() as g:
+      x = tf.compat.v1.placeholder(tf.float32, shape=[None], name='x')
+      y = tf.identity(x * (tf.constant(2.) + tf.constant(3.)), name='y')
+    signature = graph.FrozenSignature(graph_def=g.as_graph_def(),
+                                      inputs={'x': (tf.TensorSpec([None], tf.float32), x.name)},
+                                      outputs={'y': y.name})
+
+    optimized = optimization.optimize(signature, ['constfold'])
+
+    self.assertNotIn('AddV2', [node.op for node in optimized.graph_def.node])
+    self.assertCountEqual(['x', 'y'], [node.name for node in optimized.graph_def.node
+                                       if node.name in ('x', 'y')])
+
+
+if __name__ == '__main__':
+  tf.test.main()
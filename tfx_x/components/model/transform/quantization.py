@@ -0,0 +1,128 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Post-training weight compression functions for the model Transform component.
+
+The serving signatures are frozen and their large float32 constants - the weights - are stored as float16 or int8
+and cast back to float32 in the graph. The SavedModel gets smaller, the computations are still done in float32.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Text
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.saved_model.save_options import SaveOptions
+
+from tfx_x.components.model import utils
+from tfx_x.components.model.transform import graph
+
+# constants with fewer elements - biases, shapes, ... - are kept as they are
+MIN_ELEMENTS_KEY = 'quantization_min_elements'
+_MIN_ELEMENTS = 1024
+
+
+def _const(name: Text, value: np.ndarray) -> tf.compat.v1.NodeDef:
+  node = tf.compat.v1.NodeDef(name=name, op='Const')
+  node.attr['dtype'].type = tf.as_dtype(value.dtype).as_datatype_enum
+  node.attr['value'].tensor.CopyFrom(tf.make_tensor_proto(value))
+  return node
+
+
+def _cast(name: Text, x: Text, src: tf.DType) -> tf.compat.v1.NodeDef:
+  node = tf.compat.v1.NodeDef(name=name, op='Cast', input=[x])
+  node.attr['SrcT'].type = src.as_datatype_enum
+  node.attr['DstT'].type = tf.float32.as_datatype_enum
+  node.attr['Truncate'].b = False
+  return node
+
+
+def _mul(name: Text, x: Text, y: Text) -> tf.compat.v1.NodeDef:
+  node = tf.compat.v1.NodeDef(name=name, op='Mul', input=[x, y])
+  node.attr['T'].type = tf.float32.as_datatype_enum
+  return node
+
+
+def to_float16(name: Text, value: np.ndarray) -> List[tf.compat.v1.NodeDef]:
+  """Nodes computing the float32 constant `name` from its float16 value."""
+  return [_const(name + '/float16', value.astype(np.float16)),
+          _cast(name, name + '/float16', tf.float16)]
+
+
+def to_int8(name: Text, value: np.ndarray) -> List[tf.compat.v1.NodeDef]:
+  """Nodes computing the float32 constant `name` from its symmetric int8 quantization - with a scale per output
+  channel (last axis) for matrices and kernels."""
+  axes = tuple(range(value.ndim - 1)) if value.ndim > 1 else None
+  scale = np.max(np.abs(value), axis=axes) / 127.
+  scale = np.where(scale > 0, scale, 1.).astype(np.float32)
+  quantized = np.clip(np.round(value / scale), -127, 127).astype(np.int8)
+  return [_const(name + '/int8', quantized),
+          _const(name + '/scale', scale),
+          _cast(name + '/dequantized', name + '/int8', tf.int8),
+          _mul(name, name + '/dequantized', name + '/scale')]
+
+
+def rewrite_weights(model: Any,
+                    rewrite: Callable[[Text, np.ndarray], List[tf.compat.v1.NodeDef]],
+                    min_elements: int = _MIN_ELEMENTS) -> (tf.Module, Dict[Text, Any]):
+  """Freezes the serving signatures of a model and rewrites their float32 constants of `min_elements` or more."""
+  signatures = {name: graph.freeze(fn) for name, fn in graph.serving_functions(model).items()}
+  for signature in signatures.values():
+    nodes = []
+    for node in signature.graph_def.node:
+      if node.op == 'Const' and node.attr['dtype'].type == tf.float32.as_datatype_enum:
+        value = tf.make_ndarray(node.attr['value'].tensor)
+        if value.size >= min_elements:
+          nodes.extend(rewrite(node.name, value))
+          continue
+      nodes.append(node)
+    del signature.graph_def.node[:]
+    signature.graph_def.node.extend(nodes)
+  return graph.to_module(signatures)
+
+
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def float16_weights(model: Any, pipeline_configuration: Dict[Text, Any]) -> (
+    tf.Module, Dict[Text, Any], Optional[SaveOptions]):
+  """Stores the weights of the serving signatures as float16 - half the size."""
+  module, signatures = rewrite_weights(model, to_float16, pipeline_configuration.get(MIN_ELEMENTS_KEY, _MIN_ELEMENTS))
+  return module, signatures, None
+
+
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def int8_weights(model: Any, pipeline_configuration: Dict[Text, Any]) -> (
+    tf.Module, Dict[Text, Any], Optional[SaveOptions]):
+  """Stores the weights of the serving signatures as int8 with a float32 scale per channel - a quarter of the size.
+
+  Weight-only: the weights are dequantized back to float32 in the graph and the computations are float32 ones, so the
+  model is smaller but its serving latency is not lower - the dequantization even adds a little to it.
+  """
+  module, signatures = rewrite_weights(model, to_int8, pipeline_configuration.get(MIN_ELEMENTS_KEY, _MIN_ELEMENTS))
+  return module, signatures, None
+
+
+@utils.load_mode(utils.KERAS_LOAD_MODE)
+def strip_pruning_and_clustering(model: tf.keras.Model, pipeline_configuration: Dict[Text, Any]) -> (
+    tf.keras.Model, Dict[Text, Any], Optional[SaveOptions]):
+  """Removes the pruning and clustering wrappers of a model trained with the TensorFlow Model Optimization Toolkit.
+
+  Requires `tensorflow-model-optimization` - `pip install tfx_x[tfmot]`.
+  """
+  try:
+    import tensorflow_model_optimization as tfmot
+  except ImportError:
+    raise ValueError('strip_pruning_and_clustering needs tensorflow-model-optimization: pip install tfx_x[tfmot]')
+
+  model = tfmot.sparsity.keras.strip_pruning(model)
+  model = tfmot.clustering.keras.strip_clustering(model)
+  return model, None, None
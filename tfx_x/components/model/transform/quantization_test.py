@@ -0,0 +1,48 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+
+from tfx_x.components.model.transform import quantization
+
+
+class QuantizationTest(tf.test.TestCase):
+
+  def _evaluate(self, nodes):
+    graph_def = tf.compat.v1.GraphDef()
+    graph_def.node.extend(nodes)
+    with tf.Graph().as_default() as graph:
+      tf.graph_util.import_graph_def(graph_def, name='')
+      with tf.compat.v1.Session(graph=graph) as session:
+        return session.run('w:0')
+
+  def testToFloat16(self):
+    value = np.random.RandomState(0).normal(size=(16, 8)).astype(np.float32)
+    nodes = quantization.to_float16('w', value)
+    self.assertAllClose(value, self._evaluate(nodes), atol=1e-2)
+
+  def testToInt8(self):
+    value = np.random.RandomState(0).normal(size=(3, 3, 4, 8)).astype(np.float32)
+    value[..., 0] = 0.
+    nodes = quantization.to_int8('w', value)
+    self.assertEqual(np.int8, tf.make_ndarray(nodes[0].attr['value'].tensor).dtype)
+    # a scale per output channel
+    self.assertEqual((8,), tf.make_ndarray(nodes[1].attr['value'].tensor).shape)
+    self.assertAllClose(value, self._evaluate(nodes), atol=np.abs(value).max() / 127.)
+
+
+if __name__ == '__main__':
+  tf.test.main()
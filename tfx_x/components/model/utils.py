@@ -0,0 +1,111 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Loading, size and latency of SavedModels."""
+
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Text
+
+import numpy as np
+import tensorflow as tf
+from absl import logging
+
+
+KERAS_LOAD_MODE = 'keras'
+SAVED_MODEL_LOAD_MODE = 'saved_model'
+LOAD_MODES = (KERAS_LOAD_MODE, SAVED_MODEL_LOAD_MODE)
+
+_LOAD_MODE_ATTRIBUTE = 'load_mode'
+
+
+def load_mode(mode: Text) -> Callable[[Callable], Callable]:
+  """Declares how a model transform or export function needs the model to be loaded.
+
+  With 'saved_model', the function gets the result of `tf.saved_model.load()` - its `signatures` and variables -
+  instead of the Keras model rebuilt by `tf.keras.models.load_model()`, which is slower and takes more memory. The
+  functions which do not declare it get a Keras model.
+
+    >>> @load_mode(SAVED_MODEL_LOAD_MODE)
+    >>> def transform_fn(model, pipeline_configuration):
+    >>>   ...
+  """
+  if mode not in LOAD_MODES:
+    raise ValueError('Unknown load mode: {!r} - must be one of {}'.format(mode, LOAD_MODES))
+
+  def declare(fn: Callable) -> Callable:
+    setattr(fn, _LOAD_MODE_ATTRIBUTE, mode)
+    return fn
+
+  return declare
+
+
+def required_load_mode(fns: Iterable[Callable]) -> Text:
+  """'keras' if any of the functions needs a Keras model, 'saved_model' otherwise."""
+  if all(getattr(fn, _LOAD_MODE_ATTRIBUTE, KERAS_LOAD_MODE) == SAVED_MODEL_LOAD_MODE for fn in fns):
+    return SAVED_MODEL_LOAD_MODE
+  return KERAS_LOAD_MODE
+
+
+def load_model(serving_dir: Text, mode: Text) -> Any:
+  """Loads a SavedModel as a Keras model or with `tf.saved_model.load()`."""
+  if mode not in LOAD_MODES:
+    raise ValueError('Unknown load mode: {!r} - must be one of {}'.format(mode, LOAD_MODES))
+  logging.info('Loading %s with %s.', serving_dir, mode)
+  if mode == SAVED_MODEL_LOAD_MODE:
+    return tf.saved_model.load(serving_dir)
+  return tf.keras.models.load_model(serving_dir)
+
+
+def directory_size(path: Text) -> int:
+  """Total size in bytes of the files under `path`."""
+  size = 0
+  for dirname, _, filenames in tf.io.gfile.walk(path):
+    for filename in filenames:
+      size += tf.io.gfile.stat(os.path.join(dirname, filename)).length
+  return size
+
+
+def dummy_inputs(fn: Any, batch_size: int = 1) -> Dict[Text, tf.Tensor]:
+  """Inputs of zeros for a signature with numeric inputs, the unknown dimensions are `batch_size`."""
+  _, specs = fn.structured_input_signature
+  inputs = {}
+  for name, spec in specs.items():
+    if spec.dtype == tf.string:
+      raise ValueError('No dummy value for the string input {} of the signature'.format(name))
+    shape = [batch_size if dim is None else dim for dim in spec.shape.as_list()]
+    inputs[name] = tf.zeros(shape, dtype=spec.dtype)
+  return inputs
+
+
+def takes_serialized_examples(fn: Any) -> bool:
+  """Whether a signature takes a single batch of strings - serialized examples, as the usual TFX signatures."""
+  _, specs = fn.structured_input_signature
+  return len(specs) == 1 and list(specs.values())[0].dtype == tf.string
+
+
+def dummy_inputs_latency(fn: Any, runs: int) -> float:
+  """Median latency in ms of `runs` calls of a signature on the inputs of `dummy_inputs()`.
+
+  Raises:
+    ValueError, TypeError or tf.errors.OpError when the signature cannot be called with them.
+  """
+  inputs = dummy_inputs(fn)
+  fn(**inputs)  # warm up
+  latencies = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    fn(**inputs)
+    latencies.append((time.perf_counter() - start) * 1000.)
+  return float(np.median(latencies))
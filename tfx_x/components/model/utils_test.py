@@ -0,0 +1,73 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tensorflow as tf
+
+from tfx_x.components.model import utils
+
+
+def keras_fn(model, _pipeline_configuration):
+  return model, None, None
+
+
+@utils.load_mode(utils.SAVED_MODEL_LOAD_MODE)
+def saved_model_fn(model, _pipeline_configuration):
+  return model, None, None
+
+
+class UtilsTest(tf.test.TestCase):
+
+  def testRequiredLoadMode(self):
+    self.assertEqual(utils.SAVED_MODEL_LOAD_MODE, utils.required_load_mode([saved_model_fn]))
+    # the functions which do not declare a mode need Keras
+    self.assertEqual(utils.KERAS_LOAD_MODE, utils.required_load_mode([saved_model_fn, keras_fn]))
+
+  def testUnknownLoadMode(self):
+    with self.assertRaises(ValueError):
+      utils.load_mode('pickle')
+
+  def testDirectorySize(self):
+    path = self.get_temp_dir()
+    tf.io.gfile.makedirs(path + '/a/b')
+    with tf.io.gfile.GFile(path + '/a/b/c', 'w') as f:
+      f.write('12345')
+    with tf.io.gfile.GFile(path + '/d', 'w') as f:
+      f.write('123')
+    self.assertEqual(8, utils.directory_size(path))
+
+  def _signatures(self):
+    module = tf.Module()
+    module.strings = tf.function(lambda examples: {'length': tf.strings.length(examples)},
+                                 input_signature=[tf.TensorSpec([None], tf.string, name='examples')])
+    module.floats = tf.function(lambda x: {'y': x * 2.},
+                                input_signature=[tf.TensorSpec([None, 3], tf.float32, name='x')])
+    path = self.get_temp_dir() + '/model'
+    tf.saved_model.save(module, path, signatures={'strings': module.strings, 'floats': module.floats})
+    return tf.saved_model.load(path).signatures
+
+  def testTakesSerializedExamples(self):
+    signatures = self._signatures()
+    self.assertTrue(utils.takes_serialized_examples(signatures['strings']))
+    self.assertFalse(utils.takes_serialized_examples(signatures['floats']))
+
+  def testDummyInputsLatency(self):
+    signatures = self._signatures()
+    self.assertGreater(utils.dummy_inputs_latency(signatures['floats'], 3), 0.)
+    with self.assertRaises(ValueError):
+      utils.dummy_inputs_latency(signatures['strings'], 3)
+
+
+if __name__ == '__main__':
+  tf.test.main()
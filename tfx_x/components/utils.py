@@ -17,39 +17,457 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import concurrent.futures
+import contextlib
+import gzip
+import io
+import json
 import os
+import struct
+import time
+import zlib
 
 from absl import logging
 import apache_beam as beam
+import numpy as np
 import tensorflow as tf
-from typing import Any, Dict, Mapping, List, Text
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Mapping, List, NamedTuple, Optional, Sequence, Text, \
+  Tuple
 
 from tfx import types
 from tfx.dsl.components.base import base_executor
 from tfx.types import artifact_utils, Artifact
+from tfx.types import standard_artifacts
 from tfx.utils import io_utils
 
+from tfx_x.components.examples import writer
 
-def copy_over(input_artifact, output_artifact, splits_to_copy):
+_COPY_MAX_WORKERS = 16
+_COPY_RETRIES = 3
+_COPY_RETRY_DELAY_SECONDS = 0.5
+
+COPY_MODE = 'copy'
+LINK_MODE = 'link'
+REFERENCE_MODE = 'reference'
+COPY_MODES = (COPY_MODE, LINK_MODE, REFERENCE_MODE)
+
+# file of a split which points to the files of another split
+SPLIT_REFERENCE_FILE = 'split_reference.json'
+_MAX_REFERENCE_DEPTH = 16
+
+# manifest of the index of a split, in the split of an ExamplesIndex artifact
+INDEX_MANIFEST_FILE = 'index.json'
+_INDEX_FILE_SUFFIX = '.index.npz'
+# a TFRecord is: length (uint64), masked crc32c of the length (uint32), data, masked crc32c of the data (uint32)
+_TFRECORD_HEADER_BYTES = 12
+_TFRECORD_FOOTER_BYTES = 4
+_READ_CHUNK_BYTES = 1 << 20
+
+
+class CopyStats(NamedTuple):
+  """What `copy_over` copied - `bytes` only counts the bytes actually copied, not the linked ones."""
+  files: int
+  bytes: int
+  seconds: float
+
+  @property
+  def bytes_per_second(self) -> float:
+    return self.bytes / self.seconds if self.seconds > 0 else 0.
+
+
+def _copy_file(src: Text, dst: Text, retries: int) -> int:
+  """Copies a file, retrying on errors. Returns its size."""
+  for attempt in range(retries + 1):
+    try:
+      io_utils.copy_file(src=src, dst=dst, overwrite=True)
+      return tf.io.gfile.stat(dst).length
+    except (IOError, OSError, tf.errors.OpError) as e:
+      if attempt == retries:
+        raise
+      logging.warning('Copy of %s to %s failed (%s), retrying.', src, dst, e)
+      time.sleep(_COPY_RETRY_DELAY_SECONDS * 2 ** attempt)
+
+
+def _is_local(path: Text) -> bool:
+  return '://' not in path
+
+
+def link_file(src: Text, dst: Text, retries: int = _COPY_RETRIES) -> int:
+  """Hard links a file, or copies it when it cannot be linked. Returns the number of bytes copied."""
+  if _is_local(src) and _is_local(dst):
+    try:
+      if os.path.lexists(dst):
+        os.remove(dst)
+      os.link(src, dst)
+      return 0
+    except OSError as e:
+      logging.info('Cannot link %s to %s (%s), copying it.', src, dst, e)
+  return _copy_file(src, dst, retries)
+
+
+def resolve_split_uri(split_uri: Text) -> Text:
+  """Location of the files of a split, following the reference left by `copy_over` in 'reference' mode.
+  Args:
+    split_uri: the uri of the split, from `artifact_utils.get_split_uri()`.
+  Returns:
+    the uri of the directory with the files of the split.
+  """
+  for _ in range(_MAX_REFERENCE_DEPTH):
+    reference_file = os.path.join(split_uri, SPLIT_REFERENCE_FILE)
+    if not tf.io.gfile.exists(reference_file):
+      return split_uri
+    split_uri = json.loads(io_utils.read_string_file(reference_file))['uri']
+  raise ValueError('Too many levels of split references from {}'.format(split_uri))
+
+
+def file_fingerprint(path: Text) -> Dict[Text, int]:
+  """Cheap fingerprint of a file - its size and modification time - to tell if it changed."""
+  stat = tf.io.gfile.stat(path)
+  return {'size': stat.length, 'mtime_nsec': stat.mtime_nsec}
+
+
+def check_copy_mode(copy_mode: Text, output_artifact: Artifact) -> None:
+  """Checks that splits can be passed through to `output_artifact` with `copy_mode`.
+
+  A referenced split only holds a `split_reference.json` file: the standard TFX components and the other TFXIO
+  readers would read it as an empty split, so 'reference' is refused for `Examples` outputs.
+  """
+  if copy_mode not in COPY_MODES:
+    raise ValueError('Unsupported copy mode: {} - must be one of {}'.format(copy_mode, COPY_MODES))
+  if copy_mode == REFERENCE_MODE and output_artifact.type_name == standard_artifacts.Examples.TYPE_NAME:
+    raise ValueError('Copy mode \'{}\' is not supported for Examples - the standard components cannot read '
+                     'referenced splits, use \'{}\' instead.'.format(REFERENCE_MODE, LINK_MODE))
+
+
+def copy_over(input_artifact, output_artifact, splits_to_copy,
+              max_workers: int = _COPY_MAX_WORKERS,
+              retries: int = _COPY_RETRIES,
+              copy_mode: Text = COPY_MODE) -> CopyStats:
   """
   Copy data from specified splits
   Args:
     input_artifact: location where the input splits are
     output_artifact: location where to copy them
     splits_to_copy: list of split names to copy
+    max_workers: number of files copied concurrently
+    retries: number of times the copy of a file is retried before giving up
+    copy_mode: 'copy' (default) to copy the files, 'link' to hard link them - files which cannot be linked,
+      e.g. on another filesystem, are copied - or 'reference' to only write a reference to the input split,
+      in which case the split must be read from `resolve_split_uri()` - not for `Examples`, see `check_copy_mode()`.
   Returns:
-    None
+    the number of files and bytes copied and how long it took
   """
+  check_copy_mode(copy_mode, output_artifact)
+
+  start = time.time()
   split_to_instance = {}
 
   for split in splits_to_copy:
     uri = artifact_utils.get_split_uri(input_artifact, split)
     split_to_instance[split] = uri
 
+  copies = []
   for split, instance in split_to_instance.items():
-    input_dir = instance
+    input_dir = resolve_split_uri(instance)
     output_dir = artifact_utils.get_split_uri([output_artifact], split)
+    tf.io.gfile.makedirs(output_dir)
+    if copy_mode == REFERENCE_MODE:
+      io_utils.write_string_file(os.path.join(output_dir, SPLIT_REFERENCE_FILE), json.dumps({'uri': input_dir}))
+      continue
     for filename in tf.io.gfile.listdir(input_dir):
       input_uri = os.path.join(input_dir, filename)
       output_uri = os.path.join(output_dir, filename)
-      io_utils.copy_file(src=input_uri, dst=output_uri, overwrite=True)
+      copies.append((input_uri, output_uri))
+
+  total_bytes = 0
+  if copies:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(copies)))) as pool:
+      copy_file = link_file if copy_mode == LINK_MODE else _copy_file
+      futures = [pool.submit(copy_file, src, dst, retries) for src, dst in copies]
+      for future in concurrent.futures.as_completed(futures):
+        total_bytes += future.result()
+
+  stats = CopyStats(files=len(copies), bytes=total_bytes, seconds=time.time() - start)
+  if copies:
+    logging.info('Copied (%s) %d files (%d bytes) of splits %s in %.2fs - %.1f MB/s.', copy_mode, stats.files,
+                 stats.bytes, list(split_to_instance), stats.seconds, stats.bytes_per_second / 1e6)
+  return stats
+
+
+@contextlib.contextmanager
+def copying_over(input_artifact, output_artifact, splits_to_copy, **kwargs) -> Iterator[concurrent.futures.Future]:
+  """
+  Copy data from specified splits in the background, while the body of the `with` statement runs.
+
+  Leaving the `with` statement waits for the copy to be done, and raises its error if it failed - unless the
+  body itself raised.
+  Args:
+    input_artifact: location where the input splits are
+    output_artifact: location where to copy them
+    splits_to_copy: list of split names to copy
+    **kwargs: other arguments of `copy_over()`
+  Returns:
+    the future of the `CopyStats` of the copy
+  """
+  check_copy_mode(kwargs.get('copy_mode', COPY_MODE), output_artifact)
+
+  pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+  try:
+    future = pool.submit(copy_over, input_artifact, output_artifact, splits_to_copy, **kwargs)
+    yield future
+  finally:
+    pool.shutdown(wait=True)
+  future.result()
+
+
+class _ZlibReader(object):
+  """Minimal file-like reading of a zlib stream - what Beam calls DEFLATE."""
+
+  def __init__(self, f: BinaryIO):
+    self._f = f
+    self._decompressor = zlib.decompressobj()
+    self._buffer = bytearray()
+
+  def read(self, n: int) -> bytes:
+    while len(self._buffer) < n:
+      chunk = self._f.read(_READ_CHUNK_BYTES)
+      if not chunk:
+        self._buffer += self._decompressor.flush()
+        break
+      self._buffer += self._decompressor.decompress(chunk)
+    data = bytes(self._buffer[:n])
+    del self._buffer[:n]
+    return data
+
+
+@contextlib.contextmanager
+def _open_records(path: Text) -> Iterator[BinaryIO]:
+  """Opens a TFRecord file, decompressing it according to its suffix."""
+  with tf.io.gfile.GFile(path, 'rb') as f:
+    compression = writer.file_compression(path)
+    if compression == writer.COMPRESSION_GZIP:
+      with gzip.GzipFile(fileobj=f, mode='rb') as stream:
+        yield stream
+    elif compression == writer.COMPRESSION_ZLIB:
+      yield _ZlibReader(f)
+    else:
+      yield f
+
+
+def _skip(stream: BinaryIO, n: int) -> None:
+  while n > 0:
+    skipped = len(stream.read(min(n, _READ_CHUNK_BYTES)))
+    if not skipped:
+      raise ValueError('Unexpected end of TFRecord file.')
+    n -= skipped
+
+
+def _read_record(stream: BinaryIO, with_data: bool = True, seekable: bool = False) \
+    -> Optional[Tuple[int, Optional[bytes]]]:
+  """Reads the next record of a stream, returns its length and data - None at the end of the stream.
+
+  Without `with_data`, the data is skipped - with a seek if the stream is `seekable`. The checksums are not verified.
+  """
+  header = stream.read(_TFRECORD_HEADER_BYTES)
+  if not header:
+    return None
+  if len(header) < _TFRECORD_HEADER_BYTES:
+    raise ValueError('Truncated TFRecord header.')
+  length = struct.unpack('<Q', header[:8])[0]
+  if not with_data:
+    if seekable:
+      stream.seek(length + _TFRECORD_FOOTER_BYTES, io.SEEK_CUR)
+    else:
+      _skip(stream, length + _TFRECORD_FOOTER_BYTES)
+    return length, None
+  data = stream.read(length + _TFRECORD_FOOTER_BYTES)
+  if len(data) < length + _TFRECORD_FOOTER_BYTES:
+    raise ValueError('Truncated TFRecord.')
+  return length, data[:length]
+
+
+def read_tfrecord_file(path: Text) -> Iterator[bytes]:
+  """Records of a TFRecord file, decompressed according to its suffix."""
+  with _open_records(path) as stream:
+    while True:
+      record = _read_record(stream)
+      if record is None:
+        return
+      yield record[1]
+
+
+def index_tfrecord_file(path: Text,
+                        to_key: Optional[Callable[[bytes], Text]] = None) -> Tuple[np.ndarray, np.ndarray,
+                                                                                  Optional[np.ndarray]]:
+  """Offsets and lengths of the records of a TFRecord file, and their keys if `to_key` is given.
+
+  The offsets are in the uncompressed stream. Without `to_key`, the records of an uncompressed file are not read,
+  only their headers.
+  """
+  offsets = []
+  lengths = []
+  keys = [] if to_key is not None else None
+  offset = 0
+  seekable = writer.file_compression(path) == writer.COMPRESSION_NONE
+  with _open_records(path) as stream:
+    while True:
+      record = _read_record(stream, with_data=to_key is not None, seekable=seekable)
+      if record is None:
+        break
+      length, data = record
+      offsets.append(offset)
+      lengths.append(length)
+      if to_key is not None:
+        keys.append(to_key(data))
+      offset += _TFRECORD_HEADER_BYTES + length + _TFRECORD_FOOTER_BYTES
+  return (np.array(offsets, dtype=np.int64),
+          np.array(lengths, dtype=np.int64),
+          None if keys is None else np.array(keys, dtype=np.str_))
+
+
+def read_records_at(path: Text, offsets: Sequence[int]) -> List[bytes]:
+  """Records of a TFRecord file at given offsets - see `index_tfrecord_file()` - in the same order.
+
+  Uncompressed files are read with positional reads. Compressed ones cannot be: they are decompressed from the start,
+  in a single pass which skips the records in between and stops after the last one asked.
+  """
+  records = {}
+  with _open_records(path) as stream:
+    seekable = writer.file_compression(path) == writer.COMPRESSION_NONE
+    position = 0
+    for offset in sorted(set(offsets)):
+      if seekable:
+        stream.seek(offset)
+      else:
+        _skip(stream, offset - position)
+      record = _read_record(stream)
+      if record is None:
+        raise ValueError('No record at offset {} of {}'.format(offset, path))
+      length, records[offset] = record
+      position = offset + _TFRECORD_HEADER_BYTES + length + _TFRECORD_FOOTER_BYTES
+  return [records[offset] for offset in offsets]
+
+
+class ShardIndex(NamedTuple):
+  """Index of a TFRecord file."""
+  path: Text
+  offsets: np.ndarray
+  lengths: np.ndarray
+  # the key of each record, if the index has a key column
+  keys: Optional[np.ndarray] = None
+
+
+class SplitIndex(NamedTuple):
+  """Index of the files of a split, records are numbered in the order of the shards."""
+  shards: List[ShardIndex]
+
+  @property
+  def num_records(self) -> int:
+    return sum(len(shard.offsets) for shard in self.shards)
+
+  @property
+  def keys(self) -> Optional[np.ndarray]:
+    """The key of each record of the split, if the index has a key column."""
+    if not self.shards or any(shard.keys is None for shard in self.shards):
+      return None
+    return np.concatenate([shard.keys for shard in self.shards])
+
+  @property
+  def lengths(self) -> np.ndarray:
+    """The length of each record of the split."""
+    return np.concatenate([shard.lengths for shard in self.shards] + [np.zeros(0, dtype=np.int64)])
+
+  def locate(self, positions: Sequence[int]) -> Dict[int, List[Tuple[int, int]]]:
+    """(position, offset) of records of the split, by shard."""
+    starts = np.cumsum([0] + [len(shard.offsets) for shard in self.shards])
+    by_shard = {}
+    for position in positions:
+      if position < 0 or position >= starts[-1]:
+        raise ValueError('No record {} in an index of {} records.'.format(position, starts[-1]))
+      shard = int(np.searchsorted(starts, position, side='right')) - 1
+      by_shard.setdefault(shard, []).append((position, int(self.shards[shard].offsets[position - starts[shard]])))
+    return by_shard
+
+
+def write_shard_index(index_dir: Text, shard_path: Text, offsets: np.ndarray, lengths: np.ndarray,
+                      keys: Optional[np.ndarray], fingerprint: Optional[Dict[Text, int]] = None) -> Dict[Text, Any]:
+  """Writes the index of a TFRecord file to `index_dir`. Returns its entry in the manifest of the split.
+
+  `fingerprint` is the `file_fingerprint()` of the file, taken before it was indexed - its current one by default.
+  """
+  if fingerprint is None:
+    fingerprint = file_fingerprint(shard_path)
+  arrays = {'offsets': offsets, 'lengths': lengths}
+  if keys is not None:
+    arrays['keys'] = keys
+  buffer = io.BytesIO()
+  np.savez(buffer, **arrays)
+  index_file = os.path.basename(shard_path) + _INDEX_FILE_SUFFIX
+  tf.io.gfile.makedirs(index_dir)
+  with tf.io.gfile.GFile(os.path.join(index_dir, index_file), 'wb') as f:
+    f.write(buffer.getvalue())
+  return {'path': shard_path, 'index': index_file, 'records': len(offsets), 'keys': keys is not None,
+          'fingerprint': fingerprint}
+
+
+def write_split_index_manifest(index_dir: Text, shards: List[Dict[Text, Any]]) -> None:
+  io_utils.write_string_file(os.path.join(index_dir, INDEX_MANIFEST_FILE),
+                             json.dumps({'shards': sorted(shards, key=lambda shard: shard['path'])}))
+
+
+def check_shard_index(shard: Mapping[Text, Any]) -> None:
+  """Raises a ValueError if the file of an entry of a manifest changed since it was indexed."""
+  path = shard['path']
+  if not tf.io.gfile.exists(path):
+    raise ValueError('The indexed file {} does not exist anymore, the index must be built again.'.format(path))
+  if shard.get('fingerprint') != file_fingerprint(path):
+    raise ValueError('The indexed file {} changed since it was indexed, the index must be built again.'.format(path))
+
+
+def read_index_manifest(index_artifact: Artifact, split_name: Text) -> List[Dict[Text, Any]]:
+  """Entries of the shards of the index of a split - checked against their files, see `check_shard_index()`.
+
+  Only the manifest is read, not the indexes of the shards - see `load_shard_index()`.
+  """
+  index_dir = artifact_utils.get_split_uri([index_artifact], split_name)
+  shards = json.loads(io_utils.read_string_file(os.path.join(index_dir, INDEX_MANIFEST_FILE)))['shards']
+  for shard in shards:
+    check_shard_index(shard)
+  return shards
+
+
+def load_shard_index(index_dir: Text, shard: Mapping[Text, Any]) -> ShardIndex:
+  """Loads the index of a file from its entry in the manifest of the split."""
+  with tf.io.gfile.GFile(os.path.join(index_dir, shard['index']), 'rb') as f:
+    arrays = np.load(io.BytesIO(f.read()), allow_pickle=False)
+    return ShardIndex(path=shard['path'],
+                      offsets=arrays['offsets'],
+                      lengths=arrays['lengths'],
+                      keys=arrays['keys'] if 'keys' in arrays else None)
+
+
+def load_examples_index(index_artifact: Artifact, split_name: Text) -> SplitIndex:
+  """Loads the index of a split of an ExamplesIndex artifact, in memory - see `read_index_manifest()`."""
+  index_dir = artifact_utils.get_split_uri([index_artifact], split_name)
+  return SplitIndex(shards=[load_shard_index(index_dir, shard)
+                            for shard in read_index_manifest(index_artifact, split_name)])
+
+
+def read_indexed_records(split_index: SplitIndex, positions: Sequence[int], max_workers: int = _COPY_MAX_WORKERS) \
+    -> List[bytes]:
+  """Records of a split at given positions - their numbers in `split_index` - in the same order.
+
+  The shards are read concurrently, see `read_records_at()`.
+  """
+  by_shard = split_index.locate(positions)
+
+  def read_shard(shard: int) -> Dict[int, bytes]:
+    shard_positions, offsets = zip(*by_shard[shard])
+    return dict(zip(shard_positions, read_records_at(split_index.shards[shard].path, offsets)))
+
+  records = {}
+  if by_shard:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_shard)))) as pool:
+      for shard_records in pool.map(read_shard, list(by_shard)):
+        records.update(shard_records)
+  return [records[position] for position in positions]
@@ -0,0 +1,228 @@
+# Lint as: python3
+#  Copyright 2021 ssoudan. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+from unittest import mock
+
+import tensorflow as tf
+from tfx import types
+from tfx.types import artifact_utils
+from tfx.types import standard_artifacts
+from tfx.utils import io_utils
+
+from tfx_x.components import utils
+
+
+class _Splits(types.Artifact):
+  """Artifact with splits which are not read as `Examples`."""
+  TYPE_NAME = 'tfx_x.test.Splits'
+
+
+class UtilsTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(UtilsTest, self).setUp()
+    self._source_data_dir = os.path.join(os.path.dirname(__file__), 'examples', 'testdata')
+    self._output_data_dir = os.path.join(
+      os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+      self._testMethodName)
+
+    self._examples = standard_artifacts.Examples()
+    self._examples.uri = os.path.join(self._source_data_dir, 'csv_example_gen')
+    self._examples.split_names = artifact_utils.encode_split_names(['train', 'eval', 'unlabelled'])
+
+    self._output = standard_artifacts.Examples()
+    self._output.uri = self._output_data_dir
+
+  def _files(self, artifact, split):
+    split_dir = artifact_utils.get_split_uri([artifact], split)
+    return {f: io_utils.read_bytes_file(os.path.join(split_dir, f)) for f in tf.io.gfile.listdir(split_dir)}
+
+  def testCopyOver(self):
+    stats = utils.copy_over([self._examples], self._output, ['train', 'eval'], max_workers=4)
+
+    expected_bytes = 0
+    for split in ['train', 'eval']:
+      files = self._files(self._examples, split)
+      self.assertEqual(files, self._files(self._output, split))
+      expected_bytes += sum(len(content) for content in files.values())
+    self.assertFalse(tf.io.gfile.exists(artifact_utils.get_split_uri([self._output], 'unlabelled')))
+
+    self.assertEqual(len(self._files(self._examples, 'train')) + len(self._files(self._examples, 'eval')),
+                     stats.files)
+    self.assertEqual(expected_bytes, stats.bytes)
+
+  def testCopyOverNothing(self):
+    stats = utils.copy_over([self._examples], self._output, [])
+    self.assertEqual(0, stats.files)
+
+  def testCopyOverRetries(self):
+    copy_file = io_utils.copy_file
+    failures = []
+
+    def flaky_copy_file(src, dst, overwrite=False):
+      if not failures:
+        failures.append(src)
+        raise IOError('transient failure')
+      copy_file(src, dst, overwrite)
+
+    with mock.patch.object(utils, '_COPY_RETRY_DELAY_SECONDS', 0.), \
+        mock.patch.object(io_utils, 'copy_file', side_effect=flaky_copy_file):
+      utils.copy_over([self._examples], self._output, ['eval'], retries=1)
+
+    self.assertLen(failures, 1)
+    self.assertEqual(self._files(self._examples, 'eval'), self._files(self._output, 'eval'))
+
+  def testCopyOverGivesUp(self):
+    with mock.patch.object(utils, '_COPY_RETRY_DELAY_SECONDS', 0.), \
+        mock.patch.object(io_utils, 'copy_file', side_effect=IOError('permanent failure')):
+      with self.assertRaises(IOError):
+        utils.copy_over([self._examples], self._output, ['eval'], retries=2)
+
+  def testCopyOverLink(self):
+    stats = utils.copy_over([self._examples], self._output, ['eval'], copy_mode=utils.LINK_MODE)
+
+    self.assertEqual(self._files(self._examples, 'eval'), self._files(self._output, 'eval'))
+    self.assertEqual(0, stats.bytes)
+    input_dir = artifact_utils.get_split_uri([self._examples], 'eval')
+    output_dir = artifact_utils.get_split_uri([self._output], 'eval')
+    for filename in tf.io.gfile.listdir(input_dir):
+      self.assertTrue(os.path.samefile(os.path.join(input_dir, filename), os.path.join(output_dir, filename)))
+
+  def testCopyOverReference(self):
+    output = _Splits()
+    output.uri = self._output_data_dir
+    stats = utils.copy_over([self._examples], output, ['eval'], copy_mode=utils.REFERENCE_MODE)
+
+    self.assertEqual(0, stats.files)
+    output_dir = artifact_utils.get_split_uri([output], 'eval')
+    self.assertEqual([utils.SPLIT_REFERENCE_FILE], tf.io.gfile.listdir(output_dir))
+    self.assertEqual(artifact_utils.get_split_uri([self._examples], 'eval'), utils.resolve_split_uri(output_dir))
+
+    # a copy of a referenced split is a copy of the referenced files
+    copy = standard_artifacts.Examples()
+    copy.uri = os.path.join(self._output_data_dir, 'copy')
+    utils.copy_over([output], copy, ['eval'])
+    self.assertEqual(self._files(self._examples, 'eval'), self._files(copy, 'eval'))
+
+  def testCopyOverReferenceRefusedForExamples(self):
+    # the standard components would read the referenced split as empty
+    with self.assertRaises(ValueError):
+      utils.copy_over([self._examples], self._output, ['eval'], copy_mode=utils.REFERENCE_MODE)
+    with self.assertRaises(ValueError):
+      with utils.copying_over([self._examples], self._output, ['eval'], copy_mode=utils.REFERENCE_MODE):
+        pass
+    self.assertFalse(tf.io.gfile.exists(artifact_utils.get_split_uri([self._output], 'eval')))
+
+  def testResolveSplitUriWithoutReference(self):
+    split_uri = artifact_utils.get_split_uri([self._examples], 'eval')
+    self.assertEqual(split_uri, utils.resolve_split_uri(split_uri))
+
+  def testCopyOverUnknownMode(self):
+    with self.assertRaises(ValueError):
+      utils.copy_over([self._examples], self._output, ['eval'], copy_mode='teleport')
+
+  def testCopyingOver(self):
+    with utils.copying_over([self._examples], self._output, ['eval']) as copy:
+      # something else runs meanwhile
+      pass
+    self.assertTrue(copy.done())
+    self.assertEqual(self._files(self._examples, 'eval'), self._files(self._output, 'eval'))
+
+  def testCopyingOverRaisesCopyError(self):
+    with mock.patch.object(io_utils, 'copy_file', side_effect=IOError('permanent failure')):
+      with self.assertRaises(IOError):
+        with utils.copying_over([self._examples], self._output, ['eval'], retries=0):
+          pass
+
+  def testCopyingOverRaisesBodyError(self):
+    with self.assertRaisesRegex(RuntimeError, 'pipeline failed'):
+      with utils.copying_over([self._examples], self._output, ['eval']) as copy:
+        raise RuntimeError('pipeline failed')
+    # the copy is not left running
+    self.assertTrue(copy.done())
+
+  def _write_records(self, filename, records, compression_type=''):
+    path = os.path.join(self._output_data_dir, filename)
+    tf.io.gfile.makedirs(self._output_data_dir)
+    with tf.io.TFRecordWriter(path, options=compression_type) as w:
+      for record in records:
+        w.write(record)
+    return path
+
+  def testIndexAndReadRecords(self):
+    records = [('record-%d' % i).encode('utf-8') * (i % 7 + 1) for i in range(50)]
+    for filename, compression_type in [('records', ''), ('records.gz', 'GZIP'), ('records.deflate', 'ZLIB')]:
+      path = self._write_records(filename, records, compression_type)
+
+      offsets, lengths, keys = utils.index_tfrecord_file(path)
+      self.assertIsNone(keys)
+      self.assertEqual([len(record) for record in records], list(lengths))
+
+      positions = [42, 3, 17, 3, 0, 49]
+      self.assertEqual([records[i] for i in positions], utils.read_records_at(path, [offsets[i] for i in positions]))
+
+  def testIndexRecordsWithKeys(self):
+    records = [b'a1', b'b1', b'a2']
+    path = self._write_records('records.gz', records, 'GZIP')
+
+    _, _, keys = utils.index_tfrecord_file(path, to_key=lambda record: record[:1].decode('utf-8'))
+    self.assertEqual(['a', 'b', 'a'], list(keys))
+
+  def testReadIndexedRecords(self):
+    index = standard_artifacts.Examples()
+    index.uri = os.path.join(self._output_data_dir, 'index')
+    index_dir = artifact_utils.get_split_uri([index], 'train')
+    shards = []
+    records = []
+    for shard in range(3):
+      shard_records = [('shard-%d-%d' % (shard, i)).encode('utf-8') for i in range(10 + shard)]
+      records.extend(shard_records)
+      path = self._write_records('records-%d.gz' % shard, shard_records, 'GZIP')
+      offsets, lengths, keys = utils.index_tfrecord_file(path, to_key=lambda record: str(shard))
+      shards.append(utils.write_shard_index(index_dir, path, offsets, lengths, keys))
+    utils.write_split_index_manifest(index_dir, shards)
+
+    split_index = utils.load_examples_index(index, 'train')
+    self.assertEqual(len(records), split_index.num_records)
+    self.assertEqual(['0'] * 10 + ['1'] * 11 + ['2'] * 12, list(split_index.keys))
+
+    positions = [32, 0, 10, 9, 21, 10]
+    self.assertEqual([records[i] for i in positions], utils.read_indexed_records(split_index, positions))
+
+  def testStaleIndex(self):
+    index = standard_artifacts.Examples()
+    index.uri = os.path.join(self._output_data_dir, 'stale_index')
+    index_dir = artifact_utils.get_split_uri([index], 'train')
+    path = self._write_records('records', [b'a', b'b'])
+    offsets, lengths, keys = utils.index_tfrecord_file(path)
+    utils.write_split_index_manifest(index_dir, [utils.write_shard_index(index_dir, path, offsets, lengths, keys)])
+    self.assertLen(utils.read_index_manifest(index, 'train'), 1)
+
+    # the file is written again after it was indexed
+    self._write_records('records', [b'c', b'dd', b'e'])
+    with self.assertRaises(ValueError):
+      utils.read_index_manifest(index, 'train')
+    with self.assertRaises(ValueError):
+      utils.load_examples_index(index, 'train')
+
+  def testReadIndexedRecordsOutOfRange(self):
+    split_index = utils.SplitIndex(shards=[])
+    with self.assertRaises(ValueError):
+      utils.read_indexed_records(split_index, [0])
+
+
+if __name__ == '__main__':
+  tf.test.main()